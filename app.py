@@ -1,14 +1,17 @@
+import os
+
 from flask import Flask, redirect, url_for
 from config import Config
 from models import db, User
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_mail import Mail
+from sqlalchemy.orm import joinedload
 
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max upload
 
     # Initialize extensions
@@ -23,7 +26,8 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        # Student details come in the same query; student routes read them from g
+        return db.session.get(User, int(user_id), options=[joinedload(User.student_details)])
 
     # Import and register blueprints
     try:
@@ -39,6 +43,40 @@ def create_app():
     except ImportError as e:
         print(f"Blueprints error: {e}")
 
+    # In-process caches
+    from services import curriculum, catalogue, attachments, search, upload_store, assets
+    curriculum.init_app(app)
+    catalogue.init_app(app)
+    attachments.init_app(app)
+    search.init_app(app)
+    upload_store.init_app(app)
+    assets.init_app(app)
+
+    from services import (analytics, student_import, catalogue_transfer, passwords, password_reset,
+                          payment_reconciliation, report_jobs)
+    passwords.init_app(app)
+    password_reset.init_app(app)
+    analytics.init_app(app)
+    student_import.init_app(app)
+    catalogue_transfer.init_app(app)
+    payment_reconciliation.init_app(app)
+    report_jobs.init_app(app)
+
+    # Background maintenance (expired seat holds, purges of old rows) and outbound mail
+    from services import hold_sweeper, maintenance, mail_outbox
+    hold_sweeper.init_app(app)
+    maintenance.init_app(app)
+    mail_outbox.init_app(app)
+
+    # gzip/brotli and weak ETags for rendered pages (wraps app.wsgi_app)
+    from services import compression
+    compression.init_app(app)
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables, the default admin account and the dashboard analytics."""
+        seed_database(app)
+
     @app.route('/')
     def index():
         return redirect(url_for('auth.login'))
@@ -90,41 +128,49 @@ def create_app():
     return app
 
 
-# ✅ WSGI app for Gunicorn (RENDER NEEDS THIS)
-app = create_app()
-
-# ✅ Create tables on Render startup
-with app.app_context():
-    try:
-        db.create_all()
-        print("✅ Database tables created successfully.")
-        
-        # Seed Admin User if not exists
-        if not User.query.filter_by(role='admin').first():
-            admin = User(name='Admin User', email='ACV@gmail.com', role='admin')
-            admin.set_password('ACV123')
-            db.session.add(admin)
-            db.session.commit()
-            print("✅ Admin user created/verified.")
-            
-    except Exception as e:
-        print(f"⚠️ Error initializing database: {e}")
-
-
-# Local development only
-if __name__ == '__main__':
+def seed_database(app):
+    """Creates missing tables, the default admin account and, once, the dashboard analytics."""
+    from services.analytics import seed_analytics
     with app.app_context():
         try:
             db.create_all()
+            print("✅ Database tables created successfully.")
 
-            # Seed Admin User
+            # Seed Admin User if not exists
             if not User.query.filter_by(role='admin').first():
-                admin = User(name='Admin User', email='ACV@gmail.com', role='admin')
+                admin = User(name='Admin User', email='acv@gmail.com', role='admin')
                 admin.set_password('ACV123')
                 db.session.add(admin)
                 db.session.commit()
-                print("Admin user created.")
+                print("✅ Admin user created/verified.")
+
+            if seed_analytics():
+                print("✅ Dashboard analytics seeded.")
+
         except Exception as e:
-            print(f"Database error: {e}")
+            print(f"⚠️ Error initializing database: {e}")
+
 
+def start_background_workers(app):
+    """
+    Starts the app's background threads (expired hold sweeper, purger, mail
+    outbox workers, upload variant builders). create_app() never does this, so scripts, benchmarks and tests
+    that build an app stay single-threaded; the server entry points call it
+    once per serving process (gunicorn via post_worker_init in
+    gunicorn.conf.py, 'python app.py' below).
+    """
+    from services import hold_sweeper, maintenance
+    hold_sweeper.start_hold_sweeper(app)
+    maintenance.start_purger(app)
+    app.extensions['mail_outbox'].start(app.config.get('MAIL_OUTBOX_WORKERS', 0))
+    app.extensions['upload_variants'].start(app.config.get('UPLOAD_VARIANT_WORKERS', 0))
+
+
+# Local development only
+if __name__ == '__main__':
+    app = create_app()
+    seed_database(app)
+    # With the reloader on, this module also runs in the watching parent process
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers(app)
     app.run(debug=True, host='0.0.0.0', port=5000)
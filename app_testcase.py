@@ -0,0 +1,45 @@
+"""Shared fixtures for the test_*.py suites."""
+import unittest
+
+from sqlalchemy import event
+
+from app import create_app
+from config import Config
+from models import db
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SEARCH_BACKEND = 'memory'
+    PASSWORD_VERIFY_WORKERS = 0  # Verify in the calling thread
+
+
+class AppTestCase(unittest.TestCase):
+    """
+    Runs each test against a fresh app built from config, inside its app
+    context, with the schema created in an in-memory database. create_app()
+    starts no background workers, so nothing runs behind the test's back.
+    """
+
+    config = TestConfig
+
+    def setUp(self):
+        self.app = create_app(self.config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_statements(self):
+        """Starts recording the SQL sent to the database in self.statements, until the test ends."""
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self._record_statement)
+        self.addCleanup(event.remove, db.engine, 'before_cursor_execute', self._record_statement)
+
+    def _record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
@@ -0,0 +1,62 @@
+"""
+First-load bytes for a student page's static assets.
+
+Compares what a cold browser cache downloads for the stylesheets, scripts and
+Font Awesome fonts of a student page before the asset build (the separate
+vendored files through /static, uncompressed) and after it (the built
+bundles and subset fonts through /assets, as gzip or brotli). Every response
+is fetched through the Flask test client, so the numbers are the bytes
+actually sent.
+
+Usage:
+    flask build-assets && python bench_assets.py
+"""
+import time
+
+from app import create_app
+from config import Config
+
+# What base.html + modern.css pages loaded before the build, and the fonts their icons pull in
+BEFORE = ['css/bootstrap.min.css', 'css/all.min.css', 'style.css', 'css/modern.css',
+          'js/bootstrap.bundle.min.js', 'js/chart.js', 'webfonts/fa-solid-900.woff2', 'webfonts/fa-regular-400.woff2']
+AFTER = ['vendor.css', 'style.css', 'modern.css', 'site.js',
+         'webfonts/fa-solid-900.woff2', 'webfonts/fa-regular-400.woff2']
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    HOLD_SWEEP_INTERVAL = 0
+    MAIL_OUTBOX_WORKERS = 0
+
+
+def fetch(client, urls, encoding):
+    total = 0
+    started = time.perf_counter()
+    for url in urls:
+        response = client.get(url, headers={'Accept-Encoding': encoding} if encoding else {})
+        assert response.status_code == 200, url
+        total += len(response.data)
+        response.close()
+    return total, (time.perf_counter() - started) * 1000
+
+
+def main():
+    app = create_app(BenchConfig)
+    manifest = app.extensions['assets'].get()
+    before = [f'/static/{path}' for path in BEFORE]
+    after = [f'/assets/{manifest[name]}' for name in AFTER]
+
+    with app.test_client() as client:
+        rows = [('before (/static)', *fetch(client, before, None))]
+        for encoding in ('identity', 'gzip', 'br'):
+            rows.append((f'after ({encoding})', *fetch(client, after, encoding)))
+
+    baseline = rows[0][1]
+    print(f"{'':<20}{'requests':>10}{'bytes':>12}{'vs before':>11}{'ms':>9}")
+    for label, total, ms in rows:
+        count = len(before) if label.startswith('before') else len(after)
+        print(f"{label:<20}{count:>10}{total:>12,}{total / baseline:>10.0%}{ms:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
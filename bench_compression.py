@@ -0,0 +1,109 @@
+"""
+Bytes on the wire for the course pages, with and without the compression
+middleware.
+
+Seeds a throwaway SQLite database with one course (S sections of V videos),
+enrolls a student and fetches /student/course/<id> and /student/watch/<id>:
+  - before:      COMPRESS_ENABLED = False (what every navigation used to send)
+  - gzip / br:   first visit through the middleware
+  - revalidate:  repeat visit sending the ETag back (If-None-Match -> 304)
+
+Usage:
+    python bench_compression.py [--sections 8] [--videos 6] [--requests 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app import create_app
+from config import Config
+from models import db, User, StudentDetails, Course, CourseSection, CourseVideo, Enrollment
+from services.compression import brotli_supported
+
+
+def make_app(database_uri, enabled):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_uri
+        HOLD_SWEEP_INTERVAL = 0
+        MAIL_OUTBOX_WORKERS = 0
+        PASSWORD_VERIFY_WORKERS = 0
+        COMPRESS_ENABLED = enabled
+
+    return create_app(BenchConfig)
+
+
+def seed(sections, videos):
+    db.drop_all()
+    db.create_all()
+    user = User(name='Bench Student', email='bench@example.com', password_hash='x', role='student')
+    course = Course(course_code='CS101', name='Introduction to Computing', credits=4, seats=100, fee=500,
+                    description='Foundations of computing: programs, data and algorithms. ' * 5)
+    db.session.add_all([user, course])
+    db.session.flush()
+    details = StudentDetails(user_id=user.id, enrollment_no='UNIV2026001')
+    db.session.add(details)
+    db.session.flush()
+    db.session.add(Enrollment(student_id=details.id, course_id=course.id, status='enrolled'))
+    for s in range(sections):
+        section = CourseSection(course_id=course.id, title=f'Week {s + 1}: Topic {s + 1}', section_order=s)
+        db.session.add(section)
+        db.session.flush()
+        for v in range(videos):
+            db.session.add(CourseVideo(course_id=course.id, section_id=section.id, sequence_order=v,
+                                       title=f'Lecture {s + 1}.{v + 1}', duration='12:30',
+                                       video_url=f'https://www.youtube.com/watch?v=vid{s:02d}{v:02d}xyz'))
+    db.session.commit()
+    return user.id, course.id
+
+
+def measure(app, user_id, url, requests, encoding=None, revalidate=False):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    if revalidate:
+        headers['If-None-Match'] = client.get(url, headers=headers).headers['ETag']
+
+    total = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url, headers=headers)
+        assert response.status_code == (304 if revalidate else 200), (url, response.status_code)
+        total += len(response.data)
+    return total // requests, (time.perf_counter() - started) * 1000 / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sections', type=int, default=8)
+    parser.add_argument('--videos', type=int, default=6)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    database_uri = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    before_app = make_app(database_uri, False)
+    after_app = make_app(database_uri, True)
+    with before_app.app_context():
+        user_id, course_id = seed(args.sections, args.videos)
+
+    cases = [('before', before_app, None, False), ('gzip', after_app, 'gzip', False)]
+    if brotli_supported():
+        cases.append(('br', after_app, 'br, gzip', False))
+    cases.append(('revalidate (304)', after_app, 'gzip', True))
+
+    for page in ('course', 'watch'):
+        url = f'/student/{page}/{course_id}'
+        print(f"\n{url}  ({args.sections} sections x {args.videos} videos)")
+        print(f"{'':<18}{'bytes':>10}{'vs before':>11}{'ms/request':>12}")
+        baseline = None
+        for label, app, encoding, revalidate in cases:
+            size, ms = measure(app, user_id, url, args.requests, encoding, revalidate)
+            baseline = baseline or size
+            print(f"{label:<18}{size:>10,}{size / baseline:>10.0%}{ms:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Login throughput benchmark for password hashing settings.
+
+For each (hash method, verify workers) setting, serves the app from a
+threaded server on a throwaway SQLite database, fires a burst of concurrent
+logins, and meanwhile times a cheap page (GET /login) to show how much the
+burst slows everything else down.
+
+Usage:
+    python bench_login.py [--logins 64] [--concurrency 8]
+        [--setting scrypt:0 --setting scrypt:2 --setting pbkdf2:sha256:600000:2 ...]
+
+A setting is METHOD:WORKERS; WORKERS 0 verifies in the request thread.
+"""
+import argparse
+import http.client
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from werkzeug.serving import make_server
+
+from app import create_app
+from config import Config
+from models import db, User
+
+DEFAULT_SETTINGS = ['pbkdf2:sha256:600000:0', 'scrypt:0', 'scrypt:2', 'scrypt:16384:8:1:2']
+EMAIL, PASSWORD = 'bench@univ.edu', 'correct horse battery staple'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+    started = time.perf_counter()
+    conn.request(method, path, body=body, headers=headers)
+    status = conn.getresponse().status
+    conn.close()
+    return status, time.perf_counter() - started
+
+
+def run_setting(setting, logins, concurrency):
+    method, workers = setting.rsplit(':', 1)
+    tmpdir = tempfile.mkdtemp()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        HOLD_SWEEP_INTERVAL = 0
+        MAIL_OUTBOX_WORKERS = 0
+        PASSWORD_HASH_METHOD = method
+        PASSWORD_VERIFY_WORKERS = int(workers)
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(name='Bench', email=EMAIL, role='student')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    body = urlencode({'email': EMAIL, 'password': PASSWORD})
+    request(port, 'POST', '/login', body)  # starts the pool outside the timing
+
+    probe_latencies, stop = [], threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            probe_latencies.append(request(port, 'GET', '/login')[1])
+            time.sleep(0.02)
+
+    prober = threading.Thread(target=probe)
+    started = time.perf_counter()
+    prober.start()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda _: request(port, 'POST', '/login', body), range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    server.shutdown()
+    verifier = app.extensions['password_verifier']
+    if verifier._executor:
+        verifier._executor.shutdown()
+
+    ok = [latency for status, latency in results if status == 302]
+    busy = sum(1 for status, _ in results if status == 503)
+    print(f"{setting:26s} {len(ok) / elapsed:7.1f}/s  login p50 {statistics.median(ok) * 1000 if ok else 0:7.0f} ms"
+          f"  p99 {percentile(ok, 0.99) * 1000:7.0f} ms   page p50 {statistics.median(probe_latencies) * 1000:6.0f} ms"
+          f"  p99 {percentile(probe_latencies, 0.99) * 1000:6.0f} ms   503s {busy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--setting', action='append', dest='settings')
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    print(f"{args.logins} logins, {args.concurrency} at a time, {os.cpu_count()} CPUs")
+    for setting in args.settings or DEFAULT_SETTINGS:
+        run_setting(setting, args.logins, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark for the outbound mail queue against a local SMTP stand-in.
+
+Starts an aiosmtpd server on localhost (with an artificial delay on EHLO to
+stand in for the TLS handshake + login of a real provider), then compares:
+
+  inline   - mail.send() per message inside the "request", as before
+  outbox   - enqueue_mail() in the request, delivered by the worker pool
+
+and reports per-request latency (p50/p99) and end-to-end delivery throughput.
+
+Usage:
+    pip install aiosmtpd
+    python bench_mail_outbox.py [--messages 500] [--workers 2] [--handshake-ms 50]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+from aiosmtpd.controller import Controller
+from flask_mail import Message
+
+from app import create_app
+from config import Config
+from models import db
+from services.mail_outbox import enqueue_mail, outbox_metrics
+
+
+class CountingHandler:
+    def __init__(self, handshake_delay):
+        self.handshake_delay = handshake_delay
+        self.received = 0
+        self.lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake_delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            self.received += 1
+        return '250 OK'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, latencies, elapsed, count):
+    print(f"{label:<8} request p50 {statistics.median(latencies) * 1000:7.2f} ms   "
+          f"p99 {percentile(latencies, 99) * 1000:7.2f} ms   "
+          f"delivered {count} in {elapsed:6.2f}s ({count / elapsed:7.1f} msg/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--handshake-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    handler = CountingHandler(args.handshake_ms / 1000)
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+
+    tmpdir = tempfile.mkdtemp()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+        HOLD_SWEEP_INTERVAL = 0
+        MAIL_SERVER = '127.0.0.1'
+        MAIL_PORT = port
+        MAIL_USE_TLS = False
+        MAIL_USERNAME = 'bench@university.local'
+        MAIL_PASSWORD = None
+        MAIL_OUTBOX_WORKERS = args.workers
+        MAIL_OUTBOX_POLL_SECONDS = 1
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+    app.extensions['mail_outbox'].start(args.workers)
+    with app.app_context():
+        mail = app.extensions['mail']
+
+        # Inline: every message opens its own SMTP session inside the request
+        latencies = []
+        started = time.perf_counter()
+        for i in range(args.messages):
+            t0 = time.perf_counter()
+            msg = Message(f'Inline {i}', recipients=[f'student{i}@bench.local'], sender=BenchConfig.MAIL_USERNAME)
+            msg.body = 'Enrollment confirmed.'
+            mail.send(msg)
+            latencies.append(time.perf_counter() - t0)
+        report('inline', latencies, time.perf_counter() - started, handler.received)
+
+        # Outbox: the request only inserts a row; workers deliver over pooled connections
+        handler.received = 0
+        latencies = []
+        started = time.perf_counter()
+        for i in range(args.messages):
+            t0 = time.perf_counter()
+            enqueue_mail(f'student{i}@bench.local', f'Queued {i}', 'Enrollment confirmed.')
+            latencies.append(time.perf_counter() - t0)
+        while handler.received < args.messages:
+            time.sleep(0.01)
+        report('outbox', latencies, time.perf_counter() - started, handler.received)
+        print(f"SMTP connections opened by workers: {outbox_metrics['smtp_connections']}")
+
+    controller.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Memory/time benchmark for the enrollment report export.
+
+Seeds a throwaway SQLite database with N enrollments, then measures wall
+time and peak resident memory (above the starting RSS) for the streaming CSV
+and chunked PDF exports, and optionally for the original build-everything PDF
+path. Each export runs in a forked child so peaks don't mask each other.
+Linux only (reads /proc and relies on fork).
+
+Usage:
+    python bench_report_export.py [--rows 100000] [--legacy-rows 10000]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import create_app
+from config import Config
+from models import db, User, StudentDetails, Course, Enrollment
+from services.report_export import iter_report_rows, stream_csv, write_pdf, REPORT_HEADER
+from utils import generate_pdf_report
+
+
+def seed(rows, students=5000, courses=200):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(Course), [
+        {'id': i, 'course_code': f'C{i:04d}', 'name': f'Course number {i}', 'credits': 4, 'seats': 10 ** 6}
+        for i in range(1, courses + 1)
+    ])
+    db.session.execute(insert(User), [
+        {'id': i, 'name': f'Student {i}', 'email': f'student{i}@bench.local', 'password_hash': 'x', 'role': 'student'}
+        for i in range(1, students + 1)
+    ])
+    db.session.execute(insert(StudentDetails), [
+        {'id': i, 'user_id': i, 'enrollment_no': f'BENCH{i:06d}'} for i in range(1, students + 1)
+    ])
+    start = datetime(2026, 1, 1)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            'student_id': i % students + 1,
+            'course_id': i // students + 1,
+            'status': 'enrolled' if i % 3 else 'pending_payment',
+            'date_enrolled': start + timedelta(seconds=i),
+        })
+        if len(batch) == 10000:
+            db.session.execute(insert(Enrollment), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Enrollment), batch)
+    db.session.commit()
+
+
+def current_rss_kib():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def measure(label, fn):
+    def child(queue):
+        baseline = current_rss_kib()
+        started = time.perf_counter()
+        size = fn()
+        elapsed = time.perf_counter() - started
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        queue.put((elapsed, max(peak - baseline, 0), size))
+
+    # Children open their own connections
+    db.session.remove()
+    db.engine.dispose()
+
+    queue = multiprocessing.get_context('fork').Queue()
+    process = multiprocessing.get_context('fork').Process(target=child, args=(queue,))
+    process.start()
+    elapsed, peak_kib, size = queue.get()
+    process.join()
+    print(f"{label:<28} {elapsed:8.2f}s  peak +{peak_kib / 1024:7.1f} MiB  output {size / 2 ** 20:7.1f} MiB")
+
+
+def csv_export():
+    return sum(len(chunk.encode()) for chunk in stream_csv(iter_report_rows({})))
+
+
+def pdf_export():
+    with tempfile.TemporaryFile() as output:
+        write_pdf(iter_report_rows({}), output)
+        return output.tell()
+
+
+def legacy_pdf_export(limit):
+    def run():
+        rows = db.session.query(Enrollment, User, Course).select_from(Enrollment) \
+            .join(StudentDetails).join(User).join(Course).limit(limit).all()
+        data = [REPORT_HEADER]
+        for enr, user, course in rows:
+            data.append([str(enr.id), user.name, user.email, course.name, course.course_code,
+                         enr.date_enrolled.strftime('%Y-%m-%d'), enr.status.title()])
+        return len(generate_pdf_report(data, title="University Enrollment Report").getvalue())
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--legacy-rows', type=int, default=10000,
+                        help='rows for the original in-memory PDF path (0 to skip; it is very slow at 100k)')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        HOLD_SWEEP_INTERVAL = 0
+        MAIL_OUTBOX_WORKERS = 0
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        print(f"Seeding {args.rows} enrollments...")
+        seed(args.rows)
+        measure(f"streaming CSV ({args.rows})", csv_export)
+        measure(f"chunked PDF ({args.rows})", pdf_export)
+        if args.legacy_rows:
+            measure(f"legacy PDF ({args.legacy_rows})", legacy_pdf_export(args.legacy_rows))
+
+
+if __name__ == '__main__':
+    main()
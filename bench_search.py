@@ -0,0 +1,125 @@
+"""
+Latency benchmark for student search.
+
+Seeds a throwaway SQLite database with N students, builds the in-process
+prefix index and compares per-query latency (p50/p99) against the original
+leading-wildcard ILIKE scan over users.name/users.email.
+
+Usage:
+    python bench_search.py [--students 100000] [--queries 200]
+"""
+import argparse
+import gc
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+from app import create_app
+from config import Config
+from models import db, User
+from services.search import search_students
+
+FIRST = ['Aarav', 'Vivaan', 'Aditya', 'Ishaan', 'Priya', 'Ananya', 'Diya', 'Kavya', 'Rohan', 'Sneha',
+         'Arjun', 'Meera', 'Karthik', 'Lakshmi', 'Nikhil', 'Pooja', 'Rahul', 'Shreya', 'Varun', 'Zoya']
+LAST = ['Sharma', 'Patil', 'Kulkarni', 'Reddy', 'Iyer', 'Nair', 'Gowda', 'Hegde', 'Joshi', 'Rao',
+        'Desai', 'Shetty', 'Kamath', 'Bhat', 'Naik', 'Pai', 'Menon', 'Verma', 'Gupta', 'Mehta']
+
+
+def seed(students):
+    db.drop_all()
+    db.create_all()
+    rng = random.Random(42)
+    batch = []
+    for i in range(1, students + 1):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        batch.append({'id': i, 'name': f'{first} {last}', 'email': f'{first.lower()}.{last.lower()}{i}@univ.edu',
+                      'password_hash': 'x', 'role': 'student'})
+        if len(batch) == 10000:
+            db.session.execute(insert(User), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(User), batch)
+    db.session.commit()
+
+
+def make_queries(count, students):
+    rng = random.Random(7)
+    queries = []
+    for _ in range(count):
+        kind = rng.randrange(4)
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        if kind == 0:
+            queries.append(first[:3])                       # short prefix
+        elif kind == 1:
+            queries.append(f'{first} {last}')               # full name
+        elif kind == 2:
+            queries.append(f'{last.lower()}{rng.randint(1, students)}')  # email fragment
+        else:
+            queries.append(f'{first[:4]} {last[:3]}')       # two prefixes
+    return queries
+
+
+def timed(fn, queries):
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    return statistics.median(latencies), latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+def ilike_scan(q):
+    pattern = f'%{q}%'
+    return db.session.query(User.id).filter(User.role == 'student') \
+        .filter(User.name.ilike(pattern) | User.email.ilike(pattern)).limit(200).all()
+
+
+def rss_mib():
+    # Current (not peak) resident set; Linux only
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        HOLD_SWEEP_INTERVAL = 0
+        MAIL_OUTBOX_WORKERS = 0
+        SEARCH_BACKEND = 'memory'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        print(f"Seeding {args.students} students...")
+        seed(args.students)
+        queries = make_queries(args.queries, args.students)
+
+        index = app.extensions['search']['students']
+        before = rss_mib()
+        started = time.perf_counter()
+        index.build()
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        print(f"index build      {elapsed:8.2f}s  "
+              f"(resident +{rss_mib() - before:.0f} MiB, {index.stats()['tokens']} tokens)")
+
+        p50, p99 = timed(search_students, queries)
+        print(f"prefix index     p50 {p50 * 1000:7.2f} ms   p99 {p99 * 1000:7.2f} ms")
+        p50, p99 = timed(ilike_scan, queries)
+        print(f"ILIKE '%q%' scan p50 {p50 * 1000:7.2f} ms   p99 {p99 * 1000:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
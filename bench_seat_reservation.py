@@ -0,0 +1,139 @@
+"""
+Concurrency benchmark for the seat reservation service.
+
+Fires many parallel enroll attempts at a single course and checks that the
+number of enrollments never exceeds the seats that were available.
+
+Usage:
+    python bench_seat_reservation.py [--students 2000] [--seats 100] [--workers 32] [--legacy]
+
+Set BENCH_DATABASE_URL to run against MySQL (the production backend) or
+PostgreSQL instead of a throwaway SQLite file, e.g.
+
+    BENCH_DATABASE_URL=mysql+mysqlconnector://root:pw@localhost/enrollment_bench \
+        python bench_seat_reservation.py
+
+SQLite serialises writers on a file lock, so only a server backend shows
+row-lock behaviour such as InnoDB deadlocks between the enrollment insert
+and the seat update.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert
+
+from app import create_app
+from config import Config
+from models import db, User, StudentDetails, Course, Enrollment
+from services.seat_reservation import reserve_seat, ReservationError, ReservationBusy
+
+
+def make_config(database_url, workers):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': workers, 'max_overflow': 0}
+        if database_url.startswith('sqlite'):
+            SQLALCHEMY_ENGINE_OPTIONS = {
+                'pool_size': workers,
+                'max_overflow': 0,
+                'connect_args': {'timeout': 60},
+            }
+    return BenchConfig
+
+
+def seed(students, seats):
+    db.drop_all()
+    db.create_all()
+    course = Course(course_code='BENCH101', name='Benchmark Course', credits=4, seats=seats)
+    db.session.add(course)
+    db.session.flush()
+
+    db.session.execute(insert(User), [
+        {'id': i, 'name': f'Student {i}', 'email': f'student{i}@bench.local',
+         'password_hash': 'x', 'role': 'student'}
+        for i in range(1, students + 1)
+    ])
+    db.session.execute(insert(StudentDetails), [
+        {'id': i, 'user_id': i, 'enrollment_no': f'BENCH{i:06d}'}
+        for i in range(1, students + 1)
+    ])
+    db.session.commit()
+    return course.id
+
+
+def legacy_enroll(student_id, course_id):
+    """The original read-check-write flow from student.enroll, for comparison."""
+    course = db.session.get(Course, course_id)
+    if course.seats <= 0:
+        raise ReservationError('full')
+    db.session.add(Enrollment(student_id=student_id, course_id=course_id, status='pending_payment'))
+    course.seats -= 1
+    db.session.commit()
+
+
+def run(app, course_id, students, workers, legacy=False):
+    enroll = legacy_enroll if legacy else reserve_seat
+
+    def attempt(student_id):
+        with app.app_context():
+            try:
+                enroll(student_id, course_id)
+                return 'ok'
+            except ReservationBusy:
+                return 'busy'
+            except ReservationError:
+                return 'rejected'
+            except Exception as e:
+                db.session.rollback()
+                return f'error: {type(e).__name__}'
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(attempt, range(1, students + 1)))
+    elapsed = time.perf_counter() - start
+    return outcomes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--seats', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--legacy', action='store_true', help='benchmark the old read-check-write flow')
+    args = parser.parse_args()
+
+    database_url = os.environ.get('BENCH_DATABASE_URL')
+    tmpdir = None
+    if not database_url:
+        tmpdir = tempfile.mkdtemp()
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    app = create_app(make_config(database_url, args.workers))
+    with app.app_context():
+        course_id = seed(args.students, args.seats)
+
+    outcomes, elapsed = run(app, course_id, args.students, args.workers, legacy=args.legacy)
+
+    with app.app_context():
+        enrolled = Enrollment.query.filter_by(course_id=course_id).count()
+        seats_left = db.session.get(Course, course_id).seats
+
+    oversold = max(0, enrolled - args.seats)
+    print(f"Backend:      {database_url.split('@')[-1]}")
+    print(f"Flow:         {'legacy read-check-write' if args.legacy else 'reserve_seat'}")
+    print(f"Attempts:     {args.students} across {args.workers} workers")
+    print(f"Accepted:     {outcomes.count('ok')}")
+    print(f"Rejected:     {outcomes.count('rejected')}")
+    print(f"Busy:         {outcomes.count('busy')} (still deadlocked after retries)")
+    errors = [outcome for outcome in outcomes if outcome.startswith('error')]
+    print(f"Errors:       {len(errors)} {sorted(set(errors)) if errors else ''}")
+    print(f"Enrollments:  {enrolled} for {args.seats} seats (seats left: {seats_left})")
+    print(f"Oversold:     {oversold}")
+    print(f"Throughput:   {args.students / elapsed:.0f} attempts/s ({elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
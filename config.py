@@ -17,3 +17,73 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME') or 'ikumbar59@gmail.com'
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD') or 'wpnl xjvv rfpu vrsr'
     MAIL_DEFAULT_SENDER = ('New2', MAIL_USERNAME)
+
+    # Seat holds for unpaid enrollments
+    SEAT_HOLD_MINUTES = int(os.environ.get('SEAT_HOLD_MINUTES', 30))
+    HOLD_SWEEP_INTERVAL = int(os.environ.get('HOLD_SWEEP_INTERVAL', 60)) # seconds; the sweeper thread only runs in server processes (app.start_background_workers), 0 disables it
+    HOLD_SWEEP_BATCH_SIZE = 500
+    PURGE_INTERVAL = int(os.environ.get('PURGE_INTERVAL', 300)) # seconds between purges of expired reset codes and old reports (server processes only), 0 disables them
+
+    # Curriculum cache (set CURRICULUM_CACHE_REDIS_URL to share invalidations between workers)
+    CURRICULUM_CACHE_SIZE = 256
+    CURRICULUM_CACHE_TTL = 60 # Without CURRICULUM_CACHE_REDIS_URL, other workers' edits show up after at most this many seconds
+    CURRICULUM_CACHE_REDIS_URL = os.environ.get('CURRICULUM_CACHE_REDIS_URL') # Also shared by the catalogue facets
+
+    # Level/stream browse facets; seat counts shown there may lag by up to this many seconds
+    CATALOGUE_CACHE_TTL = 30
+
+    # Background report generation
+    REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2)) # 0 renders in the request
+    REPORT_JOB_DIR = os.environ.get('REPORT_JOB_DIR') # Defaults to <instance>/reports
+    REPORT_JOB_DEDUP_SECONDS = 300 # Reuse a finished identical report this long
+    REPORT_JOB_STALE_SECONDS = 120 # A queued/running job without a heartbeat this long is lost (the server restarted)
+    REPORT_JOB_RETENTION_SECONDS = 86400 # Finished reports and their files are purged after this
+
+    # Outbound mail queue
+    MAIL_OUTBOX_WORKERS = int(os.environ.get('MAIL_OUTBOX_WORKERS', 2)) # Threads per server process (app.start_background_workers); 0 leaves mail queued for 'flask mail-drain'
+    MAIL_OUTBOX_BATCH_SIZE = 50
+    MAIL_OUTBOX_POLL_SECONDS = 5
+    MAIL_MAX_ATTEMPTS = 5
+    MAIL_RETRY_BASE_SECONDS = 30 # Doubles after every failed attempt
+
+    # Course/student search: 'memory' (in-process prefix index) or 'postgres' (pg_trgm, see migrate_search_indexes.py)
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'memory')
+    SEARCH_INDEX_REDIS_URL = os.environ.get('SEARCH_INDEX_REDIS_URL') # Shares index versions between workers
+    SEARCH_RESULTS_LIMIT = 200 # Matches shown per search; the page says when there were more
+    SEARCH_INDEX_TTL = 60 # Without SEARCH_INDEX_REDIS_URL, other workers' writes show up in search after at most this many seconds
+
+    # Static mail attachments, kept in memory: key -> (path relative to the app root, filename sent)
+    MAIL_ATTACHMENTS = {
+        'university_rules': ('static/files/rules.pdf', 'University_Rules.pdf'),
+    }
+    MAIL_ATTACHMENT_CHECK_SECONDS = 30 # How often to stat the files for changes
+
+    # Password hashing policy. Any werkzeug method string, e.g. 'scrypt', 'scrypt:16384:8:1' or
+    # 'pbkdf2:sha256:600000'; hashes made under other parameters are upgraded at the next login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_SALT_LENGTH = 16
+    # Login checks run in a process pool of this size (0 checks in the request thread)
+    PASSWORD_VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', 2))
+    PASSWORD_VERIFY_MAX_PENDING = None # Checks queued or running at once, defaults to 4 per worker
+    PASSWORD_VERIFY_WAIT_SECONDS = 5 # Then the login is answered with 503 instead of queueing
+
+    # Password reset codes (expired ones are purged by the hold sweeper thread or 'flask purge-reset-codes')
+    PASSWORD_RESET_CODE_MINUTES = 15
+    PASSWORD_RESET_MAX_ATTEMPTS = 5 # Wrong codes before the current code stops working
+
+    # Bulk student import (admin CSV upload and 'flask import-students')
+    STUDENT_IMPORT_BATCH_SIZE = 500 # Rows per transaction
+    STUDENT_IMPORT_HASH_WORKERS = int(os.environ.get('STUDENT_IMPORT_HASH_WORKERS', min(4, os.cpu_count() or 1))) # Processes per import, stopped when it ends; 0/1 hashes in-process
+
+    # Uploaded images, content-addressed under static/uploads/objects. Variants are WebP/JPEG downscales
+    # whose shorter side is one of these sizes, built by background threads or 'flask build-upload-variants'
+    UPLOAD_VARIANT_SIZES = (160, 320)
+    UPLOAD_VARIANT_WORKERS = int(os.environ.get('UPLOAD_VARIANT_WORKERS', 1)) # Threads per server process (app.start_background_workers); 0 leaves them to the CLI command
+
+    # Response compression and weak ETags (services/compression.py). Responses with their own
+    # Content-Encoding, ETag or Content-Disposition, and streamed ones, are always left alone
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024 # bytes; smaller bodies are not worth the CPU
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4 # Only used when the brotli package is installed
+    COMPRESS_EXCLUDE_BLUEPRINTS = () # e.g. ('admin',) to pass a blueprint's responses through untouched
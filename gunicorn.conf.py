@@ -0,0 +1,7 @@
+# Picked up automatically by gunicorn from the working directory (see Procfile)
+
+
+def post_worker_init(worker):
+    # worker.wsgi is the app this worker built with "app:create_app()"
+    from app import start_background_workers
+    start_background_workers(worker.wsgi)
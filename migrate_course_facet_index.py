@@ -0,0 +1,14 @@
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+# Composite index behind the level -> stream facets on the student course browser
+with app.app_context():
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text("CREATE INDEX ix_courses_level_stream ON courses (level, stream)"))
+            conn.commit()
+        print("Successfully created index 'ix_courses_level_stream'.")
+    except Exception as e:
+        print(f"Index might already exist or error: {e}")
@@ -0,0 +1,25 @@
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+# Indexes backing keyset pagination and filters on the admin enrollments page
+INDEXES = {
+    'ix_enrollments_date_id': 'enrollments (date_enrolled, id)',
+    'ix_enrollments_status_date_id': 'enrollments (status, date_enrolled, id)',
+    'ix_enrollments_course_date_id': 'enrollments (course_id, date_enrolled, id)',
+}
+
+with app.app_context():
+    try:
+        with db.engine.connect() as conn:
+            for name, target in INDEXES.items():
+                try:
+                    conn.execute(text(f"CREATE INDEX {name} ON {target}"))
+                    conn.commit()
+                    print(f"Successfully created index '{name}'.")
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Index might already exist or error: {e}")
+    except Exception as e:
+        print(f"Error connecting or executing: {e}")
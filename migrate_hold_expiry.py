@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+with app.app_context():
+    try:
+        # PostgreSQL has no DATETIME type
+        datetime_type = 'TIMESTAMP' if db.engine.dialect.name == 'postgresql' else 'DATETIME'
+
+        with db.engine.connect() as conn:
+            try:
+                conn.execute(text(f"ALTER TABLE enrollments ADD COLUMN hold_expires_at {datetime_type} NULL"))
+                conn.commit()
+                print("Successfully added 'hold_expires_at' column to 'enrollments' table.")
+            except Exception as e:
+                conn.rollback()
+                print(f"Column might already exist or error: {e}")
+
+            try:
+                conn.execute(text("CREATE INDEX ix_enrollments_status_hold ON enrollments (status, hold_expires_at)"))
+                conn.commit()
+                print("Successfully created index 'ix_enrollments_status_hold'.")
+            except Exception as e:
+                conn.rollback()
+                print(f"Index might already exist or error: {e}")
+
+            # Existing unpaid enrollments get a fresh hold window instead of being released at once
+            expiry = datetime.utcnow() + timedelta(minutes=app.config.get('SEAT_HOLD_MINUTES', 30))
+            result = conn.execute(
+                text("UPDATE enrollments SET hold_expires_at = :expiry "
+                     "WHERE status = 'pending_payment' AND hold_expires_at IS NULL"),
+                {'expiry': expiry}
+            )
+            conn.commit()
+            print(f"Set hold deadline on {result.rowcount} pending enrollments.")
+
+    except Exception as e:
+        print(f"Error connecting or executing: {e}")
@@ -0,0 +1,29 @@
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+with app.app_context():
+    try:
+        with db.engine.connect() as conn:
+            # Logins and imports now look emails up trimmed and lower-cased
+            rows = conn.execute(text("SELECT id, email FROM users")).all()
+            taken = {email for _, email in rows}
+            updated = 0
+            for user_id, email in rows:
+                normalised = (email or '').strip().lower()
+                if normalised == email:
+                    continue
+                if normalised in taken:
+                    print(f"Skipped user {user_id}: {normalised} already belongs to another account.")
+                    continue
+                conn.execute(text("UPDATE users SET email = :email WHERE id = :id"),
+                             {'email': normalised, 'id': user_id})
+                taken.discard(email)
+                taken.add(normalised)
+                updated += 1
+            conn.commit()
+            print(f"Normalised {updated} user emails.")
+
+    except Exception as e:
+        print(f"Error connecting or executing: {e}")
@@ -0,0 +1,101 @@
+from app import create_app, db
+from models import Payment
+from services.payments import normalise_reference
+from sqlalchemy import text, insert, DateTime
+
+app = create_app()
+
+LEDGER_INDEXES = [
+    "CREATE INDEX ix_payments_reference ON payments (reference)",
+    "CREATE INDEX ix_payments_status_created ON payments (status, created_at)",
+]
+
+# Payments ledger: UTRs and receipts move off enrollments into indexed payments rows
+with app.app_context():
+    db.create_all()
+
+    # PostgreSQL has no DATETIME type
+    datetime_type = 'TIMESTAMP' if db.engine.dialect.name == 'postgresql' else 'DATETIME'
+    ledger_columns = [
+        ("reference", "VARCHAR(100)"),
+        ("receipt_image", "VARCHAR(255)"),
+        ("status", "VARCHAR(20) NOT NULL DEFAULT 'pending'"),
+        ("confirmed_at", datetime_type),
+        ("updated_at", datetime_type),
+    ]
+
+    for name, ddl in ledger_columns:
+        try:
+            with db.engine.connect() as conn:
+                conn.execute(text(f"ALTER TABLE payments ADD COLUMN {name} {ddl}"))
+                conn.commit()
+            print(f"Added payments.{name}.")
+        except Exception as e:
+            print(f"Column {name} might already exist or error: {e}")
+
+    # Rows written before this column existed all defaulted to 'pending', but card payments were
+    # settled by the gateway and have no reference a statement could ever match
+    try:
+        with db.engine.connect() as conn:
+            settled = conn.execute(text(
+                "UPDATE payments SET status = 'confirmed', confirmed_at = created_at "
+                "WHERE method = 'card' AND status = 'pending'"
+            )).rowcount
+            conn.commit()
+        print(f"Marked {settled} card payments as confirmed.")
+    except Exception as e:
+        print(f"Could not confirm card payments: {e}")
+
+    for statement in LEDGER_INDEXES:
+        try:
+            with db.engine.connect() as conn:
+                conn.execute(text(statement))
+                conn.commit()
+            print(f"Successfully ran: {statement}")
+        except Exception as e:
+            print(f"Index might already exist or error: {e}")
+
+    # Enrollments paid before the ledger existed only have the old columns. The old payment
+    # step enrolled the student at once, so enrolled/completed rows were paid: card payments
+    # left no reference, bank transfers a receipt, UPI just a reference
+    try:
+        with db.engine.connect() as conn:
+            legacy = conn.execute(text(
+                "SELECT e.id, e.status, e.date_enrolled, e.transaction_reference, e.receipt_image, c.fee "
+                "FROM enrollments e JOIN courses c ON c.id = e.course_id "
+                "WHERE (e.status IN ('enrolled', 'completed') OR e.transaction_reference IS NOT NULL) "
+                "AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.enrollment_id = e.id)"
+            ).columns(date_enrolled=DateTime)).all()
+    except Exception as e:
+        legacy = []
+        print(f"No legacy payment columns to backfill from: {e}")
+
+    rows = []
+    for enrollment_id, status, date_enrolled, reference, receipt_image, fee in legacy:
+        manual = reference in (None, 'Manual-Confirmation')
+        if receipt_image:
+            method = 'bank_transfer'
+        elif reference:
+            method = 'upi'
+        else:
+            method = 'card'
+        paid = status in ('enrolled', 'completed')
+        rows.append({
+            'enrollment_id': enrollment_id,
+            'idempotency_key': f"legacy-{enrollment_id}",
+            'method': method,
+            'amount': fee or 0.0,
+            'transaction_id': None if manual else reference,
+            'reference': None if manual else normalise_reference(reference),
+            'receipt_image': receipt_image,
+            # Only references on enrollments that never went through wait for reconciliation
+            'status': 'confirmed' if paid else 'pending',
+            'created_at': date_enrolled,
+            'confirmed_at': date_enrolled if paid else None,
+            'updated_at': date_enrolled,
+        })
+    for start in range(0, len(rows), 500):
+        db.session.execute(insert(Payment), rows[start:start + 500])
+    db.session.commit()
+    confirmed = sum(1 for row in rows if row['status'] == 'confirmed')
+    print(f"Backfilled {len(rows)} payments from enrollments ({confirmed} confirmed, {len(rows) - confirmed} pending).")
@@ -0,0 +1,21 @@
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+with app.app_context():
+    try:
+        # PostgreSQL has no DATETIME type
+        datetime_type = 'TIMESTAMP' if db.engine.dialect.name == 'postgresql' else 'DATETIME'
+
+        with db.engine.connect() as conn:
+            try:
+                conn.execute(text(f"ALTER TABLE report_jobs ADD COLUMN heartbeat_at {datetime_type} NULL"))
+                conn.commit()
+                print("Successfully added 'heartbeat_at' column to 'report_jobs' table.")
+            except Exception as e:
+                conn.rollback()
+                print(f"Column might already exist or error: {e}")
+
+    except Exception as e:
+        print(f"Error connecting or executing: {e}")
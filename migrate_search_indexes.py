@@ -0,0 +1,36 @@
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+# Trigram indexes for SEARCH_BACKEND='postgres'; they let ILIKE '%q%' use an index
+INDEXES = {
+    'ix_users_name_trgm': 'users USING gin (name gin_trgm_ops)',
+    'ix_users_email_trgm': 'users USING gin (email gin_trgm_ops)',
+    'ix_courses_name_trgm': 'courses USING gin (name gin_trgm_ops)',
+    'ix_courses_code_trgm': 'courses USING gin (course_code gin_trgm_ops)',
+}
+
+with app.app_context():
+    try:
+        if db.engine.dialect.name != 'postgresql':
+            print(f"Trigram indexes are PostgreSQL only; '{db.engine.dialect.name}' uses the in-process search index.")
+        else:
+            with db.engine.connect() as conn:
+                try:
+                    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                    conn.commit()
+                    print("pg_trgm extension enabled.")
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Could not enable pg_trgm: {e}")
+                for name, target in INDEXES.items():
+                    try:
+                        conn.execute(text(f"CREATE INDEX {name} ON {target}"))
+                        conn.commit()
+                        print(f"Successfully created index '{name}'.")
+                    except Exception as e:
+                        conn.rollback()
+                        print(f"Index might already exist or error: {e}")
+    except Exception as e:
+        print(f"Error connecting or executing: {e}")
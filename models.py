@@ -1,10 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+
+from services.passwords import hash_password
 
 db = SQLAlchemy()
 
+
+def normalise_email(email):
+    """Emails are stored and looked up trimmed and lower-cased, so the unique index serves every lookup."""
+    return (email or '').strip().lower()
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -13,14 +20,13 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), nullable=False, default='student') # 'admin' or 'student'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    reset_otp = db.Column(db.String(6), nullable=True)
-    reset_otp_expiry = db.Column(db.DateTime, nullable=True)
 
     # Relationships
     student_details = db.relationship('StudentDetails', backref='user', uselist=False, cascade="all, delete-orphan")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        # Algorithm and cost come from PASSWORD_HASH_METHOD
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -43,6 +49,11 @@ class Course(db.Model):
     # Relationships
     enrollments = db.relationship('Enrollment', backref='course', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Level -> stream browse facets
+        db.Index('ix_courses_level_stream', 'level', 'stream'),
+    )
+
 class StudentDetails(db.Model):
     __tablename__ = 'student_details'
     id = db.Column(db.Integer, primary_key=True)
@@ -63,12 +74,19 @@ class Enrollment(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
     date_enrolled = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='enrolled') # 'enrolled', 'completed', 'dropped'
+    hold_expires_at = db.Column(db.DateTime, nullable=True) # Seat hold deadline while status is 'pending_payment'
 
-    __table_args__ = (db.UniqueConstraint('student_id', 'course_id', name='_student_course_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'course_id', name='_student_course_uc'),
+        db.Index('ix_enrollments_status_hold', 'status', 'hold_expires_at'),
+        # Keyset pagination and filters on the admin enrollments listing
+        db.Index('ix_enrollments_date_id', 'date_enrolled', 'id'),
+        db.Index('ix_enrollments_status_date_id', 'status', 'date_enrolled', 'id'),
+        db.Index('ix_enrollments_course_date_id', 'course_id', 'date_enrolled', 'id'),
+    )
 
-    # Payment Details
-    transaction_reference = db.Column(db.String(100), nullable=True) # For Bank/UPI UTR
-    receipt_image = db.Column(db.String(255), nullable=True) # Path to uploaded receipt
+    # Payments outlive the enrollment: deleting it only clears payment.enrollment_id
+    payments = db.relationship('Payment', backref='enrollment', lazy=True)
 
 class CourseSection(db.Model):
     __tablename__ = 'course_sections'
@@ -94,3 +112,100 @@ class CourseVideo(db.Model):
     course = db.relationship('Course', backref=db.backref('videos', lazy=True, cascade="all, delete-orphan"))
     section = db.relationship('CourseSection', backref=db.backref('videos', lazy=True, cascade="all, delete-orphan"))
 
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_jobs'
+    id = db.Column(db.String(32), primary_key=True) # uuid4 hex
+    report_format = db.Column(db.String(10), nullable=False, default='pdf') # 'pdf' or 'xlsx'
+    params = db.Column(db.Text, nullable=False, default='{}') # JSON encoded report filters
+    params_hash = db.Column(db.String(64), nullable=False, index=True) # Identical requests share a job
+    status = db.Column(db.String(20), nullable=False, default='queued') # 'queued', 'running', 'done', 'failed'
+    file_path = db.Column(db.String(255), nullable=True) # Finished artifact on disk
+    error = db.Column(db.Text, nullable=True)
+    requested_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime, nullable=True) # Refreshed while rendering; queued/running jobs without a recent one are lost
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'mail_outbox'
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text, nullable=True)
+    attachment = db.Column(db.String(255), nullable=True) # Resource path relative to the app root
+    attachment_name = db.Column(db.String(100), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending') # 'pending' or 'sending' (leased by a worker)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow) # Also the lease expiry while 'sending'
+    claim_token = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_mail_outbox_next_attempt', 'next_attempt_at'),
+        db.Index('ix_mail_outbox_claim_token', 'claim_token'),
+    )
+
+class MailDeadLetter(db.Model):
+    __tablename__ = 'mail_dead_letters'
+    id = db.Column(db.Integer, primary_key=True)
+    outbox_id = db.Column(db.Integer, nullable=False)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text, nullable=True)
+    attachment = db.Column(db.String(255), nullable=True)
+    attachment_name = db.Column(db.String(100), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime)
+    failed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AnalyticsCounter(db.Model):
+    __tablename__ = 'analytics_counters'
+    name = db.Column(db.String(50), primary_key=True) # 'students', 'courses', 'enrollments'
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class EnrollmentDailyRollup(db.Model):
+    __tablename__ = 'enrollment_daily_rollups'
+    day = db.Column(db.Date, primary_key=True) # Day of date_enrolled
+    course_id = db.Column(db.Integer, primary_key=True) # No FK: rows are removed with the course
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class PasswordResetToken(db.Model):
+    __tablename__ = 'password_reset_tokens'
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), nullable=False)
+    code_hash = db.Column(db.String(64), nullable=False) # HMAC-SHA256 of email + code, keyed with SECRET_KEY
+    expires_at = db.Column(db.DateTime, nullable=False)
+    failed_attempts = db.Column(db.Integer, nullable=False, default=0) # Wrong codes tried for this email
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('email', 'code_hash', name='_reset_email_code_uc'),
+        db.Index('ix_password_reset_tokens_expires_at', 'expires_at'),
+    )
+
+class Payment(db.Model):
+    __tablename__ = 'payments'
+    id = db.Column(db.Integer, primary_key=True)
+    enrollment_id = db.Column(db.Integer, db.ForeignKey('enrollments.id'), nullable=True, index=True)
+    idempotency_key = db.Column(db.String(64), nullable=False, unique=True) # One per rendered payment form
+    method = db.Column(db.String(20), nullable=False) # 'card', 'upi' or 'bank_transfer'
+    amount = db.Column(db.Float, nullable=False)
+    transaction_id = db.Column(db.String(100), nullable=True) # Gateway id or the student's UTR reference, as entered
+    reference = db.Column(db.String(100), nullable=True) # Normalised UTR, matched against bank statements
+    receipt_image = db.Column(db.String(255), nullable=True) # Path to uploaded receipt
+    status = db.Column(db.String(20), nullable=False, default='pending') # 'pending' until reconciled, or 'confirmed'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    confirmed_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Statement reconciliation looks payments up by UTR
+        db.Index('ix_payments_reference', 'reference'),
+        db.Index('ix_payments_status_created', 'status', 'created_at'),
+    )
@@ -1,10 +1,31 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file
+import csv
+import io
+import os
+from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
-from models import db, User, Course, StudentDetails, Enrollment, CourseVideo, CourseSection
-from utils import generate_pdf_report
+from werkzeug.datastructures import MultiDict
+from models import db, User, Course, StudentDetails, Enrollment, CourseVideo, CourseSection, ReportJob, Payment, normalise_email
+from services.hold_sweeper import sweeper_metrics
+from services.mail_outbox import outbox_metrics
+from services.curriculum import load_curriculum, invalidate_curriculum
+from services.search import search_students, ranked_matches, search_stats, index_course, remove_course, index_student, remove_student
+from services.catalogue import invalidate_catalogue
+from services.analytics import (analytics_summary, read_counters, daily_enrollments, bump_counter, enrollment_groups,
+                                record_enrollments_removed, forget_course)
+from services.enrollment_listing import parse_enrollment_filters, enrollments_page, ENROLLMENT_STATUSES
+from services.enrollment_transitions import transition_enrollments, TransitionError, TRANSITIONS
+from services.report_export import iter_report_rows, stream_csv, xlsx_supported
+from services.report_jobs import enqueue_report, REPORT_EXTENSIONS
+from services.student_import import import_students, REQUIRED_COLUMNS, OPTIONAL_COLUMNS
+from services.catalogue_transfer import (stream_catalogue, load_document, import_catalogue, CatalogueImportError,
+                                         EXPORT_FORMATS, yaml_supported)
+from services.payment_reconciliation import (reconcile_statement, unreferenced_payments, confirm_payment,
+                                             REFERENCE_COLUMNS, AMOUNT_COLUMNS)
 
 admin_bp = Blueprint('admin', __name__)
 
+ENROLLMENTS_PER_PAGE = 50
+
 def admin_required(func):
     def wrapper(*args, **kwargs):
         if not current_user.is_authenticated or current_user.role != 'admin':
@@ -17,30 +38,54 @@ def admin_required(func):
 @admin_bp.route('/dashboard')
 @admin_required
 def dashboard():
-    total_students = User.query.filter_by(role='student').count()
-    total_courses = Course.query.count()
-    total_enrollments = Enrollment.query.count()
+    # Maintained counters and daily rollups instead of COUNT(*) scans
+    counters = read_counters()
+    labels, values = daily_enrollments(days=30)
     
     return render_template('admin/dashboard.html', 
                            title='Admin Dashboard',
-                           total_students=total_students,
-                           total_courses=total_courses,
-                           total_enrollments=total_enrollments)
+                           total_students=counters['students'],
+                           total_courses=counters['courses'],
+                           total_enrollments=counters['enrollments'],
+                           chart={'labels': labels, 'values': values})
+
+@admin_bp.route('/analytics')
+@admin_required
+def analytics():
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    return jsonify(analytics_summary(days=days))
+
+@admin_bp.route('/metrics')
+@admin_required
+def metrics():
+    return jsonify({
+        'hold_sweeper': sweeper_metrics,
+        'curriculum_cache': current_app.extensions['curriculum_cache'].stats(),
+        'mail_outbox': outbox_metrics,
+        'attachments': current_app.extensions['attachments'].stats(),
+        'search': search_stats(),
+        'password_verifier': current_app.extensions['password_verifier'].stats(),
+        'catalogue_cache': current_app.extensions['catalogue_cache'].stats(),
+        'upload_variants': current_app.extensions['upload_variants'].stats(),
+        'compression': current_app.extensions['compression'].stats() if 'compression' in current_app.extensions else None,
+    })
 
 @admin_bp.route('/students', methods=['GET', 'POST'])
 @admin_required
 def manage_students():
     search_query = request.args.get('search', '')
     query = db.session.query(User).join(StudentDetails, User.id == StudentDetails.user_id).filter(User.role == 'student')
+    truncated = False
     
     if search_query:
-        query = query.filter(
-            (User.name.ilike(f'%{search_query}%')) | 
-            (User.email.ilike(f'%{search_query}%'))
-        )
-        
-    students = query.all()
-    return render_template('admin/students.html', students=students, search_query=search_query)
+        # Ranked ids from the search index, then the rows in that order
+        ranked_ids, truncated = ranked_matches(search_students, search_query)
+        rank = {user_id: position for position, user_id in enumerate(ranked_ids)}
+        students = sorted(query.filter(User.id.in_(ranked_ids)).all(), key=lambda user: rank[user.id]) if ranked_ids else []
+    else:
+        students = query.all()
+    return render_template('admin/students.html', students=students, search_query=search_query,
+                           results_truncated=truncated)
 
 @admin_bp.route('/students/delete/<int:user_id>')
 @admin_required
@@ -50,11 +95,90 @@ def delete_student(user_id):
         flash('Cannot delete non-student users from here.', 'warning')
         return redirect(url_for('admin.manage_students'))
         
+    if user.student_details:
+        record_enrollments_removed(enrollment_groups(Enrollment.student_id == user.student_details.id))
+    bump_counter('students', -1)
     db.session.delete(user)
     db.session.commit()
+    remove_student(user_id)
     flash('Student deleted successfully.', 'success')
     return redirect(url_for('admin.manage_students'))
 
+@admin_bp.route('/students/import', methods=['GET', 'POST'])
+@admin_required
+def import_students_csv():
+    result = None
+    if request.method == 'POST':
+        upload = request.files.get('csv_file')
+        if not upload or not upload.filename:
+            flash('Choose a CSV file to import.', 'warning')
+            return redirect(url_for('admin.import_students_csv'))
+
+        # Read straight from the upload stream; rows are inserted in batches as they are parsed
+        try:
+            result = import_students(io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''),
+                                     forgot_password_url=url_for('auth.forgot_password', _external=True))
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            db.session.rollback()
+            flash(f'Could not import file: {e}', 'danger')
+            return redirect(url_for('admin.import_students_csv'))
+
+        if result.created:
+            flash(f'Imported {result.created} students.', 'success')
+        if result.error_count:
+            flash(f'{result.error_count} rows were skipped, see below.', 'warning')
+
+    return render_template('admin/import_students.html', result=result,
+                           required_columns=REQUIRED_COLUMNS, optional_columns=OPTIONAL_COLUMNS)
+
+@admin_bp.route('/payments/reconcile', methods=['GET', 'POST'])
+@admin_required
+def reconcile_payments():
+    result = None
+    wants_json = request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+    if request.method == 'POST':
+        upload = request.files.get('statement')
+        if not upload or not upload.filename:
+            if wants_json:
+                return jsonify({'error': 'No statement file uploaded'}), 400
+            flash('Choose a bank statement CSV to reconcile.', 'warning')
+            return redirect(url_for('admin.reconcile_payments'))
+
+        preview = request.form.get('preview') in ('1', 'on', 'true')
+        try:
+            result = reconcile_statement(io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''),
+                                         confirm=not preview)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            db.session.rollback()
+            if wants_json:
+                return jsonify({'error': f'Could not read statement: {e}'}), 400
+            flash(f'Could not read statement: {e}', 'danger')
+            return redirect(url_for('admin.reconcile_payments'))
+
+        if wants_json:
+            return jsonify(dict(result.as_dict(), preview=preview))
+        if result.confirmed:
+            verb = 'can be confirmed' if preview else 'confirmed'
+            flash(f'{result.confirmed} payments {verb}.', 'success')
+        if result.issue_count:
+            flash(f'{result.issue_count} statement lines need attention, see below.', 'warning')
+    else:
+        preview = False
+
+    pending = Payment.query.filter_by(status='pending').count()
+    return render_template('admin/reconcile_payments.html', result=result, preview=preview, pending=pending,
+                           unreferenced=unreferenced_payments(),
+                           reference_columns=REFERENCE_COLUMNS, amount_columns=AMOUNT_COLUMNS)
+
+@admin_bp.route('/payments/<int:payment_id>/confirm', methods=['POST'])
+@admin_required
+def confirm_payment_manually(payment_id):
+    if confirm_payment(payment_id):
+        flash(f'Payment #{payment_id} confirmed.', 'success')
+    else:
+        flash(f'Payment #{payment_id} is not pending.', 'info')
+    return redirect(url_for('admin.reconcile_payments'))
+
 @admin_bp.route('/courses', methods=['GET', 'POST'])
 @admin_required
 def manage_courses():
@@ -86,7 +210,10 @@ def manage_courses():
                     stream=request.form.get('stream')
                 )
                 db.session.add(new_course)
+                bump_counter('courses')
                 db.session.commit()
+                index_course(new_course)
+                invalidate_catalogue()
                 flash('Course added successfully.', 'success')
             return redirect(url_for('admin.manage_courses'))
             
@@ -103,6 +230,43 @@ def manage_courses():
 
     return render_template('admin/courses.html', courses=courses)
 
+@admin_bp.route('/courses/export')
+@admin_required
+def export_catalogue():
+    export_format = request.args.get('format', 'json')
+    if export_format not in EXPORT_FORMATS:
+        export_format = 'json'
+    if export_format == 'yaml' and not yaml_supported():
+        flash("YAML export needs the 'PyYAML' package.", 'danger')
+        return redirect(url_for('admin.manage_courses'))
+
+    response = Response(stream_with_context(stream_catalogue(export_format)), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=catalogue.{export_format}'
+    return response
+
+@admin_bp.route('/courses/import', methods=['POST'])
+@admin_required
+def import_catalogue_file():
+    upload = request.files.get('catalogue_file')
+    if not upload or not upload.filename:
+        flash('Choose a JSON or YAML catalogue file to import.', 'warning')
+        return redirect(url_for('admin.manage_courses'))
+
+    try:
+        document = load_document(upload.read().decode('utf-8-sig'), upload.filename)
+        summary = import_catalogue(document)
+    except UnicodeDecodeError:
+        flash('Catalogue files must be UTF-8 text.', 'danger')
+    except CatalogueImportError as e:
+        flash(f"Nothing was imported. {'; '.join(e.errors[:10])}"
+              + (f' (and {len(e.errors) - 10} more problems)' if len(e.errors) > 10 else ''), 'danger')
+    except Exception as e:
+        flash(f'Error importing catalogue: {e}', 'danger')
+    else:
+        flash('Imported catalogue: {created} courses created, {updated} updated, '
+              '{sections} sections and {videos} videos.'.format(**summary), 'success')
+    return redirect(url_for('admin.manage_courses'))
+
 @admin_bp.route('/courses/<int:course_id>/videos', methods=['GET', 'POST'])
 @admin_required
 def manage_course_videos(course_id):
@@ -118,6 +282,7 @@ def manage_course_videos(course_id):
                 section = CourseSection(course_id=course.id, title=title, section_order=order)
                 db.session.add(section)
                 db.session.commit()
+                invalidate_curriculum(course.id)
                 flash('Section created.', 'success')
             else:
                 flash('Section title required.', 'danger')
@@ -139,22 +304,17 @@ def manage_course_videos(course_id):
                 )
                 db.session.add(vid)
                 db.session.commit()
+                invalidate_curriculum(course.id)
                 flash('Video added.', 'success')
             else:
                 flash('Title and URL required.', 'danger')
             
         return redirect(url_for('admin.manage_course_videos', course_id=course.id))
         
-    # Fetch sections ordered, and videos
-    sections = CourseSection.query.filter_by(course_id=course.id).order_by(CourseSection.section_order).all()
-    # Also fetch videos that might not be in a section (orphaned or legacy)
-    # Strategy: We will attach videos to sections in the template or pre-process here
-    # Actually, SQLA relationship 'sections' on Course does not eager load videos by default. 
-    # Let's rely on relationships: section.videos
-    
-    orphaned_videos = CourseVideo.query.filter_by(course_id=course.id, section_id=None).all()
+    # Fetch sections ordered with their videos, plus videos not in a section (orphaned or legacy)
+    curriculum = load_curriculum(course.id)
     
-    return render_template('admin/manage_videos.html', course=course, sections=sections, orphaned_videos=orphaned_videos)
+    return render_template('admin/manage_videos.html', course=course, sections=curriculum.sections, orphaned_videos=curriculum.orphaned_videos)
 
 @admin_bp.route('/courses/sections/delete/<int:section_id>')
 @admin_required
@@ -163,6 +323,7 @@ def delete_section(section_id):
     course_id = section.course_id
     db.session.delete(section)
     db.session.commit()
+    invalidate_curriculum(course_id)
     flash('Section deleted.', 'success')
     return redirect(url_for('admin.manage_course_videos', course_id=course_id))
 
@@ -175,6 +336,7 @@ def delete_course_video(video_id):
     course_id = video.course_id
     db.session.delete(video)
     db.session.commit()
+    invalidate_curriculum(course_id)
     flash('Video deleted.', 'success')
     return redirect(url_for('admin.manage_course_videos', course_id=course_id))
 
@@ -182,8 +344,13 @@ def delete_course_video(video_id):
 @admin_required
 def delete_course(course_id):
     course = Course.query.get_or_404(course_id)
+    bump_counter('courses', -1)
+    forget_course(course_id)
     db.session.delete(course)
     db.session.commit()
+    invalidate_curriculum(course_id)
+    remove_course(course_id)
+    invalidate_catalogue()
     flash('Course deleted successfully.', 'success')
     return redirect(url_for('admin.manage_courses'))
 
@@ -206,6 +373,8 @@ def edit_course(course_id):
         
         try:
             db.session.commit()
+            index_course(course)
+            invalidate_catalogue()
             flash('Course updated successfully.', 'success')
             return redirect(url_for('admin.manage_courses'))
         except Exception as e:
@@ -217,25 +386,55 @@ def edit_course(course_id):
 @admin_bp.route('/report')
 @admin_required
 def generate_report():
-    enrollments = db.session.query(Enrollment, User, Course).select_from(Enrollment).join(StudentDetails).join(User).join(Course).all()
-    
-    # Header Row
-    data = [['ID', 'Student Name', 'Email', 'Course', 'Code', 'Date', 'Status']]
-    
-    # Data Rows
-    for enr, user, course in enrollments:
-        data.append([
-            str(enr.id),
-            user.name,
-            user.email,
-            course.name,
-            course.course_code,
-            enr.date_enrolled.strftime('%Y-%m-%d'),
-            enr.status.title()
-        ])
-        
-    pdf = generate_pdf_report(data, title="University Enrollment Report")
-    return send_file(pdf, as_attachment=True, download_name='enrollment_report.pdf', mimetype='application/pdf')
+    report_format = request.args.get('format', 'pdf')
+    filters = parse_enrollment_filters(request.args)
+
+    if report_format == 'csv':
+        response = Response(stream_with_context(stream_csv(iter_report_rows(filters))), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=enrollment_report.csv'
+        return response
+
+    if report_format not in REPORT_EXTENSIONS:
+        report_format = 'pdf'
+    if report_format == 'xlsx' and not xlsx_supported():
+        flash("Excel export needs the 'openpyxl' package.", 'danger')
+        return redirect(url_for('admin.enrollments'))
+
+    # PDF and Excel are rendered by the background pool; identical requests share a job
+    job, created = enqueue_report(filters, report_format=report_format, requested_by=current_user.id)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(report_job_status(job)), 202
+    if not created:
+        flash('An identical report was requested recently, showing that one.', 'info')
+    return redirect(url_for('admin.report_job', job_id=job.id))
+
+@admin_bp.route('/report/jobs/<job_id>')
+@admin_required
+def report_job(job_id):
+    job = ReportJob.query.get_or_404(job_id)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(report_job_status(job))
+    return render_template('admin/report_job.html', job=job)
+
+@admin_bp.route('/report/jobs/<job_id>/download')
+@admin_required
+def download_report(job_id):
+    job = ReportJob.query.get_or_404(job_id)
+    if job.status != 'done' or not job.file_path or not os.path.exists(job.file_path):
+        flash('This report is not ready yet.', 'warning')
+        return redirect(url_for('admin.report_job', job_id=job.id))
+
+    extension = REPORT_EXTENSIONS[job.report_format]
+    return send_file(job.file_path, as_attachment=True, download_name=f'enrollment_report.{extension}')
+
+def report_job_status(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'format': job.report_format,
+        'error': job.error,
+        'download_url': url_for('admin.download_report', job_id=job.id) if job.status == 'done' else None,
+    }
 
 @admin_bp.route('/settings', methods=['GET', 'POST'])
 @admin_required
@@ -276,12 +475,13 @@ def edit_student(user_id):
     
     if request.method == 'POST':
         user.name = request.form.get('name')
-        user.email = request.form.get('email')
+        user.email = normalise_email(request.form.get('email'))
         details.phone = request.form.get('phone')
         details.dob = request.form.get('dob')
         
         try:
             db.session.commit()
+            index_student(user)
             flash('Student details updated successfully.', 'success')
             return redirect(url_for('admin.manage_students'))
         except Exception as e:
@@ -293,8 +493,63 @@ def edit_student(user_id):
 @admin_bp.route('/enrollments')
 @admin_required
 def enrollments():
-    # Helper to avoid ambiguous join: start from Enrollment, join StudentDetails, then User, then Course
-    all_enrollments = db.session.query(Enrollment, User, Course).select_from(Enrollment).join(StudentDetails).join(User).join(Course).all()
-    return render_template('admin/enrollments.html', enrollments=all_enrollments)
+    filters = parse_enrollment_filters(request.args)
+    cursor = request.args.get('after')
+    page, next_cursor = enrollments_page(filters, cursor=cursor, per_page=ENROLLMENTS_PER_PAGE)
+
+    # Keep the active filters on pagination links
+    filter_args = {k: v for k, v in request.args.items() if k != 'after' and v}
+    courses = db.session.query(Course.id, Course.name, Course.course_code).order_by(Course.name).all()
+
+    return render_template('admin/enrollments.html',
+                           enrollments=page,
+                           next_cursor=next_cursor,
+                           is_first_page=not cursor,
+                           filter_args=filter_args,
+                           courses=courses,
+                           statuses=ENROLLMENT_STATUSES,
+                           transition_targets=TRANSITIONS,
+                           xlsx_available=xlsx_supported())
+
+@admin_bp.route('/enrollments/transition', methods=['POST'])
+@admin_required
+def transition_enrollments_bulk():
+    # JSON: {"target_status": ..., "ids": [...]} or {"target_status": ..., "filters": {...}}, optional "notify"
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        target = payload.get('target_status')
+        ids = payload.get('ids')
+        filters = parse_enrollment_filters(MultiDict(payload.get('filters') or {}))
+        notify = bool(payload.get('notify', True))
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            return jsonify({'error': 'ids must be a list of integers'}), 400
+    else:
+        target = request.form.get('target_status')
+        ids = request.form.getlist('ids', type=int) if request.form.get('scope') != 'filter' else None
+        filters = parse_enrollment_filters(request.form)
+        notify = bool(request.form.get('notify'))
+
+    filter_args = {k: v for k, v in request.form.items() if k in ('status', 'course_id', 'date_from', 'date_to') and v}
+    if ids is not None and not ids:
+        if request.is_json:
+            return jsonify({'error': 'No enrollments selected'}), 400
+        flash('Select at least one enrollment.', 'warning')
+        return redirect(url_for('admin.enrollments', **filter_args))
+
+    try:
+        summary = transition_enrollments(target, filters=filters, ids=ids, notify=notify)
+    except TransitionError as e:
+        if request.is_json:
+            return jsonify({'error': str(e)}), 400
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.enrollments', **filter_args))
 
-    return render_template('admin/enrollments.html', enrollments=all_enrollments)
+    if request.is_json:
+        return jsonify(summary)
+    message = f"{summary['updated']} enrollments moved to {target.replace('_', ' ')}."
+    if summary['seats_released']:
+        message += f" {summary['seats_released']} seats released."
+    if summary['mails_queued']:
+        message += f" {summary['mails_queued']} notifications queued."
+    flash(message, 'success' if summary['updated'] else 'info')
+    return redirect(url_for('admin.enrollments', **filter_args))
@@ -1,6 +1,11 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from models import db, User, StudentDetails
+from models import db, User, StudentDetails, normalise_email
+from services.mail_outbox import enqueue_mail
+from services.search import index_student
+from services.analytics import bump_counter
+from services.passwords import verify_login, VerifierBusy
+from services.password_reset import issue_reset_code, check_reset_code, consume_reset_codes, VALID, EXPIRED
 from werkzeug.security import check_password_hash
 from datetime import datetime
 
@@ -14,12 +19,20 @@ def login():
         return redirect(url_for('student.dashboard'))
 
     if request.method == 'POST':
-        email = request.form.get('email')
+        email = normalise_email(request.form.get('email'))
         password = request.form.get('password')
         
         user = User.query.filter_by(email=email).first()
         
-        if user and user.check_password(password):
+        try:
+            # Verified in the password pool; an outdated hash is upgraded here
+            valid = user is not None and verify_login(user, password)
+        except VerifierBusy:
+            flash('Too many sign-ins right now. Please try again in a moment.', 'warning')
+            return render_template('auth/login.html'), 503
+
+        if valid:
+            db.session.commit()
             login_user(user)
             flash('Login successful!', 'success')
             if user.role == 'admin':
@@ -37,7 +50,7 @@ def register():
 
     if request.method == 'POST':
         name = request.form.get('name')
-        email = request.form.get('email')
+        email = normalise_email(request.form.get('email'))
         password = request.form.get('password')
         confirm_password = request.form.get('confirm_password')
 
@@ -63,8 +76,10 @@ def register():
         
         student_details = StudentDetails(user_id=new_user.id, enrollment_no=enroll_no)
         db.session.add(student_details)
+        bump_counter('students')
         
         db.session.commit()
+        index_student(new_user)
         
         flash('Account created! You can now login.', 'success')
         return redirect(url_for('auth.login'))
@@ -85,42 +100,25 @@ def forgot_password():
 
     if request.method == 'POST':
         try:
-            email = request.form.get('email')
+            email = normalise_email(request.form.get('email'))
             user = User.query.filter_by(email=email).first()
             
             if user:
-                import random
-                from datetime import timedelta
-                
-                # Generate 6-digit numeric OTP
-                otp = f"{random.randint(100000, 999999)}"
-                user.reset_otp = otp
-                user.reset_otp_expiry = datetime.utcnow() + timedelta(minutes=15)
-                db.session.commit()
+                otp = issue_reset_code(user.email)
                 
-                # Create a link that auto-fills the OTP on the manual reset page
-                reset_link = f"http://{request.host}{url_for('auth.manual_reset', otp=otp)}"
+                # Create a link that auto-fills the email and OTP on the manual reset page
+                reset_link = f"http://{request.host}{url_for('auth.manual_reset', email=user.email, otp=otp)}"
                 
                 print(f"\n[DEBUG] Verification OTP: {otp}\n[DEBUG] Link: {reset_link}\n")
                 
-                from flask import current_app
-                from flask_mail import Message
-                
-                # Use default sender if MAIL_USERNAME is not set/valid
-                sender_email = current_app.config.get('MAIL_USERNAME') or 'ikumbar59@gmail.com'
-
-                msg = Message('Password Reset Code',
-                              sender=sender_email,
-                              recipients=[user.email])
-                
-                msg.body = f'''Your Password Reset Code is: {otp}
+                body = f'''Your Password Reset Code is: {otp}
 
 Enter this code on the password reset page, or click this link:
 {reset_link}
 
 This code expires in 15 minutes.
 '''
-                msg.html = f'''
+                html = f'''
                 <div style="font-family: Arial, sans-serif; padding: 20px; text-align: center;">
                     <h2>Password Reset Request</h2>
                     <p>Your Verification Code is:</p>
@@ -131,15 +129,10 @@ This code expires in 15 minutes.
                 </div>
                 '''
                 
-                mail = current_app.extensions.get('mail')
-                if not mail:
-                    # Fallback initialization if mail extension is missing
-                    from flask_mail import Mail
-                    mail = Mail(current_app)
-
-                mail.send(msg)
+                # Delivered by the background mail workers
+                enqueue_mail(user.email, 'Password Reset Code', body, html=html)
                 flash('Check your email for the 6-digit verification code.', 'info')
-                return redirect(url_for('auth.manual_reset')) 
+                return redirect(url_for('auth.manual_reset', email=user.email)) 
 
             else:
                 flash('Email address not found.', 'danger')
@@ -159,50 +152,46 @@ def manual_reset():
         return redirect(url_for('student.dashboard'))
         
     otp_from_url = request.args.get('otp')
+    email_from_url = request.args.get('email')
     
     if request.method == 'POST':
+        email = normalise_email(request.form.get('email'))
         otp = request.form.get('token')
         password = request.form.get('password')
         confirm_password = request.form.get('confirm_password')
         
-        # If password fields are present, this is a PASSWORD CHANGE request
-        if password and confirm_password:
-             # We need to find the user by OTP again to be secure
-             # (In a real app, use a hidden field or session, but querying by OTP is fair if OTP is unique enough for small time window)
-             # Better: Use a hidden email field or session.
-             # Simplest for this context: Ask user to re-enter OTP or keep it hidden.
-             # I'll rely on the form submitting the OTP again as a hidden field or just reading it from 'token' input if it's there.
-             pass
+        # Codes are looked up by (email, hashed code); the code is re-checked on the password step too
+        outcome = check_reset_code(email, otp)
         
-        # First verify OTP
-        user = User.query.filter_by(reset_otp=otp).first()
-        
-        if not user:
-            flash("Invalid Code.", "danger")
-            return render_template('auth/manual_reset.html', otp=otp)
-            
-        if user.reset_otp_expiry < datetime.utcnow():
+        if outcome == EXPIRED:
             flash("Code expired. Please request a new one.", "warning")
             return redirect(url_for('auth.forgot_password'))
             
+        if outcome != VALID:
+            flash("Invalid Code.", "danger")
+            return render_template('auth/manual_reset.html', otp=otp, email=email)
+            
         # If only OTP provided (Validation step) -> Show password fields
         if not password:
-            return render_template('auth/manual_reset.html', otp=otp, valid_user=True)
+            return render_template('auth/manual_reset.html', otp=otp, email=email, valid_user=True)
             
         # If OTP + Password provided -> Update Password
         if password != confirm_password:
              flash("Passwords do not match.", "danger")
-             return render_template('auth/manual_reset.html', otp=otp, valid_user=True)
+             return render_template('auth/manual_reset.html', otp=otp, email=email, valid_user=True)
              
+        user = User.query.filter_by(email=email).first()
+        if not user:
+            flash("Invalid Code.", "danger")
+            return redirect(url_for('auth.forgot_password'))
         user.set_password(password)
-        user.reset_otp = None # Clear OTP
-        user.reset_otp_expiry = None
+        consume_reset_codes(email)
         db.session.commit()
         
         flash("Password updated successfully! Please login.", "success")
         return redirect(url_for('auth.login'))
             
-    return render_template('auth/manual_reset.html', otp=otp_from_url)
+    return render_template('auth/manual_reset.html', otp=otp_from_url, email=email_from_url)
 
 # Legacy route redirect (optional)
 @auth_bp.route('/reset-password/<token>')
@@ -1,10 +1,15 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort, make_response, g
 from flask_login import login_required, current_user
 from models import db, User, Course, StudentDetails, Enrollment, CourseVideo, CourseSection
 from models import db, User, Course, StudentDetails, Enrollment
-from utils import generate_pdf_report, send_email_with_attachment, generate_upi_qr
-import os
-from werkzeug.utils import secure_filename
+from utils import generate_pdf_report, generate_upi_qr, upi_payment_url
+from services.seat_reservation import reserve_seat, CourseNotFound, AlreadyEnrolled, CourseFull, ReservationBusy
+from services.curriculum import get_curriculum
+from services.student_dashboard import load_student_dashboard
+from services.search import search_courses, ranked_matches
+from services.catalogue import get_facets, get_facet_courses
+from services.payments import finalise_payment, new_idempotency_key, PaymentError
+from services.upload_store import store_upload, UploadError
 
 student_bp = Blueprint('student', __name__)
 
@@ -24,6 +29,8 @@ def student_required(func):
         if not current_user.is_authenticated or current_user.role != 'student':
             flash('Access denied. Students only.', 'danger')
             return redirect(url_for('auth.login'))
+        # Eager-loaded with the user by the user_loader, so this costs no query
+        g.student_details = current_user.student_details
         return func(*args, **kwargs)
     wrapper.__name__ = func.__name__
     return login_required(wrapper)
@@ -31,14 +38,13 @@ def student_required(func):
 @student_bp.route('/dashboard')
 @student_required
 def dashboard():
-    # Helper to get student details
-    details = StudentDetails.query.filter_by(user_id=current_user.id).first()
-    my_enrollments = Enrollment.query.filter_by(student_id=details.id).all() if details else []
+    # Details and enrollments (with course fields) in a single query
+    details = load_student_dashboard(current_user.id)
     
     return render_template('student/dashboard.html', 
                            title='Student Dashboard',
                            details=details,
-                           enrollments=my_enrollments)
+                           enrollments=details.enrollments if details else [])
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
@@ -49,7 +55,7 @@ def allowed_file(filename):
 @student_bp.route('/profile', methods=['GET', 'POST'])
 @student_required
 def profile():
-    detail = StudentDetails.query.filter_by(user_id=current_user.id).first()
+    detail = g.student_details
     
     if request.method == 'POST':
         detail.phone = request.form.get('phone')
@@ -65,19 +71,13 @@ def profile():
         if 'profile_image' in request.files:
             file = request.files['profile_image']
             if file and file.filename != '' and allowed_file(file.filename):
-                from werkzeug.utils import secure_filename
-                filename = secure_filename(file.filename)
-                # Ensure directory exists
-                upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', 'profile_pics')
-                os.makedirs(upload_folder, exist_ok=True)
-                
-                # Use a unique name to prevent cache issues or collisions
-                unique_filename = f"user_{current_user.id}_{filename}"
-                file_path = os.path.join(upload_folder, unique_filename)
-                file.save(file_path)
-                
-                # Save relative path to DB
-                detail.profile_image = f"uploads/profile_pics/{unique_filename}"
+                # Stored by content hash; thumbnails are built in the background
+                try:
+                    detail.profile_image = store_upload(file.stream, variants=True).path
+                except UploadError as e:
+                    db.session.rollback()
+                    flash(str(e), 'danger')
+                    return redirect(url_for('student.profile'))
         
         try:
             db.session.commit()
@@ -96,34 +96,33 @@ def courses():
     level = request.args.get('level')
     stream = request.args.get('stream')
     
-    student_details = StudentDetails.query.filter_by(user_id=current_user.id).first()
+    student_details = g.student_details
+    truncated = False
     
     # If using search, we might want to search across everything or just show matching courses
     if search_query:
-         # Search logic: find courses matching query
-         query = Course.query.filter(
-            (Course.name.ilike(f'%{search_query}%')) | 
-            (Course.course_code.ilike(f'%{search_query}%'))
-         )
-         all_courses = query.all()
+         # Search logic: ranked matches from the search index
+         ranked_ids, truncated = ranked_matches(search_courses, search_query)
+         rank = {course_id: position for position, course_id in enumerate(ranked_ids)}
+         all_courses = sorted(Course.query.filter(Course.id.in_(ranked_ids)).all(), key=lambda c: rank[c.id]) if ranked_ids else []
          display_mode = 'courses'
     
     elif not level:
-        # Step 1: Show Levels
+        # Step 1: Show Levels (from the cached catalogue facets)
         display_mode = 'levels'
-        # Pass static list of levels as defined in requirements
-        return render_template('student/courses.html', display_mode='levels')
+        return render_template('student/courses.html', display_mode='levels', levels=get_facets())
         
     elif level and not stream:
         # Step 2: Show Streams for the selected level
         display_mode = 'streams'
-        return render_template('student/courses.html', display_mode='streams', current_level=level)
+        level_facet = next((facet for facet in get_facets() if facet.name == level), None)
+        return render_template('student/courses.html', display_mode='streams', current_level=level,
+                               streams=level_facet.streams if level_facet else ())
         
     else:
         # Step 3: Show Courses for Level + Stream
         display_mode = 'courses'
-        query = Course.query.filter_by(level=level, stream=stream)
-        all_courses = query.all()
+        all_courses = get_facet_courses(level, stream)
 
     # Get IDs of courses the student is already enrolled in
     enrolled_course_ids = []
@@ -135,6 +134,7 @@ def courses():
                            courses=all_courses if display_mode == 'courses' else [], 
                            enrolled_ids=enrolled_course_ids, 
                            search_query=search_query,
+                           results_truncated=truncated,
                            display_mode='courses', # If we fell through to filter by level+stream
                            current_level=level,
                            current_stream=stream)
@@ -143,7 +143,7 @@ def courses():
 @student_required
 def course_details(course_id):
     course = Course.query.get_or_404(course_id)
-    student_details = StudentDetails.query.filter_by(user_id=current_user.id).first()
+    student_details = g.student_details
     
     is_enrolled = False
     if student_details:
@@ -152,46 +152,54 @@ def course_details(course_id):
             is_enrolled = True
             
     # Fetch sections and videos for preview
-    sections = CourseSection.query.filter_by(course_id=course.id).order_by(CourseSection.section_order).all()
-    orphaned_videos = CourseVideo.query.filter_by(course_id=course.id, section_id=None).all()
+    curriculum = get_curriculum(course.id)
     
-    return render_template('student/course_details.html', course=course, sections=sections, orphaned_videos=orphaned_videos, is_enrolled=is_enrolled)
+    return render_template('student/course_details.html', course=course, sections=curriculum.sections, orphaned_videos=curriculum.orphaned_videos, is_enrolled=is_enrolled)
 
 @student_bp.route('/enroll/<int:course_id>')
 @student_required
 def enroll(course_id):
-    student_details = StudentDetails.query.filter_by(user_id=current_user.id).first()
+    student_details = g.student_details
     
     if not student_details:
          # Should not happen if registered correctly, but safeguard
          flash('Student details missing.', 'danger')
          return redirect(url_for('student.dashboard'))
          
-    # Check if already enrolled
-    existing = Enrollment.query.filter_by(student_id=student_details.id, course_id=course_id).first()
-    if existing:
+    # Claim the seat and create the pending enrollment atomically
+    try:
+        enrollment_id = reserve_seat(student_details.id, course_id)
+    except CourseNotFound:
+        abort(404)
+    except AlreadyEnrolled:
         flash('You are already enrolled in this course.', 'warning')
         return redirect(url_for('student.courses'))
-        
-    # Check seats
-    course = Course.query.get_or_404(course_id)
-    if course.seats <= 0:
+    except CourseFull:
         flash('This course is full.', 'danger')
         return redirect(url_for('student.courses'))
-        
-    # Enroll with pending status
-    enrollment = Enrollment(student_id=student_details.id, course_id=course.id, status='pending_payment')
-    course.seats -= 1
-    db.session.add(enrollment)
-    db.session.commit()
+    except ReservationBusy:
+        flash('Many students are enrolling in this course right now. Please try again.', 'warning')
+        return redirect(url_for('student.courses'))
     
-    return redirect(url_for('student.payment_page', enrollment_id=enrollment.id))
+    return redirect(url_for('student.payment_page', enrollment_id=enrollment_id))
+
+# Using User's Provided UPI ID
+ADMIN_UPI_ID = "iranna4@ptyes"
+ADMIN_UPI_NAME = "Iranna (University)"
+
+def _upi_payment_fields(enrollment):
+    return {
+        'upi_id': ADMIN_UPI_ID,
+        'name': ADMIN_UPI_NAME,
+        'amount': enrollment.course.fee,
+        'transaction_note': f"Enrollment {enrollment.id}",
+    }
 
 @student_bp.route('/payment/<int:enrollment_id>', methods=['GET'])
 @student_required
 def payment_page(enrollment_id):
-    enrollment = Enrollment.query.get_or_404(enrollment_id)
-    student_details = StudentDetails.query.filter_by(user_id=current_user.id).first()
+    enrollment = db.get_or_404(Enrollment, enrollment_id)
+    student_details = g.student_details
     
     # Security check: ensure this enrollment belongs to the current user
     if enrollment.student_id != student_details.id:
@@ -202,29 +210,44 @@ def payment_page(enrollment_id):
         flash('You are already enrolled in this course.', 'info')
         return redirect(url_for('student.dashboard'))
 
-    # Generate UPI QR Code (Real)
-    # Using User's Provided UPI ID
-    admin_upi_id = "iranna4@ptyes" 
-    qr_b64, upi_url = generate_upi_qr(
-        upi_id=admin_upi_id, 
-        name="Iranna (University)", 
-        amount=enrollment.course.fee, 
-        transaction_note=f"Enrollment {enrollment.id}"
-    )
+    # The QR image itself is served (and cached) by payment_qr
+    upi_url = upi_payment_url(**_upi_payment_fields(enrollment))
+    qr_code = url_for('student.payment_qr', enrollment_id=enrollment.id)
 
-    return render_template('student/payment.html', enrollment=enrollment, course=enrollment.course, qr_code=qr_b64, upi_link=upi_url)
+    return render_template('student/payment.html', enrollment=enrollment, course=enrollment.course, qr_code=qr_code, upi_link=upi_url,
+                           idempotency_key=new_idempotency_key())
+
+@student_bp.route('/payment/<int:enrollment_id>/qr.png')
+@student_required
+def payment_qr(enrollment_id):
+    enrollment = db.get_or_404(Enrollment, enrollment_id)
+    student_details = g.student_details
+    if enrollment.student_id != student_details.id:
+        abort(404)
+
+    png, etag, _ = generate_upi_qr(**_upi_payment_fields(enrollment))
+    response = make_response(png)
+    response.mimetype = 'image/png'
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request)
 
 @student_bp.route('/payment/<int:enrollment_id>/process', methods=['POST'])
 @student_required
 def process_payment(enrollment_id):
-    enrollment = Enrollment.query.get_or_404(enrollment_id)
-    student_details = StudentDetails.query.filter_by(user_id=current_user.id).first()
+    enrollment = db.get_or_404(Enrollment, enrollment_id)
+    student_details = g.student_details
     
     if enrollment.student_id != student_details.id:
         flash('Access denied.', 'danger')
         return redirect(url_for('student.dashboard'))
     
     payment_method = request.form.get('payment_method')
+    # Rendered into the payment form, so a double-submitted form is recognised
+    idempotency_key = request.form.get('idempotency_key') or new_idempotency_key()
+    transaction_ref = None
+    receipt_image = None
 
     # Handle Bank Transfer
     if payment_method == 'bank_transfer':
@@ -236,20 +259,11 @@ def process_payment(enrollment_id):
             return redirect(url_for('student.payment_page', enrollment_id=enrollment.id))
             
         if receipt_file and allowed_file(receipt_file.filename):
-            filename = secure_filename(receipt_file.filename)
-            # Ensure directory exists
-            upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', 'receipts')
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            # Unique filename
-            unique_filename = f"receipt_{enrollment.id}_{filename}"
-            file_path = os.path.join(upload_folder, unique_filename)
-            receipt_file.save(file_path)
-            
-            # Update Enrollment
-            enrollment.transaction_reference = transaction_ref
-            enrollment.receipt_image = f"uploads/receipts/{unique_filename}"
- 
+            try:
+                receipt_image = store_upload(receipt_file.stream).path
+            except UploadError as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('student.payment_page', enrollment_id=enrollment.id))
         else:
              flash('Invalid file type for receipt.', 'danger')
              return redirect(url_for('student.payment_page', enrollment_id=enrollment.id))
@@ -257,81 +271,30 @@ def process_payment(enrollment_id):
     # Handle UPI Payment
     elif payment_method == 'upi':
         # Transaction reference is optional/not enforced for now as per user request
-        transaction_ref = request.form.get('transaction_reference') 
-        enrollment.transaction_reference = transaction_ref or "Manual-Confirmation"
-
-    # Determine Transaction ID for Record
-    import uuid
-    if payment_method == 'card':
-        transaction_id = str(uuid.uuid4())
-    else:
-        # For Bank Transfer and UPI, use the user-provided reference
-        transaction_id = request.form.get('transaction_reference')
-    
-    # Update Status
-    enrollment.status = 'enrolled'
-    db.session.commit()
-    
-    # Send email with attachment (Moved from enroll)
-    course = enrollment.course
-    subject = f"Enrollment Confirmed: {course.name}"
-    body = f"""Hello {current_user.name},
+        transaction_ref = request.form.get('transaction_reference') or None
 
-You have successfully enrolled in the following course:
-
-Course: {course.name} ({course.course_code})
-Credits: {course.credits}
-Description: {course.description}
-Course Material/Link: {course.link if course.link else 'N/A'}
-Transaction ID: {transaction_id}
-
-Please find attached the University Rules and Regulations.
-
-Happy Learning!
-University Admin"""
-    
-    # Path to the PDF file
-    pdf_path = os.path.join('static', 'files', 'rules.pdf')
-    
+    # Status change, payment record and confirmation mail commit together
     try:
-        # Check if file exists, if not maybe skip attachment or log warning
-        if os.path.exists(os.path.join(current_app.root_path, pdf_path)):
-             send_email_with_attachment(current_user.email, subject, body, attachment_path=pdf_path, attachment_name='University_Rules.pdf')
-        else:
-             print(f"Warning: Rules PDF not found at {pdf_path}")
-             # Send email without attachment or handle gracefully
-             # For now, just try sending, send_email_with_attachment handles errors usually? 
-             # We will just proceed.
-             pass
-    except Exception as e:
-        print(f"Error sending email: {e}")
-
-    flash(f'Payment successful! You are now enrolled in {course.name}.', 'success')
-    # Determine Transaction ID for Record
-    import uuid
-    if payment_method == 'card':
-        transaction_id = str(uuid.uuid4())
-    else:
-        # For Bank Transfer and UPI, use the user-provided reference
-        transaction_id = request.form.get('transaction_reference')
-    
-    # Update Status
-    enrollment.status = 'enrolled'
-    db.session.commit()
-    
-
-
-    return redirect(url_for('student.confirmation_page', enrollment_id=enrollment.id, tx_id=transaction_id))
-
+        payment, created = finalise_payment(enrollment.id, current_user, student_details.id, payment_method,
+                                            idempotency_key, reference=transaction_ref, receipt_image=receipt_image)
+    except PaymentError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('student.courses'))
 
+    if payment is None:
+        flash('This enrollment is not awaiting payment.', 'info')
+        return redirect(url_for('student.dashboard'))
 
+    if created:
+        flash(f'Payment successful! You are now enrolled in {enrollment.course.name}.', 'success')
+    return redirect(url_for('student.confirmation_page', enrollment_id=enrollment.id, tx_id=payment.transaction_id or 'Manual-Confirmation'))
 
 
 @student_bp.route('/confirmation/<int:enrollment_id>')
 @student_required
 def confirmation_page(enrollment_id):
-    enrollment = Enrollment.query.get_or_404(enrollment_id)
-    student_details = StudentDetails.query.filter_by(user_id=current_user.id).first()
+    enrollment = db.get_or_404(Enrollment, enrollment_id)
+    student_details = g.student_details
     
     if enrollment.student_id != student_details.id:
         return redirect(url_for('student.dashboard'))
@@ -344,7 +307,7 @@ def confirmation_page(enrollment_id):
 @student_required
 def watch_course(course_id):
     course = Course.query.get_or_404(course_id)
-    student_details = StudentDetails.query.filter_by(user_id=current_user.id).first()
+    student_details = g.student_details
     
     if not student_details:
         flash('Student details missing.', 'danger')
@@ -357,10 +320,7 @@ def watch_course(course_id):
         flash('You must be enrolled in this course to watch videos.', 'warning')
         return redirect(url_for('student.courses'))
         
-    # Fetch sections with videos (eager load if possible, but lazy load works with loop in template)
-    sections = CourseSection.query.filter_by(course_id=course.id).order_by(CourseSection.section_order).all()
-    
-    # Also get orphaned videos
-    orphaned_videos = CourseVideo.query.filter_by(course_id=course.id, section_id=None).all()
+    # Fetch sections with their videos (and orphaned videos) in one go
+    curriculum = get_curriculum(course.id)
     
-    return render_template('student/watch_course.html', course=course, sections=sections, orphaned_videos=orphaned_videos)
+    return render_template('student/watch_course.html', course=course, sections=curriculum.sections, orphaned_videos=curriculum.orphaned_videos)
@@ -1,7 +1,7 @@
 import os
 import sys
 from pyngrok import ngrok
-from app import create_app, db, User
+from app import create_app, db, User, start_background_workers
 
 # Define the port
 PORT = 5000
@@ -13,7 +13,7 @@ def start_app_with_tunnel():
         try:
             db.create_all()
             if not User.query.filter_by(role='admin').first():
-                admin = User(name='Admin User', email='ACV@gmail.com', role='admin')
+                admin = User(name='Admin User', email='acv@gmail.com', role='admin')
                 admin.set_password('ACV123')
                 db.session.add(admin)
                 db.session.commit()
@@ -39,6 +39,8 @@ def start_app_with_tunnel():
     # Store public URL in config for email links
     app.config['PUBLIC_URL'] = public_url
 
+    start_background_workers(app)
+
     # Update app to run without reloader to prevent creating multiple tunnels
     app.run(port=PORT, debug=False)
 
@@ -0,0 +1,213 @@
+from datetime import date, datetime, timedelta
+
+import click
+from sqlalchemy import select, update, delete, insert, func, tuple_, bindparam
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Course, Enrollment, AnalyticsCounter, EnrollmentDailyRollup
+
+# Rows in analytics_counters. The enrollments total is the sum of the daily rollup instead: a
+# single counter row would be updated by every reserve_seat() and serialise all enrollments
+COUNTERS = ('students', 'courses')
+
+# Day an enrollment is rolled up under; DATE() exists on MySQL, PostgreSQL and SQLite
+enrollment_day = func.date(Enrollment.date_enrolled)
+
+
+def _as_date(value):
+    # SQLite hands DATE() back as text
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+# Core UPDATE (not the ORM bulk-by-primary-key form) so a parameter list runs as executemany
+_rollup = EnrollmentDailyRollup.__table__
+_bump_rollup = (
+    update(_rollup)
+    .where(_rollup.c.day == bindparam('b_day'), _rollup.c.course_id == bindparam('b_course_id'),
+           _rollup.c.status == bindparam('b_status'))
+    .values(count=_rollup.c.count + bindparam('b_delta'))
+)
+
+
+def _rollup_params(key, delta):
+    day, course_id, status = key
+    return {'b_day': day, 'b_course_id': course_id, 'b_status': status, 'b_delta': delta}
+
+
+def bump_counter(name, delta=1):
+    """Adjusts a counter inside the caller's transaction."""
+    if delta:
+        db.session.execute(
+            update(AnalyticsCounter).where(AnalyticsCounter.name == name)
+            .values(value=AnalyticsCounter.value + delta),
+            execution_options={'synchronize_session': False},
+        )
+
+
+def record_enrollments(groups):
+    """
+    Applies (day, course_id, status, delta) changes to the daily rollup inside
+    the caller's transaction. Changes are netted per row and applied with one
+    executemany UPDATE; missing rows are created for positive deltas.
+    """
+    deltas = {}
+    for day, course_id, status, delta in groups:
+        key = (_as_date(day), course_id, status)
+        deltas[key] = deltas.get(key, 0) + delta
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    rollup_key = tuple_(EnrollmentDailyRollup.day, EnrollmentDailyRollup.course_id, EnrollmentDailyRollup.status)
+    keys = list(deltas)
+    existing = set()
+    for start in range(0, len(keys), 500):
+        existing.update(tuple(row) for row in db.session.execute(
+            select(EnrollmentDailyRollup.day, EnrollmentDailyRollup.course_id, EnrollmentDailyRollup.status)
+            .where(rollup_key.in_(keys[start:start + 500]))
+        ))
+
+    # Decrements always target existing rows
+    bulk = [_rollup_params(key, delta) for key, delta in deltas.items() if key in existing or delta < 0]
+    if bulk:
+        db.session.execute(_bump_rollup, bulk)
+    for key, delta in deltas.items():
+        if key in existing or delta < 0:
+            continue
+        day, course_id, status = key
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(EnrollmentDailyRollup).values(
+                    day=day, course_id=course_id, status=status, count=delta))
+        except IntegrityError:
+            # Another transaction created the row first
+            db.session.execute(_bump_rollup, [_rollup_params(key, delta)])
+
+
+def record_enrollment(enrolled_at, course_id, status):
+    """A new enrollment: one more in its (day, course, status) rollup row."""
+    record_enrollments([(enrolled_at, course_id, status, 1)])
+
+
+def record_status_change(enrolled_at, course_id, old_status, new_status, count=1):
+    if old_status != new_status:
+        record_enrollments([(enrolled_at, course_id, old_status, -count), (enrolled_at, course_id, new_status, count)])
+
+
+def enrollment_groups(*criteria):
+    """(day, course_id, status, count) of the enrollments matching criteria, for removal bookkeeping."""
+    return db.session.execute(
+        select(enrollment_day, Enrollment.course_id, Enrollment.status, func.count())
+        .where(*criteria)
+        .group_by(enrollment_day, Enrollment.course_id, Enrollment.status)
+    ).all()
+
+
+def record_enrollments_removed(groups):
+    """Takes groups from enrollment_groups() out of the rollup."""
+    record_enrollments([(day, course_id, status, -count) for day, course_id, status, count in groups])
+
+
+def forget_course(course_id):
+    """Drops a deleted course's rollup rows (its enrollments are deleted with it)."""
+    db.session.execute(
+        delete(EnrollmentDailyRollup).where(EnrollmentDailyRollup.course_id == course_id),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def rebuild_analytics():
+    """Recomputes the counters and the whole rollup from the source tables and commits."""
+    db.session.execute(delete(AnalyticsCounter))
+    db.session.execute(insert(AnalyticsCounter), [
+        {'name': 'students', 'value': db.session.scalar(select(func.count()).select_from(User).where(User.role == 'student'))},
+        {'name': 'courses', 'value': db.session.scalar(select(func.count()).select_from(Course))},
+    ])
+
+    # One GROUP BY pass over enrollments
+    db.session.execute(delete(EnrollmentDailyRollup))
+    db.session.execute(
+        insert(EnrollmentDailyRollup).from_select(
+            ['day', 'course_id', 'status', 'count'],
+            select(enrollment_day, Enrollment.course_id, Enrollment.status, func.count())
+            .group_by(enrollment_day, Enrollment.course_id, Enrollment.status),
+        )
+    )
+    db.session.commit()
+
+
+def seed_analytics():
+    """
+    Builds the counters and rollup when they have never been built. Run at
+    deploy time ('flask init-db') rather than on first read, so no request
+    races the seeding and every event after it is recorded. Returns True
+    when it seeded.
+    """
+    if db.session.execute(select(AnalyticsCounter.name).limit(1)).first() is not None:
+        return False
+    rebuild_analytics()
+    return True
+
+
+def read_counters():
+    counters = dict(db.session.execute(select(AnalyticsCounter.name, AnalyticsCounter.value)).all())
+    result = {name: counters.get(name, 0) for name in COUNTERS}
+    result['enrollments'] = int(db.session.scalar(select(func.coalesce(func.sum(EnrollmentDailyRollup.count), 0))))
+    return result
+
+
+def daily_enrollments(days=30, today=None):
+    """Enrollments per day (by enrollment date) for the last `days` days, zero-filled."""
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    per_day = {
+        _as_date(day): total for day, total in db.session.execute(
+            select(EnrollmentDailyRollup.day, func.sum(EnrollmentDailyRollup.count))
+            .where(EnrollmentDailyRollup.day >= start)
+            .group_by(EnrollmentDailyRollup.day)
+        ).all()
+    }
+    labels = [start + timedelta(days=i) for i in range(days)]
+    return [d.isoformat() for d in labels], [int(per_day.get(d, 0)) for d in labels]
+
+
+def analytics_summary(days=30):
+    """Everything the dashboard shows; reads only the counters and the rollup."""
+    counters = read_counters()
+    labels, values = daily_enrollments(days)
+    start = date.fromisoformat(labels[0])
+
+    by_status = dict(db.session.execute(
+        select(EnrollmentDailyRollup.status, func.sum(EnrollmentDailyRollup.count))
+        .group_by(EnrollmentDailyRollup.status)
+    ).all())
+    top_courses = db.session.execute(
+        select(Course.id, Course.course_code, Course.name, func.sum(EnrollmentDailyRollup.count).label('total'))
+        .join(Course, Course.id == EnrollmentDailyRollup.course_id)
+        .where(EnrollmentDailyRollup.day >= start)
+        .group_by(Course.id, Course.course_code, Course.name)
+        .order_by(func.sum(EnrollmentDailyRollup.count).desc())
+        .limit(10)
+    ).all()
+
+    return {
+        'counters': counters,
+        'daily': {'labels': labels, 'values': values},
+        'by_status': {status: int(total) for status, total in by_status.items() if total},
+        'top_courses': [
+            {'id': row.id, 'course_code': row.course_code, 'name': row.name, 'enrollments': int(row.total)}
+            for row in top_courses
+        ],
+    }
+
+
+def init_app(app):
+    @app.cli.command('rebuild-analytics')
+    def rebuild_analytics_command():
+        """Recompute dashboard counters and daily enrollment rollups."""
+        rebuild_analytics()
+        click.echo(f"Analytics rebuilt: {read_counters()}")
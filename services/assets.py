@@ -0,0 +1,326 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import threading
+
+import click
+from flask import current_app, request, send_from_directory, url_for, abort
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from fontTools import subset as font_subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    font_subset = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# Output name -> source files under static/, concatenated in order. style.css stays on its
+# own because it starts with an @import, and the student pages do not need Chart.js.
+BUNDLES = {
+    'vendor.css': ['css/bootstrap.min.css', 'css/all.min.css'],
+    'style.css': ['style.css'],
+    'modern.css': ['css/modern.css'],
+    'site.js': ['js/bootstrap.bundle.min.js'],
+    'admin.js': ['js/bootstrap.bundle.min.js', 'js/chart.js'],
+}
+MANIFEST_NAME = 'manifest.json'
+# Built files never change under a given name, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Accept-Encoding token -> suffix of the pre-compressed sibling
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_ICON_RE = re.compile(r'\bfa-([a-z0-9-]+)')
+_DYNAMIC_ICON_RE = re.compile(r'fa-\{\{(.*?)\}\}')
+_QUOTED_RE = re.compile(r"""['"]([a-z0-9-]+)['"]""")
+# Font Awesome glyph rules: .fa-user:before,.fa-person:before{content:"\f007"}
+_GLYPH_RULE_RE = re.compile(r'((?:\.fa-[a-z0-9-]+:{1,2}before,?)+)\{content:"\\([0-9a-f]+)"\}')
+_GLYPH_SELECTOR_RE = re.compile(r'\.fa-([a-z0-9-]+):')
+_FONT_FACE_RE = re.compile(r'@font-face\{[^}]*\}')
+_URL_RE = re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)(?:\s*format\(['"]?([a-z0-9-]+)['"]?\))?""")
+_SOURCE_MAP_RE = re.compile(r'^\s*(//|/\*)# sourceMappingURL=.*$', re.MULTILINE)
+
+
+def brotli_supported():
+    return brotli is not None
+
+
+def font_subsetting_supported():
+    return font_subset is not None and brotli is not None  # woff2 output needs brotli
+
+
+def minify_css(css):
+    """rcssmin when installed, else comment and whitespace stripping (/*! license */ comments are kept)."""
+    if rcssmin is not None:
+        return rcssmin.cssmin(css, keep_bang_comments=True)
+    css = re.sub(r'/\*(?!!)[\s\S]*?\*/', '', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    # The vendored scripts are already minified; only their source map comments go
+    js = _SOURCE_MAP_RE.sub('', js)
+    return rjsmin.jsmin(js, keep_bang_comments=True) if rjsmin is not None else js.strip()
+
+
+def used_icons(template_dir):
+    """Font Awesome icon names referenced by the templates, including fa-{{ 'a' if x else 'b' }}."""
+    icons = set()
+    for root, _, files in os.walk(template_dir):
+        for name in files:
+            if not name.endswith('.html'):
+                continue
+            with open(os.path.join(root, name), encoding='utf-8') as f:
+                text = f.read()
+            icons.update(_ICON_RE.findall(text))
+            for expression in _DYNAMIC_ICON_RE.findall(text):
+                icons.update(_QUOTED_RE.findall(expression))
+    return icons
+
+
+def prune_icon_rules(css, icons):
+    """Drops glyph rules for icons not in icons. Returns (css, codepoints of the kept glyphs)."""
+    codepoints = set()
+
+    def keep(match):
+        names = _GLYPH_SELECTOR_RE.findall(match.group(1))
+        if not icons.intersection(names):
+            return ''
+        codepoints.add(int(match.group(2), 16))
+        return match.group(0)
+
+    return _GLYPH_RULE_RE.sub(keep, css), codepoints
+
+
+def subset_font(data, codepoints):
+    """A WOFF2 font holding only the given codepoints."""
+    options = font_subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    font = TTFont(io.BytesIO(data))
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    font.flavor = 'woff2'
+    output = io.BytesIO()
+    font.save(output)
+    return output.getvalue()
+
+
+def hashed_name(name, data):
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+class AssetBuilder:
+    """
+    Builds BUNDLES from static_dir into dist_dir: minified, content-hashed,
+    with .gz (and, with the brotli package, .br) siblings next to each file,
+    plus a manifest mapping bundle names to built names.
+    """
+
+    def __init__(self, static_dir, template_dir, dist_dir):
+        self.static_dir = static_dir
+        self.template_dir = template_dir
+        self.dist_dir = dist_dir
+        self.manifest = {}
+        self.icons = used_icons(template_dir)
+        self.codepoints = set()
+        self._fonts = {}  # source path -> built name
+
+    def _source_path(self, path):
+        return os.path.join(self.static_dir, *path.split('/'))
+
+    def _read(self, path):
+        with open(self._source_path(path), 'rb') as f:
+            return f.read()
+
+    def _write(self, name, data):
+        """Writes data and its compressed siblings under dist_dir atomically."""
+        target = os.path.join(self.dist_dir, *name.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        outputs = [(target + '.gz', gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            outputs.append((target + '.br', brotli.compress(data, quality=11)))
+        # WOFF2 is compressed already; a sibling that saves nothing is not worth serving
+        outputs = [(target, data)] + [(path, content) for path, content in outputs if len(content) < len(data)]
+        for path, content in outputs:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.build-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+
+    def _emit(self, name, data):
+        built = hashed_name(name, data)
+        self._write(built, data)
+        self.manifest[name] = built
+        return built
+
+    def _font(self, source):
+        # Fonts are only built once the CSS bundles have been pruned, so every used codepoint is known
+        if source not in self._fonts:
+            data = self._read(source)
+            if font_subsetting_supported() and self.codepoints:
+                # The TrueType original, when shipped alongside, decodes more reliably than the WOFF2
+                original = posixpath.splitext(source)[0] + '.ttf'
+                original = self._read(original) if os.path.exists(self._source_path(original)) else data
+                try:
+                    data = subset_font(original, self.codepoints)
+                except Exception as e:
+                    print(f"Could not subset {source}, copying it whole: {e}")
+            built = hashed_name(f"webfonts/{posixpath.basename(source)}", data)
+            self._write(built, data)
+            self._fonts[source] = built
+        return self._fonts[source]
+
+    def _rewrite_font_faces(self, css, source):
+        """Points @font-face rules at built WOFF2 files; TTF fallbacks and missing fonts are dropped."""
+        base = posixpath.dirname(source)
+
+        def rewrite(match):
+            rule = match.group(0)
+            sources = []
+            for url, font_format in _URL_RE.findall(rule):
+                path = posixpath.normpath(posixpath.join(base, url))
+                if font_format == 'woff2' and os.path.exists(self._source_path(path)):
+                    sources.append(f'url({self._font(path)}) format("woff2")')
+            if not sources:
+                return ''
+            return re.sub(r'src:[^;}]*', 'src:' + ','.join(sources), rule, count=1)
+
+        return _FONT_FACE_RE.sub(rewrite, css)
+
+    def build(self):
+        bundles = {}
+        pending_fonts = []
+        for name, sources in BUNDLES.items():
+            parts = bundles[name] = []
+            for source in sources:
+                text = self._read(source).decode('utf-8')
+                if name.endswith('.css'):
+                    if not source.endswith('.min.css'):
+                        text = minify_css(text)
+                    text, codepoints = prune_icon_rules(text, self.icons)
+                    self.codepoints |= codepoints
+                    if '@font-face' in text:
+                        pending_fonts.append((name, len(parts), source))
+                else:
+                    text = minify_js(text)
+                parts.append(text)
+
+        for name, index, source in pending_fonts:
+            bundles[name][index] = self._rewrite_font_faces(bundles[name][index], source)
+
+        for name, parts in bundles.items():
+            separator = '\n' if name.endswith('.css') else ';\n'
+            self._emit(name, separator.join(parts).encode('utf-8'))
+
+        self.manifest.update({f"webfonts/{posixpath.basename(source)}": built for source, built in self._fonts.items()})
+        fd, tmp_path = tempfile.mkstemp(dir=self.dist_dir, prefix='.build-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(self.dist_dir, MANIFEST_NAME))
+        return self.manifest
+
+
+def dist_dir(app):
+    return app.config.get('ASSET_DIST_DIR') or os.path.join(app.root_path, 'static', 'dist')
+
+
+def build_assets(app):
+    builder = AssetBuilder(os.path.join(app.root_path, 'static'),
+                           os.path.join(app.root_path, app.template_folder), dist_dir(app))
+    return builder.build()
+
+
+class AssetManifest:
+    """
+    The built manifest, read once. When it is missing (no 'flask build-assets'
+    at deploy time) the assets are built on first use.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._manifest is None:
+            with self._lock:
+                if self._manifest is None:
+                    path = os.path.join(dist_dir(self.app), MANIFEST_NAME)
+                    try:
+                        with open(path) as f:
+                            self._manifest = json.load(f)
+                    except FileNotFoundError:
+                        print("Asset manifest missing, building assets (run 'flask build-assets' when deploying)")
+                        self._manifest = build_assets(self.app)
+        return self._manifest
+
+    def reset(self):
+        self._manifest = None
+
+
+def asset_url(name):
+    """Template helper: the URL of the built, content-hashed file for a BUNDLES name."""
+    return url_for('asset', filename=current_app.extensions['assets'].get()[name])
+
+
+def serve_asset(filename):
+    """Serves a built file, pre-compressed when the client accepts it, with immutable caching."""
+    directory = dist_dir(current_app)
+    if filename == MANIFEST_NAME:
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding, suffix = None, ''
+    for token, candidate in ENCODINGS:
+        if request.accept_encodings[token] and os.path.exists(os.path.join(directory, *(filename + candidate).split('/'))):
+            encoding, suffix = token, candidate
+            break
+    response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=31536000)
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def init_app(app):
+    app.extensions['assets'] = AssetManifest(app)
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.add_url_rule('/assets/<path:filename>', 'asset', serve_asset)
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Bundle, minify, hash and pre-compress the static CSS/JS and fonts."""
+        manifest = build_assets(app)
+        app.extensions['assets'].reset()
+        for name in BUNDLES:
+            click.echo(f"{name} -> {manifest[name]}")
+        if not brotli_supported():
+            click.echo("brotli is not installed: only .gz siblings were written.")
+        if not font_subsetting_supported():
+            click.echo("fontTools/brotli are not installed: fonts were copied without subsetting.")
@@ -0,0 +1,99 @@
+import mimetypes
+import os
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+
+# Immutable snapshot of a static attachment; safe to share between threads
+Attachment = namedtuple('Attachment', 'filename content_type data')
+
+
+class AttachmentRegistry:
+    """
+    Static mail attachments (rules, brochures, ...) registered by key and held
+    in memory as bytes. A file is re-read only when its mtime changes, and the
+    mtime is checked at most once every check_seconds, so attaching a file to a
+    message normally costs no file I/O at all.
+    """
+
+    def __init__(self, root_path, entries, check_seconds=30):
+        self.root_path = root_path
+        self.check_seconds = check_seconds
+        self._entries = {key: (path, filename) for key, (path, filename) in entries.items()}
+        self._cache = {}  # key -> (mtime, checked_at, Attachment)
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def register(self, key, path, filename=None):
+        with self._lock:
+            self._entries[key] = (path, filename or os.path.basename(path))
+            self._cache.pop(key, None)
+
+    def get(self, key):
+        """Returns the Attachment for key, or None if its file is missing."""
+        path, filename = self._entries[key]
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached and now - cached[1] < self.check_seconds:
+            self.hits += 1
+            return cached[2]
+
+        full_path = os.path.join(self.root_path, path)
+        try:
+            mtime = os.stat(full_path).st_mtime
+        except FileNotFoundError:
+            with self._lock:
+                self._cache.pop(key, None)
+            return None
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == mtime:
+                self._cache[key] = (mtime, now, cached[2])
+                self.hits += 1
+                return cached[2]
+            with open(full_path, 'rb') as f:
+                data = f.read()
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            attachment = Attachment(filename, content_type, data)
+            self._cache[key] = (mtime, now, attachment)
+            self.loads += 1
+            return attachment
+
+    def preload(self):
+        for key in list(self._entries):
+            self.get(key)
+
+    def stats(self):
+        return {
+            'registered': len(self._entries),
+            'cached': len(self._cache),
+            'cached_bytes': sum(len(entry[2].data) for entry in self._cache.values()),
+            'loads': self.loads,
+            'hits': self.hits,
+        }
+
+
+def get_attachment(key):
+    return current_app.extensions['attachments'].get(key)
+
+
+def is_registered(key):
+    return key in current_app.extensions['attachments']
+
+
+def init_app(app):
+    registry = AttachmentRegistry(
+        app.root_path,
+        app.config.get('MAIL_ATTACHMENTS', {}),
+        check_seconds=app.config.get('MAIL_ATTACHMENT_CHECK_SECONDS', 30),
+    )
+    app.extensions['attachments'] = registry
+    # Load everything up front so the first message doesn't pay for it
+    registry.preload()
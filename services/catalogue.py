@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import select, func
+
+from models import db, Course
+from services.curriculum import LocalVersionStore, RedisVersionStore
+
+# Read-only browse data: level -> stream facets with course counts, and the
+# course summaries of one (level, stream) facet
+StreamFacet = namedtuple('StreamFacet', 'name course_count')
+LevelFacet = namedtuple('LevelFacet', 'name course_count streams')
+CourseSummary = namedtuple('CourseSummary', 'id course_code name description credits seats fee')
+
+FACETS_KEY = 'facets'
+VERSION_KEY = 'catalogue'
+
+
+def load_facets():
+    """Levels and their streams with course counts; a GROUP BY served by ix_courses_level_stream."""
+    rows = db.session.execute(
+        select(Course.level, Course.stream, func.count())
+        .where(Course.level.isnot(None), Course.stream.isnot(None))
+        .group_by(Course.level, Course.stream)
+        .order_by(Course.level, Course.stream)
+    ).all()
+
+    streams_by_level = {}
+    for level, stream, count in rows:
+        streams_by_level.setdefault(level, []).append(StreamFacet(stream, count))
+    return tuple(
+        LevelFacet(level, sum(s.course_count for s in streams), tuple(streams))
+        for level, streams in streams_by_level.items()
+    )
+
+
+def load_facet_courses(level, stream):
+    rows = db.session.execute(
+        select(Course.id, Course.course_code, Course.name, Course.description,
+               Course.credits, Course.seats, Course.fee)
+        .where(Course.level == level, Course.stream == stream)
+        .order_by(Course.name, Course.id)
+    ).all()
+    return tuple(CourseSummary(*row) for row in rows)
+
+
+class CatalogueCache:
+    """
+    Facets and per-facet course lists, served from memory.
+
+    Entries are dropped when the catalogue version changes (admin course
+    writes) and otherwise live for ttl seconds, which bounds how stale the
+    displayed seat counts can get. Seat availability itself is always
+    enforced by reserve_seat().
+    """
+
+    def __init__(self, ttl=30, version_store=None):
+        self.ttl = ttl
+        self.version_store = version_store or LocalVersionStore()
+        self._entries = {}  # key -> (version, loaded_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _get(self, key, loader):
+        version = self.version_store.get(VERSION_KEY)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and now - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = loader()
+
+        with self._lock:
+            self._entries[key] = (version, now, value)
+        return value
+
+    def facets(self):
+        return self._get(FACETS_KEY, load_facets)
+
+    def courses(self, level, stream):
+        return self._get((level, stream), lambda: load_facet_courses(level, stream))
+
+    def invalidate(self):
+        self.version_store.bump(VERSION_KEY)
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
+
+
+def get_facets():
+    return current_app.extensions['catalogue_cache'].facets()
+
+
+def get_facet_courses(level, stream):
+    return current_app.extensions['catalogue_cache'].courses(level, stream)
+
+
+def invalidate_catalogue():
+    """Drops cached facets and course lists. Call after committing course changes."""
+    current_app.extensions['catalogue_cache'].invalidate()
+
+
+def init_app(app):
+    redis_url = app.config.get('CURRICULUM_CACHE_REDIS_URL')
+    version_store = RedisVersionStore(redis_url, prefix='catalogue:version:') if redis_url else LocalVersionStore()
+    app.extensions['catalogue_cache'] = CatalogueCache(
+        ttl=app.config.get('CATALOGUE_CACHE_TTL', 30),
+        version_store=version_store,
+    )
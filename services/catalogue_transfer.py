@@ -0,0 +1,362 @@
+import json
+from datetime import datetime
+
+import click
+from sqlalchemy import select, insert, update, delete
+
+from models import db, Course, CourseSection, CourseVideo
+from services.analytics import bump_counter
+from services.catalogue import invalidate_catalogue
+from services.curriculum import invalidate_curriculum
+from services.search import reindex_all
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+FORMAT_VERSION = 1
+EXPORT_FORMATS = {'json': 'application/json', 'yaml': 'application/x-yaml'}
+COURSE_FIELDS = ('course_code', 'name', 'description', 'link', 'credits', 'seats', 'fee', 'category', 'level', 'stream')
+# Course.seats is the live remaining-seat counter kept by reserve_seat()/release_seats(), so a
+# document only sets it on courses it creates; overwriting it would resell or lose seats
+CREATE_ONLY_FIELDS = ('seats',)
+# Courses exported per round trip, and ids per IN (...) list
+CHUNK_SIZE = 200
+
+
+class CatalogueImportError(ValueError):
+    """The document is invalid; nothing was written. errors lists every problem found."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} problem(s) in catalogue: " + '; '.join(errors[:5]))
+        self.errors = errors
+
+
+def yaml_supported():
+    return yaml is not None
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Export
+
+def iter_catalogue(course_codes=None):
+    """
+    Yields courses as plain dicts with their sections and videos nested, in
+    course_code order. Works through the catalogue CHUNK_SIZE courses at a
+    time with plain row queries (three per chunk), so memory stays flat.
+    """
+    last_code = ''
+    while True:
+        query = (
+            select(Course.id, *(getattr(Course, field) for field in COURSE_FIELDS))
+            .where(Course.course_code > last_code)
+            .order_by(Course.course_code)
+            .limit(CHUNK_SIZE)
+        )
+        if course_codes is not None:
+            query = query.where(Course.course_code.in_(course_codes))
+        courses = db.session.execute(query).all()
+        if not courses:
+            return
+        ids = [course.id for course in courses]
+
+        sections_by_course = {}
+        for row in db.session.execute(
+            select(CourseSection.id, CourseSection.course_id, CourseSection.title, CourseSection.section_order)
+            .where(CourseSection.course_id.in_(ids))
+            .order_by(CourseSection.section_order, CourseSection.id)
+        ):
+            sections_by_course.setdefault(row.course_id, []).append(row)
+
+        videos_by_section = {}
+        for row in db.session.execute(
+            select(CourseVideo.course_id, CourseVideo.section_id, CourseVideo.title, CourseVideo.video_url,
+                   CourseVideo.duration, CourseVideo.sequence_order)
+            .where(CourseVideo.course_id.in_(ids))
+            .order_by(CourseVideo.sequence_order, CourseVideo.id)
+        ):
+            videos_by_section.setdefault((row.course_id, row.section_id), []).append({
+                'title': row.title, 'video_url': row.video_url,
+                'duration': row.duration, 'order': row.sequence_order,
+            })
+
+        for course in courses:
+            item = {field: getattr(course, field) for field in COURSE_FIELDS}
+            item['sections'] = [
+                {'title': s.title, 'order': s.section_order, 'videos': videos_by_section.get((course.id, s.id), [])}
+                for s in sections_by_course.get(course.id, [])
+            ]
+            item['videos'] = videos_by_section.get((course.id, None), [])
+            yield item
+
+        last_code = courses[-1].course_code
+
+
+def stream_catalogue(export_format='json', course_codes=None):
+    """Yields the catalogue document as text chunks, one course at a time."""
+    header = {'version': FORMAT_VERSION, 'exported_at': datetime.utcnow().replace(microsecond=0).isoformat()}
+    if export_format == 'yaml':
+        if yaml is None:
+            raise RuntimeError("The 'PyYAML' package is required for YAML export.")
+        yield yaml.safe_dump(header, sort_keys=False)
+        yield 'courses:\n'
+        for course in iter_catalogue(course_codes):
+            yield yaml.safe_dump([course], sort_keys=False, allow_unicode=True)
+        return
+
+    yield json.dumps(header)[:-1] + ', "courses": ['
+    for position, course in enumerate(iter_catalogue(course_codes)):
+        yield (',\n' if position else '\n') + json.dumps(course, ensure_ascii=False)
+    yield '\n]}\n'
+
+
+# Import
+
+def load_document(text, filename=''):
+    """Parses a catalogue document; YAML when the file name says so, JSON otherwise."""
+    if filename.lower().endswith(('.yaml', '.yml')):
+        if yaml is None:
+            raise CatalogueImportError(["The 'PyYAML' package is required to import YAML."])
+        try:
+            return yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise CatalogueImportError([f"Invalid YAML: {e}"])
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise CatalogueImportError([f"Invalid JSON: {e}"])
+
+
+def _number(value, kind, where, field, errors, default=None):
+    if value is None or value == '':
+        if default is None:
+            errors.append(f"{where}: {field} is required")
+        return default
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        errors.append(f"{where}: {field} must be a number")
+        return default
+
+
+def _text(value, where, field, errors, max_length, required=False):
+    value = value.strip() if isinstance(value, str) else value
+    if value in (None, ''):
+        if required:
+            errors.append(f"{where}: {field} is required")
+        return None
+    if not isinstance(value, str):
+        value = str(value)
+    if max_length and len(value) > max_length:
+        errors.append(f"{where}: {field} is longer than {max_length} characters")
+    return value
+
+
+def _clean_videos(videos, where, errors):
+    if not isinstance(videos or [], list):
+        errors.append(f"{where}: videos must be a list")
+        return []
+    cleaned = []
+    for position, video in enumerate(videos or []):
+        at = f"{where} video {position + 1}"
+        if not isinstance(video, dict):
+            errors.append(f"{at}: must be a mapping")
+            continue
+        cleaned.append({
+            'title': _text(video.get('title'), at, 'title', errors, 100, required=True),
+            'video_url': _text(video.get('video_url'), at, 'video_url', errors, 255, required=True),
+            'duration': _text(video.get('duration'), at, 'duration', errors, 20),
+            'sequence_order': _number(video.get('order'), int, at, 'order', errors, default=position),
+        })
+    return cleaned
+
+
+def validate_catalogue(document):
+    """Returns the cleaned course list, or raises CatalogueImportError listing every problem."""
+    errors = []
+    if isinstance(document, dict):
+        courses = document.get('courses')
+    else:
+        courses = None
+    if not isinstance(courses, list):
+        raise CatalogueImportError(["Document must be a mapping with a 'courses' list"])
+
+    cleaned = []
+    seen_codes = set()
+    for position, course in enumerate(courses):
+        where = f"course {position + 1}"
+        if not isinstance(course, dict):
+            errors.append(f"{where}: must be a mapping")
+            continue
+        code = _text(course.get('course_code'), where, 'course_code', errors, 20, required=True)
+        if code:
+            where = f"course {code}"
+            if code in seen_codes:
+                errors.append(f"{where}: appears more than once")
+            seen_codes.add(code)
+
+        values = {
+            'course_code': code,
+            'name': _text(course.get('name'), where, 'name', errors, 100, required=True),
+            'description': _text(course.get('description'), where, 'description', errors, None),
+            'link': _text(course.get('link'), where, 'link', errors, 255),
+            'credits': _number(course.get('credits'), int, where, 'credits', errors),
+            'seats': _number(course.get('seats'), int, where, 'seats', errors, default=30),
+            'fee': _number(course.get('fee'), float, where, 'fee', errors, default=500.0),
+            'category': _text(course.get('category'), where, 'category', errors, 50) or 'General',
+            'level': _text(course.get('level'), where, 'level', errors, 50),
+            'stream': _text(course.get('stream'), where, 'stream', errors, 50),
+        }
+
+        sections = course.get('sections') or []
+        if not isinstance(sections, list):
+            errors.append(f"{where}: sections must be a list")
+            sections = []
+        cleaned_sections = []
+        orders = set()
+        for index, section in enumerate(sections):
+            at = f"{where} section {index + 1}"
+            if not isinstance(section, dict):
+                errors.append(f"{at}: must be a mapping")
+                continue
+            order = _number(section.get('order'), int, at, 'order', errors, default=index)
+            # Videos are attached to their new section through (course, order)
+            if order in orders:
+                errors.append(f"{at}: order {order} is used by another section")
+            orders.add(order)
+            cleaned_sections.append({
+                'title': _text(section.get('title'), at, 'title', errors, 100, required=True),
+                'section_order': order,
+                'videos': _clean_videos(section.get('videos'), at, errors),
+            })
+
+        cleaned.append({
+            'values': values,
+            'sections': cleaned_sections,
+            'videos': _clean_videos(course.get('videos'), where, errors),
+        })
+
+    if errors:
+        raise CatalogueImportError(errors)
+    return cleaned
+
+
+def import_catalogue(document):
+    """
+    Upserts a catalogue document in one transaction and returns a summary.
+
+    Courses are matched on course_code: existing ones are updated in place
+    (their enrollments and remaining seats are untouched), new ones are
+    created, and courses not in the document are left alone. The sections and videos of every imported
+    course are replaced by the ones in the document. Every table is written
+    with a handful of multi-row statements rather than one per item.
+    """
+    courses = validate_catalogue(document)
+    codes = [course['values']['course_code'] for course in courses]
+
+    existing = {}
+    for chunk in _chunks(codes):
+        existing.update(db.session.execute(
+            select(Course.course_code, Course.id).where(Course.course_code.in_(chunk))
+        ).all())
+
+    try:
+        new_rows = [course['values'] for course in courses if course['values']['course_code'] not in existing]
+        if new_rows:
+            now = datetime.utcnow()
+            db.session.execute(insert(Course), [dict(row, created_at=now) for row in new_rows])
+        updated_rows = [
+            dict({field: value for field, value in course['values'].items() if field not in CREATE_ONLY_FIELDS},
+                 id=existing[course['values']['course_code']])
+            for course in courses if course['values']['course_code'] in existing
+        ]
+        if updated_rows:
+            # ORM bulk UPDATE by primary key: one executemany
+            db.session.execute(update(Course), updated_rows)
+
+        course_ids = dict(existing)
+        for chunk in _chunks([row['course_code'] for row in new_rows]):
+            course_ids.update(db.session.execute(
+                select(Course.course_code, Course.id).where(Course.course_code.in_(chunk))
+            ).all())
+        ids = list(course_ids.values())
+
+        # Replace the curriculum of every imported course
+        for chunk in _chunks(ids):
+            db.session.execute(delete(CourseVideo).where(CourseVideo.course_id.in_(chunk)),
+                               execution_options={'synchronize_session': False})
+            db.session.execute(delete(CourseSection).where(CourseSection.course_id.in_(chunk)),
+                               execution_options={'synchronize_session': False})
+
+        section_rows = []
+        for course in courses:
+            course_id = course_ids[course['values']['course_code']]
+            for section in course['sections']:
+                section_rows.append({'course_id': course_id, 'title': section['title'],
+                                     'section_order': section['section_order']})
+        if section_rows:
+            db.session.execute(insert(CourseSection), section_rows)
+
+        # The new section ids by (course, order), to attach their videos
+        new_section_ids = {}
+        for chunk in _chunks(ids):
+            for course_id, section_order, section_id in db.session.execute(
+                select(CourseSection.course_id, CourseSection.section_order, CourseSection.id)
+                .where(CourseSection.course_id.in_(chunk))
+            ):
+                new_section_ids[(course_id, section_order)] = section_id
+
+        video_rows = []
+        for course in courses:
+            course_id = course_ids[course['values']['course_code']]
+            for section in course['sections']:
+                section_id = new_section_ids[(course_id, section['section_order'])]
+                video_rows.extend(dict(video, course_id=course_id, section_id=section_id) for video in section['videos'])
+            video_rows.extend(dict(video, course_id=course_id, section_id=None) for video in course['videos'])
+        if video_rows:
+            db.session.execute(insert(CourseVideo), video_rows)
+
+        bump_counter('courses', len(new_rows))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for course_id in ids:
+        invalidate_curriculum(course_id)
+    invalidate_catalogue()
+    reindex_all()
+    return {
+        'created': len(new_rows),
+        'updated': len(updated_rows),
+        'sections': len(section_rows),
+        'videos': len(video_rows),
+    }
+
+
+def init_app(app):
+    @app.cli.command('export-catalogue')
+    @click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+    @click.option('--format', 'export_format', type=click.Choice(sorted(EXPORT_FORMATS)), default='json')
+    @click.option('--course', 'course_codes', multiple=True, help='Only these course codes (repeatable).')
+    def export_catalogue_command(output, export_format, course_codes):
+        """Write courses with their sections and videos as JSON or YAML."""
+        for chunk in stream_catalogue(export_format, list(course_codes) or None):
+            output.write(chunk)
+
+    @app.cli.command('import-catalogue')
+    @click.argument('input_file', type=click.File('r', encoding='utf-8-sig'))
+    def import_catalogue_command(input_file):
+        """Create or update courses, sections and videos from a JSON or YAML export."""
+        try:
+            summary = import_catalogue(load_document(input_file.read(), input_file.name))
+        except CatalogueImportError as e:
+            for error in e.errors:
+                click.echo(error, err=True)
+            raise click.ClickException('Nothing was imported.')
+        click.echo("Created {created} and updated {updated} courses ({sections} sections, {videos} videos).".format(**summary))
@@ -0,0 +1,150 @@
+import gzip
+import hashlib
+import threading
+
+from flask import request
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Set by the before_request hook for responses the middleware must pass through untouched
+SKIP_ENVIRON_KEY = 'compression.skip'
+DEFAULT_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+                     'application/javascript', 'application/json', 'image/svg+xml')
+
+
+def brotli_supported():
+    return brotli is not None
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware that compresses rendered responses and gives them weak
+    ETags.
+
+    A 200 response qualifies when it declares a Content-Length between
+    min_size and max_size, has a compressible mimetype and carries no
+    Content-Encoding, ETag, Content-Disposition or no-transform of its own.
+    That leaves streamed exports, send_file() downloads and the pre-compressed
+    /assets files alone. A qualifying GET body gets
+    W/"<sha1 of the uncompressed body>"; an If-None-Match that matches it is
+    answered with an empty 304. Otherwise the body is encoded with brotli or
+    gzip, whichever the client prefers (brotli only when installed).
+    """
+
+    def __init__(self, app, min_size=1024, max_size=8 * 1024 * 1024, mimetypes=DEFAULT_MIMETYPES,
+                 gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.max_size = max_size
+        self.mimetypes = frozenset(mimetypes)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self.metrics = {'compressed': 0, 'not_modified': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self.metrics[key] += value
+
+    def stats(self):
+        with self._lock:
+            return dict(self.metrics, brotli=brotli_supported())
+
+    def _qualifies(self, environ, status, headers):
+        if environ.get(SKIP_ENVIRON_KEY) or environ.get('REQUEST_METHOD') not in ('GET', 'POST'):
+            return False
+        if not status.startswith('200') or 'Content-Encoding' in headers or 'ETag' in headers:
+            return False
+        if 'Content-Disposition' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        try:
+            length = int(headers.get('Content-Length', ''))
+        except ValueError:
+            return False  # streamed
+        mimetype = headers.get('Content-Type', '').split(';', 1)[0].strip()
+        return self.min_size <= length <= self.max_size and mimetype in self.mimetypes
+
+    def _encoding(self, environ):
+        offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', '')).best_match(offered)
+
+    def __call__(self, environ, start_response):
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            if exc_info is not None and captured.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            return captured.setdefault('written', []).append
+
+        app_iter = self.app(environ, capture)
+        headers = Headers(captured['headers'])
+        if not self._qualifies(environ, captured['status'], headers):
+            write = start_response(captured['status'], captured['headers'], captured['exc_info'])
+            captured['sent'] = True
+            for chunk in captured.get('written', ()):
+                write(chunk)
+            return app_iter
+
+        try:
+            body = b''.join(captured.get('written', ())) + b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+        vary = headers.get('Vary')
+        headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+
+        if environ['REQUEST_METHOD'] == 'GET':
+            etag = hashlib.sha1(body).hexdigest()
+            headers['ETag'] = quote_etag(etag, weak=True)
+            if 'Cache-Control' not in headers:
+                # Per-user pages: the browser may keep them but asks before reusing them
+                headers['Cache-Control'] = 'private, no-cache'
+            if parse_etags(environ.get('HTTP_IF_NONE_MATCH')).contains_weak(etag):
+                for name in ('Content-Length', 'Content-Type'):
+                    headers.remove(name)
+                self._count(not_modified=1)
+                start_response('304 Not Modified', headers.to_wsgi_list())
+                return []
+
+        encoding = self._encoding(environ)
+        encoded = None
+        if encoding == 'br':
+            encoded = brotli.compress(body, quality=self.brotli_quality)
+        elif encoding == 'gzip':
+            encoded = gzip.compress(body, self.gzip_level)
+        if encoded is not None and len(encoded) < len(body):
+            headers['Content-Encoding'] = encoding
+            self._count(compressed=1, bytes_in=len(body), bytes_out=len(encoded))
+            body = encoded
+        headers['Content-Length'] = str(len(body))
+        start_response(captured['status'], headers.to_wsgi_list())
+        return [body]
+
+
+def init_app(app):
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+    middleware = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config.get('COMPRESS_MIN_SIZE', 1024),
+        max_size=app.config.get('COMPRESS_MAX_SIZE', 8 * 1024 * 1024),
+        mimetypes=app.config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES),
+        gzip_level=app.config.get('COMPRESS_GZIP_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESS_BROTLI_QUALITY', 4),
+    )
+    app.wsgi_app = middleware
+    app.extensions['compression'] = middleware
+    excluded = frozenset(app.config.get('COMPRESS_EXCLUDE_BLUEPRINTS', ()))
+
+    @app.before_request
+    def skip_excluded_blueprints():
+        if request.blueprint in excluded:
+            request.environ[SKIP_ENVIRON_KEY] = True
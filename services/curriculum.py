@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import namedtuple, OrderedDict
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, CourseSection, CourseVideo
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Read-only curriculum tree handed to templates. Plain tuples, so rendering
+# never touches the session and a tree can be shared between requests.
+CurriculumVideo = namedtuple('CurriculumVideo', 'id section_id title video_url duration sequence_order')
+CurriculumSection = namedtuple('CurriculumSection', 'id title section_order videos')
+Curriculum = namedtuple('Curriculum', 'course_id sections orphaned_videos')
+
+
+def load_curriculum(course_id):
+    """
+    Loads the sections and videos of a course in two queries, ordered in SQL.
+    Videos without a section are returned separately as orphaned_videos.
+    """
+    section_rows = db.session.execute(
+        select(CourseSection.id, CourseSection.title, CourseSection.section_order)
+        .where(CourseSection.course_id == course_id)
+        .order_by(CourseSection.section_order, CourseSection.id)
+    ).all()
+
+    video_rows = db.session.execute(
+        select(
+            CourseVideo.id,
+            CourseVideo.section_id,
+            CourseVideo.title,
+            CourseVideo.video_url,
+            CourseVideo.duration,
+            CourseVideo.sequence_order,
+        )
+        .where(CourseVideo.course_id == course_id)
+        .order_by(CourseVideo.sequence_order, CourseVideo.id)
+    ).all()
+
+    videos_by_section = {}
+    for row in video_rows:
+        videos_by_section.setdefault(row.section_id, []).append(CurriculumVideo(*row))
+
+    sections = tuple(
+        CurriculumSection(row.id, row.title, row.section_order, tuple(videos_by_section.get(row.id, ())))
+        for row in section_rows
+    )
+    return Curriculum(course_id, sections, tuple(videos_by_section.get(None, ())))
+
+
+class LocalVersionStore:
+    """Per-process version stamps. Fine for a single worker."""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, course_id):
+        return self._versions.get(course_id, 0)
+
+    def bump(self, course_id):
+        with self._lock:
+            self._versions[course_id] = self._versions.get(course_id, 0) + 1
+            return self._versions[course_id]
+
+
+class RedisVersionStore:
+    """Version stamps shared through Redis so every gunicorn worker sees invalidations."""
+
+    def __init__(self, url, prefix='curriculum:version:'):
+        if redis is None:
+            raise RuntimeError("The 'redis' package is required for CURRICULUM_CACHE_REDIS_URL.")
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, course_id):
+        value = self._client.get(f"{self._prefix}{course_id}")
+        return int(value) if value is not None else 0
+
+    def bump(self, course_id):
+        return self._client.incr(f"{self._prefix}{course_id}")
+
+
+class CurriculumCache:
+    """
+    LRU cache of curriculum trees keyed by course_id.
+
+    Each entry remembers the version stamp it was loaded under; an entry whose
+    stamp no longer matches the version store is treated as a miss. With a
+    per-process store other workers' invalidations are invisible, so a ttl
+    (seconds) also expires entries that old.
+    """
+
+    def __init__(self, max_size=256, version_store=None, ttl=None):
+        self.max_size = max_size
+        self.version_store = version_store or LocalVersionStore()
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, course_id):
+        version = self.version_store.get(course_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(course_id)  # (version, loaded_at, tree)
+            if entry is not None and entry[0] == version and not (self.ttl and now - entry[1] >= self.ttl):
+                self._entries.move_to_end(course_id)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        tree = load_curriculum(course_id)
+
+        with self._lock:
+            self._entries[course_id] = (version, now, tree)
+            self._entries.move_to_end(course_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return tree
+
+    def invalidate(self, course_id):
+        self.version_store.bump(course_id)
+        with self._lock:
+            self._entries.pop(course_id, None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+def get_curriculum(course_id):
+    """Cached load_curriculum() for the current app."""
+    return current_app.extensions['curriculum_cache'].get(course_id)
+
+
+def invalidate_curriculum(course_id):
+    """Drops the cached tree of a course. Call after committing section/video changes."""
+    current_app.extensions['curriculum_cache'].invalidate(course_id)
+
+
+def init_app(app):
+    redis_url = app.config.get('CURRICULUM_CACHE_REDIS_URL')
+    version_store = RedisVersionStore(redis_url) if redis_url else LocalVersionStore()
+    app.extensions['curriculum_cache'] = CurriculumCache(
+        max_size=app.config.get('CURRICULUM_CACHE_SIZE', 256),
+        version_store=version_store,
+        # Shared stamps make every invalidation visible; without them, fall back to expiring by age
+        ttl=None if redis_url else app.config.get('CURRICULUM_CACHE_TTL', 60),
+    )
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, and_, or_
+
+from models import db, User, Course, StudentDetails, Enrollment
+
+ENROLLMENT_STATUSES = ('pending_payment', 'enrolled', 'completed', 'dropped')
+
+
+def parse_enrollment_filters(args):
+    """
+    Reads the status / course / date range filters from request args.
+    Invalid values are ignored rather than raising, like the rest of the admin forms.
+    """
+    filters = {}
+
+    status = args.get('status')
+    if status in ENROLLMENT_STATUSES:
+        filters['status'] = status
+
+    course_id = args.get('course_id', type=int)
+    if course_id:
+        filters['course_id'] = course_id
+
+    for key in ('date_from', 'date_to'):
+        value = args.get(key)
+        if value:
+            try:
+                filters[key] = datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                pass
+
+    return filters
+
+
+def apply_enrollment_filters(stmt, filters):
+    """Adds the WHERE clauses for parsed filters to a statement selecting from enrollments."""
+    if 'status' in filters:
+        stmt = stmt.where(Enrollment.status == filters['status'])
+    if 'course_id' in filters:
+        stmt = stmt.where(Enrollment.course_id == filters['course_id'])
+    if 'date_from' in filters:
+        stmt = stmt.where(Enrollment.date_enrolled >= filters['date_from'])
+    if 'date_to' in filters:
+        # Inclusive of the whole end day
+        stmt = stmt.where(Enrollment.date_enrolled < filters['date_to'] + timedelta(days=1))
+    return stmt
+
+
+# Legacy rows can have no date_enrolled; they sort after every dated row
+NULL_DATE_CURSOR = 'none'
+
+
+def encode_cursor(date_enrolled, enrollment_id):
+    date_part = date_enrolled.isoformat() if date_enrolled is not None else NULL_DATE_CURSOR
+    return f"{date_part}_{enrollment_id}"
+
+
+def decode_cursor(cursor):
+    try:
+        date_part, id_part = cursor.rsplit('_', 1)
+        last_date = None if date_part == NULL_DATE_CURSOR else datetime.fromisoformat(date_part)
+        return last_date, int(id_part)
+    except (AttributeError, ValueError):
+        return None
+
+
+def enrollment_listing_query(filters):
+    """Flat projection of enrollments with student and course columns, newest first."""
+    stmt = (
+        select(
+            Enrollment.id,
+            Enrollment.date_enrolled,
+            Enrollment.status,
+            User.name.label('student_name'),
+            User.email.label('student_email'),
+            Course.id.label('course_id'),
+            Course.name.label('course_name'),
+            Course.course_code,
+        )
+        .select_from(Enrollment)
+        .join(StudentDetails, Enrollment.student_id == StudentDetails.id)
+        .join(User, StudentDetails.user_id == User.id)
+        .join(Course, Enrollment.course_id == Course.id)
+    )
+    return apply_enrollment_filters(stmt, filters)
+
+
+def enrollments_page(filters, cursor=None, per_page=50):
+    """
+    Returns one page of the listing and the cursor for the next page (or None).
+
+    Uses keyset pagination on (date_enrolled, id): the page after a cursor is
+    the rows strictly older than it, so the cost does not grow with the page
+    number the way OFFSET does. Rows without a date_enrolled come after every
+    dated row, by id. They are read as a second segment rather than relying on
+    where the database sorts NULLs (last in a MySQL/SQLite DESC, first in
+    PostgreSQL), so both segments are ordered by an index on every dialect.
+    """
+    base = enrollment_listing_query(filters)
+    position = decode_cursor(cursor) if cursor else None
+    rows = []
+
+    if position is None or position[0] is not None:
+        stmt = base.where(Enrollment.date_enrolled.isnot(None))
+        if position:
+            last_date, last_id = position
+            stmt = stmt.where(or_(
+                Enrollment.date_enrolled < last_date,
+                and_(Enrollment.date_enrolled == last_date, Enrollment.id < last_id),
+            ))
+        stmt = stmt.order_by(Enrollment.date_enrolled.desc(), Enrollment.id.desc()).limit(per_page + 1)
+        rows = db.session.execute(stmt).all()
+
+    if len(rows) <= per_page:
+        stmt = base.where(Enrollment.date_enrolled.is_(None))
+        if position and position[0] is None:
+            stmt = stmt.where(Enrollment.id < position[1])
+        stmt = stmt.order_by(Enrollment.id.desc()).limit(per_page + 1 - len(rows))
+        rows += db.session.execute(stmt).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].date_enrolled, rows[-1].id)
+    return rows, next_cursor
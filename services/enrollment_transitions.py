@@ -0,0 +1,128 @@
+from sqlalchemy import select, update
+
+from models import db, User, Course, StudentDetails, Enrollment
+from services.analytics import enrollment_groups, record_enrollments
+from services.enrollment_listing import apply_enrollment_filters
+from services.mail_outbox import enqueue_mails, wake_mail_workers
+from services.seat_reservation import release_seats
+
+# Target status -> the statuses an enrollment may be moved from
+TRANSITIONS = {
+    'enrolled': ('pending_payment',),
+    'completed': ('pending_payment', 'enrolled'),
+    'dropped': ('pending_payment', 'enrolled'),
+}
+# Moving to these gives the seat back to the course
+RELEASES_SEAT = ('dropped',)
+
+NOTIFICATIONS = {
+    'enrolled': ("Enrollment Confirmed: {course_name}",
+                 "Hello {name},\n\nYour enrollment in {course_name} ({course_code}) has been confirmed.\n\n"
+                 "Please find attached the University Rules and Regulations.\n\nHappy Learning!\nUniversity Admin"),
+    'completed': ("Course Completed: {course_name}",
+                  "Hello {name},\n\nYou have been marked as having completed {course_name} ({course_code}). "
+                  "Congratulations!\n\nUniversity Admin"),
+    'dropped': ("Enrollment Cancelled: {course_name}",
+                "Hello {name},\n\nYour enrollment in {course_name} ({course_code}) has been cancelled. "
+                "If you think this is a mistake, please contact the university office.\n\nUniversity Admin"),
+}
+
+
+class TransitionError(ValueError):
+    pass
+
+
+def _locked_batches(sources, filters, ids, batch_size):
+    """Yields lists of enrollment ids to move, locking each batch's rows."""
+    if ids is not None:
+        ids = sorted(set(ids))
+        for start in range(0, len(ids), batch_size):
+            batch = db.session.execute(
+                select(Enrollment.id)
+                .where(Enrollment.id.in_(ids[start:start + batch_size]), Enrollment.status.in_(sources))
+                .with_for_update()
+            ).scalars().all()
+            if batch:
+                yield batch
+        return
+
+    # Keyset over ids; moved rows drop out of the source statuses, so the filter stays valid
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            apply_enrollment_filters(select(Enrollment.id), filters)
+            .where(Enrollment.status.in_(sources), Enrollment.id > last_id)
+            .order_by(Enrollment.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def _notifications(target, criteria):
+    subject, body = NOTIFICATIONS[target]
+    rows = db.session.execute(
+        select(User.name, User.email, Course.name.label('course_name'), Course.course_code)
+        .select_from(Enrollment)
+        .join(StudentDetails, Enrollment.student_id == StudentDetails.id)
+        .join(User, StudentDetails.user_id == User.id)
+        .join(Course, Enrollment.course_id == Course.id)
+        .where(*criteria)
+    ).all()
+    attachment = 'university_rules' if target == 'enrolled' else None
+    return [
+        {
+            'recipient': row.email,
+            'subject': subject.format(**row._mapping),
+            'body': body.format(**row._mapping),
+            'attachment': attachment,
+        }
+        for row in rows
+    ]
+
+
+def transition_enrollments(target, filters=None, ids=None, notify=True, batch_size=1000):
+    """
+    Moves enrollments to target status in set-based batches and returns
+    {'updated', 'seats_released', 'mails_queued'}.
+
+    Enrollments are picked by an id list or by listing filters (see
+    parse_enrollment_filters); only those in a status TRANSITIONS allows
+    for target are touched, the rest are skipped. Each batch is one
+    transaction: a status UPDATE, one correlated seat UPDATE when the target
+    frees seats, the analytics rollup changes and one multi-row INSERT of
+    notification mails.
+    """
+    if target not in TRANSITIONS:
+        raise TransitionError(f"Cannot move enrollments to '{target}'.")
+    sources = TRANSITIONS[target]
+    summary = {'updated': 0, 'seats_released': 0, 'mails_queued': 0}
+
+    for batch in _locked_batches(sources, filters or {}, ids, batch_size):
+        in_batch = (Enrollment.id.in_(batch), Enrollment.status.in_(sources))
+        groups = enrollment_groups(*in_batch)
+        mails = _notifications(target, in_batch) if notify else []
+        if target in RELEASES_SEAT:
+            release_seats(*in_batch)
+
+        updated = db.session.execute(
+            update(Enrollment).where(*in_batch).values(status=target, hold_expires_at=None),
+            execution_options={'synchronize_session': False},
+        ).rowcount
+        changes = []
+        for day, course_id, status, count in groups:
+            changes += [(day, course_id, status, -count), (day, course_id, target, count)]
+        record_enrollments(changes)
+        summary['mails_queued'] += enqueue_mails(mails)
+        db.session.commit()
+
+        summary['updated'] += updated
+        if target in RELEASES_SEAT:
+            summary['seats_released'] += updated
+
+    if summary['mails_queued']:
+        wake_mail_workers()
+    return summary
@@ -0,0 +1,103 @@
+import threading
+import time
+from datetime import datetime
+
+import click
+from sqlalchemy import select, delete
+
+from models import db, Enrollment
+from services.analytics import enrollment_groups, record_enrollments_removed
+from services.seat_reservation import release_seats
+
+# Counters for the admin metrics endpoint, updated after every sweep
+sweeper_metrics = {
+    'runs': 0,
+    'holds_reclaimed_total': 0,
+    'last_reclaimed': 0,
+    'last_duration_ms': 0.0,
+    'last_run_at': None,
+}
+_metrics_lock = threading.Lock()
+
+
+def sweep_expired_holds(batch_size=500, now=None):
+    """
+    Releases seats held by 'pending_payment' enrollments past their deadline.
+
+    Each batch hands the seats back with one correlated UPDATE on courses and
+    removes the expired enrollments with one DELETE, so the student can enroll
+    again later. Returns the number of holds reclaimed.
+    """
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    reclaimed = 0
+
+    expired = (Enrollment.status == 'pending_payment', Enrollment.hold_expires_at < now)
+
+    while True:
+        ids = db.session.execute(
+            select(Enrollment.id)
+            .where(*expired)
+            .order_by(Enrollment.hold_expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            break
+
+        in_batch = (Enrollment.id.in_(ids), *expired)
+        release_seats(*in_batch)
+        groups = enrollment_groups(*in_batch)
+        deleted = db.session.execute(
+            delete(Enrollment).where(*in_batch),
+            execution_options={'synchronize_session': False},
+        ).rowcount
+        record_enrollments_removed(groups)
+        db.session.commit()
+
+        reclaimed += deleted
+        if len(ids) < batch_size:
+            break
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    with _metrics_lock:
+        sweeper_metrics['runs'] += 1
+        sweeper_metrics['holds_reclaimed_total'] += reclaimed
+        sweeper_metrics['last_reclaimed'] = reclaimed
+        sweeper_metrics['last_duration_ms'] = round(duration_ms, 2)
+        sweeper_metrics['last_run_at'] = now.isoformat()
+
+    return reclaimed
+
+
+def start_hold_sweeper(app):
+    """
+    Runs sweep_expired_holds every HOLD_SWEEP_INTERVAL seconds in a daemon
+    thread. Called by app.start_background_workers(), not by init_app().
+    """
+    interval = app.config.get('HOLD_SWEEP_INTERVAL', 0)
+    if not interval:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    sweep_expired_holds(batch_size=app.config.get('HOLD_SWEEP_BATCH_SIZE', 500))
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Hold sweep failed: {e}")
+
+    thread = threading.Thread(target=loop, name='hold-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+
+def init_app(app):
+    @app.cli.command('sweep-holds')
+    @click.option('--batch-size', default=None, type=int, help='Holds released per statement batch.')
+    def sweep_holds_command(batch_size):
+        """Release seats held by expired unpaid enrollments."""
+        reclaimed = sweep_expired_holds(batch_size=batch_size or app.config.get('HOLD_SWEEP_BATCH_SIZE', 500))
+        click.echo(f"Reclaimed {reclaimed} expired holds in {sweeper_metrics['last_duration_ms']} ms.")
@@ -0,0 +1,280 @@
+import mimetypes
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import select, update, delete, insert
+
+from models import db, OutboxMessage, MailDeadLetter
+from services.attachments import get_attachment, is_registered
+
+# How long a worker may hold claimed messages before others may retry them
+LEASE_SECONDS = 300
+MAX_RETRY_DELAY_SECONDS = 3600
+
+outbox_metrics = {
+    'enqueued': 0,
+    'sent': 0,
+    'failed_attempts': 0,
+    'dead_lettered': 0,
+    'batches': 0,
+    'smtp_connections': 0,
+}
+_metrics_lock = threading.Lock()
+
+
+def _count(**deltas):
+    with _metrics_lock:
+        for key, value in deltas.items():
+            outbox_metrics[key] += value
+
+
+def enqueue_mail(recipient, subject, body, html=None, attachment=None, attachment_name=None, commit=True):
+    """
+    Queues an email for the background mail workers.
+
+    attachment is either a key of the attachment registry (served from memory)
+    or a resource path relative to the app root, read at send time. Pass commit=False to queue the message as part
+    of the caller's transaction; the caller should call wake_mail_workers()
+    after committing.
+    """
+    message = OutboxMessage(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        html=html,
+        attachment=attachment,
+        attachment_name=attachment_name,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(message)
+    _count(enqueued=1)
+    if commit:
+        db.session.commit()
+        wake_mail_workers()
+    return message
+
+
+def enqueue_mails(messages):
+    """
+    Queues many emails with one multi-row INSERT in the caller's transaction.
+    messages are dicts of enqueue_mail() arguments; call wake_mail_workers()
+    after committing. Returns the number queued.
+    """
+    if not messages:
+        return 0
+    now = datetime.utcnow()
+    db.session.execute(insert(OutboxMessage), [
+        {
+            'recipient': m['recipient'],
+            'subject': m['subject'],
+            'body': m['body'],
+            'html': m.get('html'),
+            'attachment': m.get('attachment'),
+            'attachment_name': m.get('attachment_name'),
+            'next_attempt_at': now,
+        }
+        for m in messages
+    ])
+    _count(enqueued=len(messages))
+    return len(messages)
+
+
+def wake_mail_workers():
+    dispatcher = current_app.extensions.get('mail_outbox')
+    if dispatcher:
+        dispatcher.wake()
+
+
+def claim_batch(batch_size):
+    """Leases up to batch_size due messages to this caller and returns them."""
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due_ids = db.session.execute(
+        select(OutboxMessage.id)
+        .where(OutboxMessage.next_attempt_at <= now)
+        .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not due_ids:
+        db.session.commit()
+        return []
+
+    # The next_attempt_at guard makes the claim safe if another worker got there first
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(due_ids), OutboxMessage.next_attempt_at <= now)
+        .values(status='sending', claim_token=token, next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.commit()
+
+    return db.session.execute(
+        select(OutboxMessage).where(OutboxMessage.claim_token == token).order_by(OutboxMessage.id)
+    ).scalars().all()
+
+
+def build_message(row):
+    msg = Message(row.subject, recipients=[row.recipient], sender=current_app.config.get('MAIL_USERNAME'))
+    msg.body = row.body
+    if row.html:
+        msg.html = row.html
+    if row.attachment and is_registered(row.attachment):
+        attachment = get_attachment(row.attachment)
+        if attachment is None:
+            print(f"Warning: attachment '{row.attachment}' is missing; sending without it")
+        else:
+            msg.attach(row.attachment_name or attachment.filename, attachment.content_type, attachment.data)
+    elif row.attachment:
+        with current_app.open_resource(row.attachment) as fp:
+            content_type = mimetypes.guess_type(row.attachment)[0] or 'application/octet-stream'
+            msg.attach(row.attachment_name or row.attachment.rsplit('/', 1)[-1], content_type, fp.read())
+    return msg
+
+
+def _record_results(sent_ids, failures):
+    """Deletes delivered messages in one statement and reschedules or dead-letters failures."""
+    if sent_ids:
+        db.session.execute(
+            delete(OutboxMessage).where(OutboxMessage.id.in_(sent_ids)),
+            execution_options={'synchronize_session': False},
+        )
+
+    max_attempts = current_app.config.get('MAIL_MAX_ATTEMPTS', 5)
+    base_delay = current_app.config.get('MAIL_RETRY_BASE_SECONDS', 30)
+    now = datetime.utcnow()
+    dead = []
+    for row, error in failures:
+        attempts = row.attempts + 1
+        if attempts >= max_attempts:
+            dead.append({
+                'outbox_id': row.id, 'recipient': row.recipient, 'subject': row.subject, 'body': row.body,
+                'html': row.html, 'attachment': row.attachment, 'attachment_name': row.attachment_name,
+                'attempts': attempts, 'last_error': error, 'created_at': row.created_at, 'failed_at': now,
+            })
+        else:
+            delay = min(base_delay * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+            row.attempts = attempts
+            row.status = 'pending'
+            row.claim_token = None
+            row.last_error = error
+            row.next_attempt_at = now + timedelta(seconds=delay)
+
+    if dead:
+        db.session.execute(insert(MailDeadLetter), dead)
+        db.session.execute(
+            delete(OutboxMessage).where(OutboxMessage.id.in_([d['outbox_id'] for d in dead])),
+            execution_options={'synchronize_session': False},
+        )
+    db.session.commit()
+    _count(sent=len(sent_ids), failed_attempts=len(failures) - len(dead), dead_lettered=len(dead))
+
+
+def _open_connection(mail):
+    conn = mail.connect()
+    conn.__enter__()
+    _count(smtp_connections=1)
+    return conn
+
+
+def drain_outbox(batch_size=50, max_batches=None):
+    """
+    Sends due messages until the queue is empty, reusing one SMTP connection
+    for every batch in the run. Returns the number of messages sent.
+    """
+    mail = current_app.extensions['mail']
+    total_sent = 0
+    batches = 0
+    conn = None
+    try:
+        while max_batches is None or batches < max_batches:
+            rows = claim_batch(batch_size)
+            if not rows:
+                break
+            batches += 1
+
+            if conn is None:
+                try:
+                    conn = _open_connection(mail)
+                except Exception as e:
+                    # Server unreachable: the whole batch counts as a failed attempt
+                    _record_results([], [(row, str(e)) for row in rows])
+                    break
+
+            sent_ids, failures = [], []
+            for row in rows:
+                try:
+                    msg = build_message(row)
+                    try:
+                        conn.send(msg)
+                    except smtplib.SMTPServerDisconnected:
+                        # Server dropped an idle connection; reconnect once and retry
+                        conn = _open_connection(mail)
+                        conn.send(msg)
+                    sent_ids.append(row.id)
+                except Exception as e:
+                    failures.append((row, str(e)))
+
+            _record_results(sent_ids, failures)
+            _count(batches=1)
+            total_sent += len(sent_ids)
+    finally:
+        if conn is not None:
+            try:
+                conn.__exit__(None, None, None)
+            except smtplib.SMTPException:
+                pass
+    return total_sent
+
+
+class OutboxDispatcher:
+    """
+    Background threads that deliver queued mail; woken on enqueue, polling as
+    a fallback. Started by app.start_background_workers(); until then mail
+    stays queued for 'flask mail-drain'.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._wake = threading.Event()
+        self.threads = []
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self, workers):
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, name=f'mail-outbox-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _run(self):
+        poll = self.app.config.get('MAIL_OUTBOX_POLL_SECONDS', 5)
+        batch_size = self.app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50)
+        while True:
+            self._wake.wait(timeout=poll)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    drain_outbox(batch_size=batch_size)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Mail outbox error: {e}")
+                    time.sleep(poll)
+
+
+def init_app(app):
+    dispatcher = OutboxDispatcher(app)
+    app.extensions['mail_outbox'] = dispatcher
+
+    @app.cli.command('mail-drain')
+    def mail_drain_command():
+        """Send every queued email that is due."""
+        sent = drain_outbox(batch_size=app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50))
+        click.echo(f"Sent {sent} queued emails.")
@@ -0,0 +1,59 @@
+import threading
+import time
+
+import click
+
+from models import db
+from services.password_reset import purge_expired_reset_codes
+from services.report_jobs import purge_reports
+
+# Housekeeping that only deletes old rows and files: name -> callable run with no arguments
+PURGES = (
+    ('reset_codes', purge_expired_reset_codes),
+    ('reports', purge_reports),
+)
+
+
+def run_purges():
+    """
+    Runs every purge in turn; one failing does not stop the others. Returns
+    {name: result}, with None for a purge that failed.
+    """
+    results = {}
+    for name, purge in PURGES:
+        try:
+            results[name] = purge()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Purge '{name}' failed: {e}")
+            results[name] = None
+    return results
+
+
+def start_purger(app):
+    """
+    Runs run_purges every PURGE_INTERVAL seconds in a daemon thread, on its
+    own schedule so that turning the hold sweeper off does not stop it.
+    Called by app.start_background_workers(), not by init_app().
+    """
+    interval = app.config.get('PURGE_INTERVAL', 0)
+    if not interval:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                run_purges()
+
+    thread = threading.Thread(target=loop, name='purger', daemon=True)
+    thread.start()
+    return thread
+
+
+def init_app(app):
+    @app.cli.command('purge')
+    def purge_command():
+        """Run every purge (expired reset codes, old reports) once."""
+        for name, result in run_purges().items():
+            click.echo(f"{name}: {'failed' if result is None else result}")
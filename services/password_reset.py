@@ -0,0 +1,86 @@
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import select, update, delete
+
+from models import db, PasswordResetToken, normalise_email
+
+# Outcomes of check_reset_code()
+VALID, INVALID, EXPIRED = 'valid', 'invalid', 'expired'
+
+
+def _code_hash(email, code):
+    # Keyed, so a leaked table cannot be brute-forced back to codes offline
+    key = current_app.config['SECRET_KEY'].encode()
+    return hmac.new(key, f"{email}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+def issue_reset_code(email):
+    """
+    Creates a 6-digit reset code for email and commits it. Any earlier codes
+    for the address stop working. Returns the code to send.
+    """
+    email = normalise_email(email)
+    code = f"{secrets.randbelow(10 ** 6):06d}"
+    ttl = current_app.config.get('PASSWORD_RESET_CODE_MINUTES', 15)
+    db.session.execute(delete(PasswordResetToken).where(PasswordResetToken.email == email))
+    db.session.add(PasswordResetToken(email=email, code_hash=_code_hash(email, code),
+                                      expires_at=datetime.utcnow() + timedelta(minutes=ttl)))
+    db.session.commit()
+    return code
+
+
+def check_reset_code(email, code, now=None):
+    """
+    Looks the code up by (email, code hash) on the unique index. Returns
+    VALID, EXPIRED or INVALID. Wrong codes count against the address's live
+    code, which stops working after PASSWORD_RESET_MAX_ATTEMPTS of them.
+    """
+    email = normalise_email(email)
+    now = now or datetime.utcnow()
+    max_attempts = current_app.config.get('PASSWORD_RESET_MAX_ATTEMPTS', 5)
+    token = db.session.execute(
+        select(PasswordResetToken.expires_at, PasswordResetToken.failed_attempts)
+        .where(PasswordResetToken.email == email, PasswordResetToken.code_hash == _code_hash(email, (code or '').strip()))
+    ).first()
+
+    if token is None:
+        db.session.execute(
+            update(PasswordResetToken)
+            .where(PasswordResetToken.email == email, PasswordResetToken.expires_at >= now)
+            .values(failed_attempts=PasswordResetToken.failed_attempts + 1),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+        return INVALID
+    if token.failed_attempts >= max_attempts:
+        return INVALID
+    if token.expires_at < now:
+        return EXPIRED
+    return VALID
+
+
+def consume_reset_codes(email):
+    """Removes every code for email in the caller's transaction (after a successful reset)."""
+    db.session.execute(delete(PasswordResetToken).where(PasswordResetToken.email == normalise_email(email)))
+
+
+def purge_expired_reset_codes(now=None):
+    """Deletes expired codes through the expiry index. Returns the number removed."""
+    purged = db.session.execute(
+        delete(PasswordResetToken).where(PasswordResetToken.expires_at < (now or datetime.utcnow())),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    db.session.commit()
+    return purged
+
+
+def init_app(app):
+    @app.cli.command('purge-reset-codes')
+    def purge_reset_codes_command():
+        """Delete expired password reset codes."""
+        click.echo(f"Purged {purge_expired_reset_codes()} expired reset codes.")
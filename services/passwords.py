@@ -0,0 +1,116 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt'
+DEFAULT_SALT_LENGTH = 16
+
+
+class VerifierBusy(Exception):
+    """Every verification slot stayed taken for PASSWORD_VERIFY_WAIT_SECONDS."""
+
+
+def hash_options():
+    """The configured hashing policy as generate_password_hash() keyword arguments."""
+    config = current_app.config if has_app_context() else {}
+    return {
+        'method': config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+        'salt_length': config.get('PASSWORD_SALT_LENGTH', DEFAULT_SALT_LENGTH),
+    }
+
+
+def hash_password(password):
+    return generate_password_hash(password, **hash_options())
+
+
+# Stored for accounts that have no password yet (e.g. bulk imports). It is not
+# the output of any hash method, so no password ever matches it.
+UNUSABLE_PASSWORD = '!'
+
+
+@lru_cache(maxsize=8)
+def _full_method(method):
+    # Werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1'); hashing
+    # a throwaway value is the one way to see them that survives Werkzeug upgrades
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def needs_rehash(pwhash):
+    """True when pwhash was made with other parameters than the current policy."""
+    options = hash_options()
+    method, _, rest = pwhash.partition('$')
+    salt = rest.partition('$')[0]
+    return method != _full_method(options['method']) or len(salt) != options['salt_length']
+
+
+class PasswordVerifier:
+    """
+    Runs password checks in a process pool so slow hashes burn pool CPUs
+    rather than request threads. At most max_pending checks are queued or
+    running at once; callers beyond that wait up to wait_seconds for a slot
+    and then get VerifierBusy instead of piling onto the queue.
+    """
+
+    def __init__(self, workers=2, max_pending=None, wait_seconds=5):
+        self.workers = workers
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 4)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.verified = 0
+        self.rejected_busy = 0
+
+    def _get_executor(self):
+        # Created on first use; 'spawn' like the other pools
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            self.rejected_busy += 1
+            raise VerifierBusy()
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def check(self, pwhash, password):
+        result = self.run(check_password_hash, pwhash, password)
+        self.verified += 1
+        return result
+
+    def stats(self):
+        return {'workers': self.workers, 'verified': self.verified, 'rejected_busy': self.rejected_busy}
+
+
+def verify_login(user, password):
+    """
+    Checks a login password off the request thread. When it matches a hash
+    made under an older policy, user.password_hash is replaced with one under
+    the current policy; the caller commits. Raises VerifierBusy when the pool
+    is saturated.
+    """
+    verifier = current_app.extensions['password_verifier']
+    if user.password_hash in (None, '', UNUSABLE_PASSWORD) or not verifier.check(user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        user.password_hash = verifier.run(partial(generate_password_hash, **hash_options()), password)
+        print(f"Rehashed password for user {user.id} with the current policy")
+    return True
+
+
+def init_app(app):
+    app.extensions['password_verifier'] = PasswordVerifier(
+        workers=app.config.get('PASSWORD_VERIFY_WORKERS', 2),
+        max_pending=app.config.get('PASSWORD_VERIFY_MAX_PENDING'),
+        wait_seconds=app.config.get('PASSWORD_VERIFY_WAIT_SECONDS', 5),
+    )
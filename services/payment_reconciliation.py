@@ -0,0 +1,228 @@
+import csv
+from collections import namedtuple, defaultdict
+from datetime import datetime
+
+import click
+from sqlalchemy import select, update
+
+from models import db, Payment, Enrollment, StudentDetails, User, Course
+from services.payments import normalise_reference
+
+REFERENCE_COLUMNS = ('utr', 'reference', 'transaction_reference', 'ref')
+AMOUNT_COLUMNS = ('amount', 'credit')
+# References per lookup / confirm statement
+LOOKUP_CHUNK_SIZE = 500
+# Only this many issues are kept for display; the rest are just counted
+MAX_REPORTED_ISSUES = 1000
+# Statement amounts are rounded to paise
+AMOUNT_TOLERANCE = 0.005
+# Pending payments without a reference listed for confirmation by hand
+UNREFERENCED_LIMIT = 50
+
+StatementLine = namedtuple('StatementLine', 'line reference amount')
+UnreferencedPayment = namedtuple('UnreferencedPayment',
+                                 'id method amount created_at student_name enrollment_no course_code')
+Issue = namedtuple('Issue', 'line reference message')
+
+
+class ReconciliationResult:
+    def __init__(self):
+        self.lines = 0
+        self.confirmed = 0
+        self.already_confirmed = 0
+        self.issue_count = 0
+        self.issues = []
+
+    def add_issue(self, line, reference, message):
+        self.issue_count += 1
+        if len(self.issues) < MAX_REPORTED_ISSUES:
+            self.issues.append(Issue(line, reference, message))
+
+    def as_dict(self):
+        return {
+            'lines': self.lines,
+            'confirmed': self.confirmed,
+            'already_confirmed': self.already_confirmed,
+            'issue_count': self.issue_count,
+            'issues': [issue._asdict() for issue in self.issues],
+        }
+
+
+def _find_column(fieldnames, candidates):
+    for candidate in candidates:
+        if candidate in fieldnames:
+            return candidate
+    return None
+
+
+def _parse_amount(value):
+    value = (value or '').strip().replace(',', '').lstrip('₹$').strip()
+    if not value:
+        return None
+    return float(value)
+
+
+def read_statement(lines, result):
+    """
+    Parses a bank statement CSV into {reference: StatementLine}. The header
+    needs a UTR column (utr, reference, transaction_reference or ref); an
+    amount (or credit) column is optional and, when present, is checked
+    against the payment. Unreadable and repeated lines go to result.issues.
+    """
+    reader = csv.DictReader(lines)
+    reader.fieldnames = [(name or '').strip().lower() for name in reader.fieldnames or ()]
+    reference_column = _find_column(reader.fieldnames, REFERENCE_COLUMNS)
+    if reference_column is None:
+        raise ValueError(f"Statement needs a reference column: one of {', '.join(REFERENCE_COLUMNS)}")
+    amount_column = _find_column(reader.fieldnames, AMOUNT_COLUMNS)
+
+    statement = {}
+    for row in reader:
+        line = reader.line_num
+        result.lines += 1
+        raw = (row.get(reference_column) or '').strip()
+        reference = normalise_reference(raw)
+        if reference is None:
+            result.add_issue(line, raw, 'No reference on this line.')
+            continue
+        if reference in statement:
+            result.add_issue(line, reference, f'Reference already on line {statement[reference].line}.')
+            continue
+        try:
+            amount = _parse_amount(row.get(amount_column)) if amount_column else None
+        except ValueError:
+            result.add_issue(line, reference, f"Unreadable amount '{row.get(amount_column)}'.")
+            continue
+        statement[reference] = StatementLine(line, reference, amount)
+    return statement
+
+
+def _payments_by_reference(references):
+    """{reference: [(id, amount, status), ...]}, looked up through ix_payments_reference."""
+    found = defaultdict(list)
+    for start in range(0, len(references), LOOKUP_CHUNK_SIZE):
+        rows = db.session.execute(
+            select(Payment.reference, Payment.id, Payment.amount, Payment.status)
+            .where(Payment.reference.in_(references[start:start + LOOKUP_CHUNK_SIZE]))
+        ).all()
+        for reference, payment_id, amount, status in rows:
+            found[reference].append((payment_id, amount, status))
+    return found
+
+
+def reconcile_statement(lines, confirm=True):
+    """
+    Matches a bank statement (CSV text, any iterable of lines) against
+    pending UPI and bank transfer payments and returns a ReconciliationResult.
+
+    Every reference on the statement is looked up in a few set-based queries
+    rather than one per line. A line confirms its payment when exactly one
+    pending payment carries the reference and the amounts agree; lines
+    without a payment, with several candidates or with a different amount
+    are reported instead. All confirmations commit in one transaction; with
+    confirm=False nothing is written (a preview).
+    """
+    result = ReconciliationResult()
+    statement = read_statement(lines, result)
+    found = _payments_by_reference(sorted(statement))
+
+    to_confirm = []
+    for entry in sorted(statement.values()):
+        payments = found.get(entry.reference, [])
+        pending = [p for p in payments if p[2] == 'pending']
+        if not payments:
+            result.add_issue(entry.line, entry.reference, 'No payment with this reference.')
+        elif not pending:
+            result.already_confirmed += 1
+        elif len(pending) > 1:
+            result.add_issue(entry.line, entry.reference,
+                             f'{len(pending)} pending payments share this reference; confirm them by hand.')
+        elif entry.amount is not None and abs(pending[0][1] - entry.amount) > AMOUNT_TOLERANCE:
+            result.add_issue(entry.line, entry.reference,
+                             f'Statement amount {entry.amount:.2f} does not match payment amount {pending[0][1]:.2f}.')
+        else:
+            to_confirm.append(pending[0][0])
+    # Parse and match problems were found in two passes; report them in statement order
+    result.issues.sort()
+
+    if not confirm:
+        result.confirmed = len(to_confirm)
+        return result
+
+    now = datetime.utcnow()
+    for start in range(0, len(to_confirm), LOOKUP_CHUNK_SIZE):
+        # status guard: a payment confirmed meanwhile is not stamped twice
+        result.confirmed += db.session.execute(
+            update(Payment)
+            .where(Payment.id.in_(to_confirm[start:start + LOOKUP_CHUNK_SIZE]), Payment.status == 'pending')
+            .values(status='confirmed', confirmed_at=now, updated_at=now),
+            execution_options={'synchronize_session': False},
+        ).rowcount
+    db.session.commit()
+    if result.confirmed:
+        print(f"Reconciliation confirmed {result.confirmed} payments")
+    return result
+
+
+def unreferenced_payments(limit=UNREFERENCED_LIMIT):
+    """
+    Pending payments that carry no reference, oldest first. UPI payments may
+    be submitted without a UTR, so no statement line can ever match them;
+    an admin confirms them by hand with confirm_payment().
+    """
+    rows = db.session.execute(
+        select(Payment.id, Payment.method, Payment.amount, Payment.created_at,
+               User.name, StudentDetails.enrollment_no, Course.course_code)
+        .outerjoin(Enrollment, Enrollment.id == Payment.enrollment_id)
+        .outerjoin(StudentDetails, StudentDetails.id == Enrollment.student_id)
+        .outerjoin(User, User.id == StudentDetails.user_id)
+        .outerjoin(Course, Course.id == Enrollment.course_id)
+        .where(Payment.status == 'pending', Payment.reference.is_(None))
+        .order_by(Payment.created_at, Payment.id)
+        .limit(limit)
+    ).all()
+    return [UnreferencedPayment(*row) for row in rows]
+
+
+def confirm_payment(payment_id):
+    """Confirms one pending payment by hand. Returns False when it is missing or already confirmed."""
+    now = datetime.utcnow()
+    confirmed = db.session.execute(
+        update(Payment)
+        .where(Payment.id == payment_id, Payment.status == 'pending')
+        .values(status='confirmed', confirmed_at=now, updated_at=now),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    db.session.commit()
+    if confirmed:
+        print(f"Payment {payment_id} confirmed by hand")
+    return bool(confirmed)
+
+
+def init_app(app):
+    @app.cli.command('reconcile-payments')
+    @click.argument('statement', type=click.File('r', encoding='utf-8-sig'))
+    @click.option('--dry-run', is_flag=True, help='Report matches without confirming them.')
+    def reconcile_payments_command(statement, dry_run):
+        """Confirm pending UPI/bank payments listed on a bank statement CSV."""
+        try:
+            result = reconcile_statement(statement, confirm=not dry_run)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        for issue in result.issues:
+            click.echo(f"line {issue.line}: {issue.reference or '-'}: {issue.message}", err=True)
+        if result.issue_count > len(result.issues):
+            click.echo(f"... and {result.issue_count - len(result.issues)} more issues", err=True)
+        verb = 'Would confirm' if dry_run else 'Confirmed'
+        click.echo(f"{verb} {result.confirmed} payments; {result.already_confirmed} already confirmed, "
+                   f"{result.issue_count} lines need attention.")
+
+    @app.cli.command('confirm-payment')
+    @click.argument('payment_ids', type=int, nargs=-1, required=True)
+    def confirm_payment_command(payment_ids):
+        """Confirm pending payments by id, e.g. UPI payments submitted without a UTR."""
+        for payment_id in payment_ids:
+            if confirm_payment(payment_id):
+                click.echo(f"Payment {payment_id} confirmed.")
+            else:
+                click.echo(f"Payment {payment_id} is not pending.", err=True)
@@ -0,0 +1,131 @@
+import re
+import uuid
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Course, Enrollment, Payment
+from services.analytics import record_status_change
+from services.mail_outbox import enqueue_mail, wake_mail_workers
+
+PAYMENT_METHODS = ('card', 'upi', 'bank_transfer')
+# Card payments are settled by the gateway; UPI and bank transfers wait for the bank statement
+SELF_CONFIRMING_METHODS = ('card',)
+
+_REFERENCE_NOISE = re.compile(r'[^0-9A-Za-z]')
+
+
+class PaymentError(Exception):
+    """The enrollment cannot be paid for (gone, not the student's, or its hold was released)."""
+
+
+def new_idempotency_key():
+    """One per rendered payment form; a resubmitted form reuses it."""
+    return uuid.uuid4().hex
+
+
+def normalise_reference(reference):
+    """
+    The form UTRs are stored and matched in: upper case, without the spaces,
+    dashes and slashes that students and bank statements add. None when
+    nothing is left.
+    """
+    return _REFERENCE_NOISE.sub('', reference or '').upper() or None
+
+
+def _confirmation_mail(user, course, transaction_id):
+    subject = f"Enrollment Confirmed: {course.name}"
+    body = f"""Hello {user.name},
+
+You have successfully enrolled in the following course:
+
+Course: {course.name} ({course.course_code})
+Credits: {course.credits}
+Description: {course.description}
+Course Material/Link: {course.link if course.link else 'N/A'}
+Transaction ID: {transaction_id}
+
+Please find attached the University Rules and Regulations.
+
+Happy Learning!
+University Admin"""
+    # The rules PDF is served from the in-memory attachment registry
+    enqueue_mail(user.email, subject, body, attachment='university_rules', commit=False)
+
+
+def finalise_payment(enrollment_id, user, student_id, method, idempotency_key,
+                     reference=None, receipt_image=None):
+    """
+    Marks a pending enrollment as paid, records the payment and queues the
+    confirmation mail, all in one transaction. Returns (payment, created).
+    Card payments are recorded as confirmed; UPI and bank transfers stay
+    pending, under their normalised reference, until a bank statement
+    reconciles them (see services.payment_reconciliation).
+
+    Replays are no-ops: a request carrying an idempotency key that was already
+    used, or one for an enrollment that is already paid, returns the existing
+    payment with created=False. The status change is a conditional UPDATE
+    (status = 'pending_payment'), so of two concurrent submissions exactly one
+    finalises; the unique idempotency_key backs that up.
+    """
+    if method not in PAYMENT_METHODS:
+        raise PaymentError(f"Unknown payment method '{method}'.")
+
+    existing = db.session.scalars(select(Payment).where(Payment.idempotency_key == idempotency_key)).first()
+    if existing is not None:
+        if existing.enrollment_id is None:
+            # Paid, then the enrollment was deleted (payments outlive it); its id may since have been reused
+            raise PaymentError('This payment was already recorded for an enrollment that has since been removed. '
+                               'Please contact the university office.')
+        if existing.enrollment_id != enrollment_id:
+            raise PaymentError('This payment form was already used for another enrollment.')
+        return existing, False
+
+    enrollment = db.session.execute(
+        select(Enrollment.date_enrolled, Enrollment.course_id, Enrollment.status)
+        .where(Enrollment.id == enrollment_id, Enrollment.student_id == student_id)
+    ).first()
+    if enrollment is None:
+        raise PaymentError('Enrollment not found. Your seat hold may have expired; please enroll again.')
+
+    paid = db.session.execute(
+        update(Enrollment)
+        .where(Enrollment.id == enrollment_id, Enrollment.status == 'pending_payment')
+        .values(status='enrolled', hold_expires_at=None),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    if not paid:
+        db.session.rollback()
+        previous = db.session.scalars(
+            select(Payment).where(Payment.enrollment_id == enrollment_id).order_by(Payment.id)
+        ).first()
+        if previous is None and db.session.get(Enrollment, enrollment_id) is None:
+            raise PaymentError('Enrollment not found. Your seat hold may have expired; please enroll again.')
+        return previous, False
+
+    course = db.session.get(Course, enrollment.course_id)
+    transaction_id = str(uuid.uuid4()) if method == 'card' else reference
+    now = datetime.utcnow()
+    confirmed = method in SELF_CONFIRMING_METHODS
+    payment = Payment(enrollment_id=enrollment_id, idempotency_key=idempotency_key, method=method,
+                      amount=course.fee, transaction_id=transaction_id,
+                      reference=None if confirmed else normalise_reference(reference),
+                      receipt_image=receipt_image, status='confirmed' if confirmed else 'pending',
+                      created_at=now, confirmed_at=now if confirmed else None)
+    try:
+        db.session.add(payment)
+        record_status_change(enrollment.date_enrolled, enrollment.course_id, enrollment.status, 'enrolled')
+        _confirmation_mail(user, course, transaction_id)
+        db.session.commit()
+    except IntegrityError:
+        # The same key won a race we could not see at the conditional UPDATE;
+        # any other constraint failure is not ours to swallow
+        db.session.rollback()
+        previous = db.session.scalars(select(Payment).where(Payment.idempotency_key == idempotency_key)).one_or_none()
+        if previous is None:
+            raise
+        return previous, False
+
+    wake_mail_workers()
+    return payment, True
@@ -0,0 +1,93 @@
+import csv
+import io
+
+from models import db, Enrollment
+from services.enrollment_listing import enrollment_listing_query
+from utils import generate_pdf_report_chunked
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+REPORT_HEADER = ['ID', 'Student Name', 'Email', 'Course', 'Code', 'Date', 'Status']
+# Fixed widths so every page of the chunked PDF lines up (landscape letter minus margins)
+REPORT_COL_WIDTHS = [50, 120, 170, 160, 70, 70, 80]
+REPORT_CHUNK_SIZE = 1000
+# Spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def neutralise_formula(value):
+    """Prefixes a text cell that a spreadsheet would run as a formula with ', so it shows as text."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_report_rows(filters, chunk_size=REPORT_CHUNK_SIZE):
+    """
+    Yields formatted report rows, fetching chunk_size rows at a time from a
+    server-side cursor instead of loading the whole result.
+    """
+    stmt = (
+        enrollment_listing_query(filters)
+        .order_by(Enrollment.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for row in db.session.execute(stmt):
+        yield [
+            str(row.id),
+            row.student_name,
+            row.student_email,
+            row.course_name,
+            row.course_code,
+            row.date_enrolled.strftime('%Y-%m-%d') if row.date_enrolled else '',
+            (row.status or '').replace('_', ' ').title(),
+        ]
+
+
+def stream_csv(rows, chunk_size=REPORT_CHUNK_SIZE):
+    """
+    Encodes rows as CSV and yields it in chunks of roughly chunk_size rows.
+    Student-supplied text that would run as a formula in Excel is neutralised.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(REPORT_HEADER)
+
+    pending = 0
+    for row in rows:
+        writer.writerow([neutralise_formula(value) for value in row])
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def write_pdf(rows, output, title="University Enrollment Report"):
+    return generate_pdf_report_chunked(REPORT_HEADER, rows, output, title=title, col_widths=REPORT_COL_WIDTHS)
+
+
+def xlsx_supported():
+    return Workbook is not None
+
+
+def write_xlsx(rows, output):
+    """
+    Writes rows with openpyxl's write-only mode, which keeps no cells in
+    memory. openpyxl stores any text starting with '=' as a formula, so cells
+    are neutralised as in the CSV export.
+    """
+    if Workbook is None:
+        raise RuntimeError("The 'openpyxl' package is required for Excel export.")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Enrollments')
+    sheet.append(REPORT_HEADER)
+    for row in rows:
+        sheet.append([neutralise_formula(value) for value in row])
+    workbook.save(output)
+    return output
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import Flask, current_app
+from sqlalchemy import or_, and_, select, update, delete, func
+
+from models import db, ReportJob
+from services.report_export import iter_report_rows, write_pdf, write_xlsx
+
+REPORT_EXTENSIONS = {'pdf': 'pdf', 'xlsx': 'xlsx'}
+# How often the submitting process refreshes heartbeat_at of the jobs it has in its pool;
+# REPORT_JOB_STALE_SECONDS should allow a few missed beats
+HEARTBEAT_SECONDS = 30
+# Ids per IN (...) list when purging
+PURGE_CHUNK_SIZE = 500
+
+_executor = None
+_heartbeat = None
+_pool_lock = threading.Lock()
+_worker_apps = {}
+
+
+def _get_executor(max_workers):
+    # One pool per web worker process. 'spawn' keeps the children independent of
+    # the parent's threads and open database connections.
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+class JobHeartbeat:
+    """
+    Keeps heartbeat_at fresh for every job this process has handed to its
+    pool, queued or running, with one UPDATE per HEARTBEAT_SECONDS. When the
+    process dies the beats stop, and after REPORT_JOB_STALE_SECONDS its jobs
+    count as lost: no longer reused by enqueue_report() and marked failed by
+    purge_reports(). A job whose pool process crashed is marked failed at once.
+    """
+
+    def __init__(self, app, interval=HEARTBEAT_SECONDS):
+        self.app = app
+        self.interval = interval
+        self._jobs = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='report-heartbeat', daemon=True)
+        self._thread.start()
+
+    def track(self, job_id, future):
+        with self._lock:
+            self._jobs.add(job_id)
+        future.add_done_callback(lambda done: self._finished(job_id, done))
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            self._jobs.discard(job_id)
+        error = future.exception()
+        if error is None:
+            return
+        with self.app.app_context():
+            try:
+                _mark_failed([job_id], f"Report process failed: {error!r}")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Could not mark report job {job_id} failed: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                job_ids = list(self._jobs)
+            if not job_ids:
+                continue
+            with self.app.app_context():
+                try:
+                    db.session.execute(
+                        update(ReportJob)
+                        .where(ReportJob.id.in_(job_ids), ReportJob.status.in_(['queued', 'running']))
+                        .values(heartbeat_at=datetime.utcnow()),
+                        execution_options={'synchronize_session': False},
+                    )
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Report heartbeat failed: {e}")
+
+
+def _get_heartbeat(app):
+    global _heartbeat
+    with _pool_lock:
+        if _heartbeat is None:
+            _heartbeat = JobHeartbeat(app)
+        return _heartbeat
+
+
+def _last_sign_of_life():
+    return func.coalesce(ReportJob.heartbeat_at, ReportJob.created_at)
+
+
+def _mark_failed(job_ids, error):
+    failed = db.session.execute(
+        update(ReportJob)
+        .where(ReportJob.id.in_(job_ids), ReportJob.status.in_(['queued', 'running']))
+        .values(status='failed', error=error, finished_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    db.session.commit()
+    return failed
+
+
+def _encode_filters(filters):
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in filters.items()}
+
+
+def _decode_filters(params):
+    filters = dict(params)
+    for key in ('date_from', 'date_to'):
+        if key in filters:
+            filters[key] = datetime.fromisoformat(filters[key])
+    return filters
+
+
+def report_output_dir(app):
+    path = app.config.get('REPORT_JOB_DIR') or os.path.join(app.instance_path, 'reports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def enqueue_report(filters, report_format='pdf', requested_by=None):
+    """
+    Queues a report for the background pool and returns (job, created).
+
+    A queued or running job with the same format and filters is reused while
+    its heartbeat is fresh, as is a finished one younger than
+    REPORT_JOB_DEDUP_SECONDS whose file still exists. With REPORT_JOB_WORKERS
+    = 0 the report is rendered before this returns.
+    """
+    params = json.dumps(_encode_filters(filters), sort_keys=True)
+    params_hash = hashlib.sha256(f"{report_format}:{params}".encode()).hexdigest()
+
+    now = datetime.utcnow()
+    done_cutoff = now - timedelta(seconds=current_app.config.get('REPORT_JOB_DEDUP_SECONDS', 300))
+    stale_cutoff = now - timedelta(seconds=current_app.config.get('REPORT_JOB_STALE_SECONDS', 120))
+    existing = ReportJob.query.filter(
+        ReportJob.params_hash == params_hash,
+        or_(
+            and_(ReportJob.status.in_(['queued', 'running']), _last_sign_of_life() >= stale_cutoff),
+            and_(ReportJob.status == 'done', ReportJob.finished_at >= done_cutoff),
+        ),
+    ).order_by(ReportJob.created_at.desc()).first()
+    if existing and (existing.status != 'done' or os.path.exists(existing.file_path)):
+        return existing, False
+
+    job = ReportJob(id=uuid.uuid4().hex, report_format=report_format, params=params,
+                    params_hash=params_hash, requested_by=requested_by, heartbeat_at=now)
+    db.session.add(job)
+    db.session.commit()
+
+    workers = current_app.config.get('REPORT_JOB_WORKERS', 2)
+    if not workers:
+        render_report_job(job.id, report_output_dir(current_app))
+        db.session.refresh(job)
+        return job, True
+
+    app = current_app._get_current_object()
+    future = _get_executor(workers).submit(run_report_job, job.id, app.config['SQLALCHEMY_DATABASE_URI'],
+                                           report_output_dir(app))
+    _get_heartbeat(app).track(job.id, future)
+    return job, True
+
+
+def _worker_app(database_uri):
+    # Minimal app for the pool process: just the database, no blueprints or background threads
+    app = _worker_apps.get(database_uri)
+    if app is None:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+        _worker_apps[database_uri] = app
+    return app
+
+
+def run_report_job(job_id, database_uri, output_dir):
+    """Renders one queued report to output_dir. Runs inside the process pool."""
+    app = _worker_app(database_uri)
+    with app.app_context():
+        render_report_job(job_id, output_dir)
+
+
+def render_report_job(job_id, output_dir):
+    """Renders one queued report to output_dir in the current app context."""
+    job = db.session.get(ReportJob, job_id)
+    if job is None or job.status != 'queued':
+        return
+    job.status = 'running'
+    job.heartbeat_at = datetime.utcnow()
+    db.session.commit()
+
+    path = os.path.join(output_dir, f"{job.id}.{REPORT_EXTENSIONS[job.report_format]}")
+    partial = path + '.part'
+    try:
+        rows = iter_report_rows(_decode_filters(json.loads(job.params)))
+        with open(partial, 'wb') as output:
+            if job.report_format == 'xlsx':
+                write_xlsx(rows, output)
+            else:
+                write_pdf(rows, output, title="University Enrollment Report")
+        # Readers only ever see a complete file
+        os.replace(partial, path)
+        job.status = 'done'
+        job.file_path = path
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(partial):
+            os.remove(partial)
+        job = db.session.get(ReportJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def purge_reports(retention_seconds=None, stale_seconds=None, now=None):
+    """
+    Marks queued/running jobs without a heartbeat for stale_seconds as
+    failed, then deletes jobs finished more than retention_seconds ago along
+    with their files (and any .part left by a crashed render). Returns
+    (lost, purged).
+    """
+    config = current_app.config
+    retention_seconds = retention_seconds if retention_seconds is not None else config.get('REPORT_JOB_RETENTION_SECONDS', 86400)
+    stale_seconds = stale_seconds if stale_seconds is not None else config.get('REPORT_JOB_STALE_SECONDS', 120)
+    now = now or datetime.utcnow()
+
+    lost_ids = db.session.scalars(
+        select(ReportJob.id)
+        .where(ReportJob.status.in_(['queued', 'running']),
+               _last_sign_of_life() < now - timedelta(seconds=stale_seconds))
+    ).all()
+    lost = _mark_failed(lost_ids, 'The report was lost (the server restarted); please request it again.') if lost_ids else 0
+
+    output_dir = report_output_dir(current_app)
+    old = db.session.execute(
+        select(ReportJob.id, ReportJob.report_format, ReportJob.file_path)
+        .where(ReportJob.status.in_(['done', 'failed']),
+               ReportJob.finished_at < now - timedelta(seconds=retention_seconds))
+    ).all()
+    for job_id, report_format, file_path in old:
+        partial = os.path.join(output_dir, f"{job_id}.{REPORT_EXTENSIONS.get(report_format, report_format)}.part")
+        for path in (file_path, partial):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    ids = [row.id for row in old]
+    for start in range(0, len(ids), PURGE_CHUNK_SIZE):
+        db.session.execute(delete(ReportJob).where(ReportJob.id.in_(ids[start:start + PURGE_CHUNK_SIZE])),
+                           execution_options={'synchronize_session': False})
+    db.session.commit()
+    return lost, len(ids)
+
+
+def init_app(app):
+    @app.cli.command('purge-reports')
+    def purge_reports_command():
+        """Fail lost report jobs and delete old reports with their files."""
+        lost, purged = purge_reports()
+        click.echo(f"Marked {lost} lost report jobs failed, purged {purged} old reports.")
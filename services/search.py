@@ -0,0 +1,346 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app, has_app_context
+from sqlalchemy import select, or_, func
+
+from models import db, User, Course
+from services.curriculum import LocalVersionStore, RedisVersionStore
+
+DEFAULT_LIMIT = 200
+
+_RUN_RE = re.compile(r'[a-z]+|[0-9]+')
+
+
+def tokenize(text):
+    """
+    Lower-cased letter and digit runs, in order and without duplicates:
+    'CS101 Physics' -> ['cs', '101', 'physics']. Splitting mixed words keeps
+    per-student tokens like 'sharma123' out of the vocabulary.
+    """
+    return list(dict.fromkeys(_RUN_RE.findall((text or '').lower())))
+
+
+class PrefixIndex:
+    """
+    In-memory inverted index (token -> document ids) with a sorted vocabulary,
+    so every query word matches the indexed tokens it is a prefix of. All query
+    words must match. Results are ranked by the number of exact (not prefix)
+    word matches, then by the length of the document's title.
+
+    Documents are ordered within a rank by a precomputed integer key
+    (title length, then id) so ranking never calls back into Python per row.
+
+    Each worker keeps its own copy. Writes made in this worker are applied in
+    place and bump a shared version stamp; a worker that sees a stamp it did
+    not produce reloads from the database. Without a shared store other
+    workers' stamps are invisible, so a ttl (seconds) also reloads a copy that
+    old, bounding how long their writes go unseen.
+
+    Only the first search of a worker waits for a build. Later reloads run in
+    a background thread, one at a time, while the current copy keeps serving
+    searches; the new copy is swapped in when it is complete.
+    """
+
+    def __init__(self, name, loader, version_store=None, ttl=None):
+        self.name = name
+        self._loader = loader  # callable returning (doc_id, title, *other_fields) rows
+        self.version_store = version_store or LocalVersionStore()
+        self.ttl = ttl
+        self._built_at = None
+        self._postings = {}
+        self._vocabulary = []
+        self._docs = {}  # doc_id -> tokens
+        self._order = {}  # doc_id -> sort key within a rank
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # Held for the whole of a build: one at a time per index
+        self._refresher = None
+        self.version = None
+        self.builds = 0
+        self.queries = 0
+
+    def build(self):
+        # Read the stamp before loading so a write that lands mid-load triggers another rebuild
+        version = self.version_store.get(self.name)
+        built_at = time.monotonic()
+        postings = defaultdict(set)
+        docs = {}
+        order = {}
+        for doc_id, title, *fields in self._loader():
+            tokens = tuple(tokenize(' '.join(filter(None, (title, *fields)))))
+            docs[doc_id] = tokens
+            order[doc_id] = len(title or '') << 32 | doc_id
+            for token in tokens:
+                postings[token].add(doc_id)
+        with self._lock:
+            self._postings = dict(postings)
+            self._vocabulary = sorted(postings)
+            self._docs = docs
+            self._order = order
+            self.version = version
+            self._built_at = built_at
+            self.builds += 1
+
+    def _is_stale(self):
+        if self.version != self.version_store.get(self.name):
+            return True
+        return bool(self.ttl) and time.monotonic() - self._built_at >= self.ttl
+
+    def rebuild(self, force=False):
+        """
+        Builds now unless another thread finished a build while this one
+        waited for it, so concurrent callers share a single build. force
+        builds regardless, for callers whose own write must be in the copy.
+        """
+        builds = self.builds
+        with self._build_lock:
+            if force or self.builds == builds:
+                self.build()
+
+    def refresh_in_background(self):
+        """Starts a background rebuild unless one is already running. Returns the thread, or None."""
+        if not self._build_lock.acquire(blocking=False):
+            return None
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def run():
+            try:
+                if app is None:
+                    self.build()
+                else:
+                    with app.app_context():
+                        self.build()
+            except Exception as e:
+                print(f"Search index '{self.name}' rebuild failed: {e}")
+            finally:
+                self._build_lock.release()
+
+        self._refresher = threading.Thread(target=run, name=f'search-index-{self.name}', daemon=True)
+        self._refresher.start()
+        return self._refresher
+
+    def _ensure_current(self):
+        if self._built_at is None:
+            # Nothing to serve from yet
+            self.rebuild()
+        elif self._is_stale():
+            self.refresh_in_background()
+
+    def _add(self, doc_id, title, fields):
+        tokens = tuple(tokenize(' '.join(filter(None, (title, *fields)))))
+        self._docs[doc_id] = tokens
+        self._order[doc_id] = len(title or '') << 32 | doc_id
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                bisect.insort(self._vocabulary, token)
+            ids.add(doc_id)
+
+    def _remove(self, doc_id):
+        tokens = self._docs.pop(doc_id, None)
+        if tokens is None:
+            return
+        del self._order[doc_id]
+        for token in tokens:
+            ids = self._postings[token]
+            ids.discard(doc_id)
+            if not ids:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _changed(self):
+        new_version = self.version_store.bump(self.name)
+        # Someone else wrote in between: our copy is missing their change
+        self.version = new_version if self.version is not None and new_version == self.version + 1 else None
+
+    def upsert(self, doc_id, title, *fields):
+        with self._lock:
+            if self.version is not None:
+                self._remove(doc_id)
+                self._add(doc_id, title, fields)
+            self._changed()
+
+    def remove(self, doc_id):
+        with self._lock:
+            if self.version is not None:
+                self._remove(doc_id)
+            self._changed()
+
+    def _matching(self, word):
+        start = bisect.bisect_left(self._vocabulary, word)
+        end = bisect.bisect_left(self._vocabulary, word + '\uffff', start)
+        if end - start == 1:
+            return self._postings[self._vocabulary[start]]
+        matched = set()
+        for token in self._vocabulary[start:end]:
+            matched.update(self._postings[token])
+        return matched
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Returns up to limit matching document ids, best first."""
+        words = tokenize(query)
+        if not words:
+            return []
+        self._ensure_current()
+        with self._lock:
+            self.queries += 1
+            candidates = sorted((self._matching(word) for word in words), key=len)
+            matched = set(candidates[0])
+            for ids in candidates[1:]:
+                matched &= ids
+                if not matched:
+                    return []
+
+            # Rank = number of query words matched exactly rather than by prefix
+            exact_hits = dict.fromkeys(matched, 0)
+            for word in words:
+                for doc_id in matched.intersection(self._postings.get(word, ())):
+                    exact_hits[doc_id] += 1
+            tiers = defaultdict(list)
+            for doc_id, hits in exact_hits.items():
+                tiers[hits].append(doc_id)
+
+            results = []
+            for hits in sorted(tiers, reverse=True):
+                results.extend(heapq.nsmallest(limit - len(results), tiers[hits], key=self._order.__getitem__))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': len(self._docs),
+                'tokens': len(self._vocabulary),
+                'ttl': self.ttl,
+                'builds': self.builds,
+                'rebuilding': self._build_lock.locked(),
+                'queries': self.queries,
+            }
+
+
+class TrigramSearch:
+    """
+    PostgreSQL backend: ILIKE over columns with pg_trgm GIN indexes (see
+    migrate_search_indexes.py), ranked by trigram similarity. The database is
+    the index, so writes need no bookkeeping.
+    """
+
+    def __init__(self, name, id_column, columns, *criteria):
+        self.name = name
+        self.id_column = id_column
+        self.columns = columns
+        self.criteria = criteria
+        self.queries = 0
+
+    def upsert(self, doc_id, title, *fields):
+        pass
+
+    def remove(self, doc_id):
+        pass
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        query = (query or '').strip()
+        if not query:
+            return []
+        self.queries += 1
+        similarity = func.greatest(*[func.similarity(column, query) for column in self.columns])
+        return db.session.execute(
+            select(self.id_column)
+            .where(or_(*[column.icontains(query, autoescape=True) for column in self.columns]), *self.criteria)
+            .order_by(similarity.desc(), self.id_column)
+            .limit(limit)
+        ).scalars().all()
+
+    def stats(self):
+        return {'backend': 'pg_trgm', 'queries': self.queries}
+
+
+def _load_courses():
+    return db.session.execute(select(Course.id, Course.name, Course.course_code))
+
+
+def _load_students():
+    return db.session.execute(select(User.id, User.name, User.email).where(User.role == 'student'))
+
+
+def _index(name):
+    return current_app.extensions['search'][name]
+
+
+def search_courses(query, limit=DEFAULT_LIMIT):
+    return _index('courses').search(query, limit)
+
+
+def search_students(query, limit=DEFAULT_LIMIT):
+    """Ranked ids of student users whose name or email matches query."""
+    return _index('students').search(query, limit)
+
+
+def ranked_matches(search, query, limit=None):
+    """
+    Runs search_courses or search_students for a results page. Returns
+    (ids, truncated): the best limit (default SEARCH_RESULTS_LIMIT) ids, and
+    whether more documents matched.
+    """
+    limit = limit or current_app.config.get('SEARCH_RESULTS_LIMIT', DEFAULT_LIMIT)
+    ids = search(query, limit + 1)
+    return ids[:limit], len(ids) > limit
+
+
+def index_course(course):
+    """Adds or refreshes a course in the search index. Call after committing."""
+    _index('courses').upsert(course.id, course.name, course.course_code)
+
+
+def remove_course(course_id):
+    _index('courses').remove(course_id)
+
+
+def index_student(user):
+    """Adds or refreshes a student in the search index. Call after committing."""
+    _index('students').upsert(user.id, user.name, user.email)
+
+
+def remove_student(user_id):
+    _index('students').remove(user_id)
+
+
+def reindex_all():
+    """
+    Reloads every index from the database now (e.g. after a bulk import), so
+    the caller's next search sees its changes; other workers reload theirs in
+    the background when they see the new stamp.
+    """
+    for index in current_app.extensions['search'].values():
+        if isinstance(index, PrefixIndex):
+            index.version_store.bump(index.name)
+            index.version = None
+            index.rebuild(force=True)
+
+
+def search_stats():
+    return {name: index.stats() for name, index in current_app.extensions['search'].items()}
+
+
+def init_app(app):
+    if app.config.get('SEARCH_BACKEND', 'memory') == 'postgres':
+        indexes = {
+            'courses': TrigramSearch('courses', Course.id, [Course.name, Course.course_code]),
+            'students': TrigramSearch('students', User.id, [User.name, User.email], User.role == 'student'),
+        }
+    else:
+        redis_url = app.config.get('SEARCH_INDEX_REDIS_URL')
+        version_store = RedisVersionStore(redis_url, prefix='search:version:') if redis_url else LocalVersionStore()
+        # Shared stamps make every write visible; without them, fall back to rebuilding by age
+        ttl = None if redis_url else app.config.get('SEARCH_INDEX_TTL', 60)
+        indexes = {
+            'courses': PrefixIndex('courses', _load_courses, version_store, ttl),
+            'students': PrefixIndex('students', _load_students, version_store, ttl),
+        }
+    app.extensions['search'] = indexes
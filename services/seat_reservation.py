@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from sqlalchemy import select, insert, update, func
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from models import db, Course, Enrollment
+from services.analytics import record_enrollment
+
+
+class ReservationError(Exception):
+    """Base class for reasons a seat could not be reserved."""
+
+
+class CourseNotFound(ReservationError):
+    pass
+
+
+class AlreadyEnrolled(ReservationError):
+    pass
+
+
+class CourseFull(ReservationError):
+    pass
+
+
+class ReservationBusy(ReservationError):
+    """The course row stayed contended through every retry; the student can simply try again."""
+
+
+# Extra attempts after a deadlock or lock wait timeout
+DEADLOCK_RETRIES = 3
+
+
+def _is_lock_conflict(error):
+    """True for deadlocks and lock wait timeouts, which are worth retrying."""
+    orig = getattr(error, 'orig', None)
+    if getattr(orig, 'errno', None) in (1213, 1205):  # MySQL: deadlock, lock wait timeout
+        return True
+    if getattr(orig, 'pgcode', None) in ('40P01', '40001'):  # PostgreSQL: deadlock, serialization failure
+        return True
+    message = str(orig).lower()
+    return 'deadlock' in message or 'database is locked' in message
+
+
+def reserve_seat(student_id, course_id, status='pending_payment'):
+    """
+    Claims one seat in a course and records the enrollment in one transaction.
+
+    The seat is taken first, with a conditional UPDATE (seats > 0), so the
+    database, not Python, decides who gets the last seat. That UPDATE holds
+    the exclusive lock on the course row before the enrollment insert needs
+    its foreign-key lock on the same row; inserting first would let two
+    concurrent enrolls each hold the shared lock and deadlock on InnoDB.
+    The unique (student_id, course_id) constraint rejects duplicates, and
+    rolling back gives the seat back.
+
+    A transaction the database still picks as a deadlock victim is retried
+    DEADLOCK_RETRIES times before ReservationBusy is raised.
+
+    Pending enrollments get a hold deadline after which the hold sweeper
+    gives the seat back.
+
+    Returns the id of the new enrollment.
+    """
+    for attempt in range(DEADLOCK_RETRIES + 1):
+        try:
+            return _reserve_seat(student_id, course_id, status)
+        except OperationalError as e:
+            db.session.rollback()
+            if not _is_lock_conflict(e):
+                raise
+            print(f"Seat reservation for course {course_id} hit a lock conflict (attempt {attempt + 1}): {e.orig}")
+    raise ReservationBusy(course_id)
+
+
+def _reserve_seat(student_id, course_id, status):
+    now = datetime.utcnow()
+    hold_expires_at = None
+    if status == 'pending_payment':
+        hold_expires_at = now + timedelta(minutes=current_app.config.get('SEAT_HOLD_MINUTES', 30))
+
+    claimed = db.session.execute(
+        update(Course)
+        .where(Course.id == course_id, Course.seats > 0)
+        .values(seats=Course.seats - 1)
+    ).rowcount
+
+    if not claimed:
+        db.session.rollback()
+        if db.session.get(Course, course_id) is None:
+            raise CourseNotFound(course_id)
+        already = db.session.scalar(
+            select(Enrollment.id).where(Enrollment.student_id == student_id, Enrollment.course_id == course_id)
+        )
+        raise AlreadyEnrolled(course_id) if already else CourseFull(course_id)
+
+    try:
+        result = db.session.execute(
+            insert(Enrollment).values(
+                student_id=student_id,
+                course_id=course_id,
+                status=status,
+                date_enrolled=now,
+                hold_expires_at=hold_expires_at,
+            )
+        )
+        enrollment_id = result.inserted_primary_key[0]
+    except IntegrityError:
+        db.session.rollback()
+        raise AlreadyEnrolled(course_id)
+
+    record_enrollment(now, course_id, status)
+    db.session.commit()
+    return enrollment_id
+
+
+def release_seats(*criteria):
+    """
+    Gives back one seat per enrollment matching criteria, in a single
+    correlated UPDATE on courses. Runs in the caller's transaction; call it
+    before the matching enrollments are deleted or moved out of criteria.
+    """
+    released = (
+        select(func.count(Enrollment.id))
+        .where(Enrollment.course_id == Course.id, *criteria)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(Course)
+        .where(Course.id.in_(select(Enrollment.course_id).where(*criteria)))
+        .values(seats=Course.seats + released),
+        execution_options={'synchronize_session': False},
+    )
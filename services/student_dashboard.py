@@ -0,0 +1,46 @@
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from models import db, StudentDetails, Enrollment, Course
+
+# Read-only rows for the student dashboard; templates never touch the session
+DashboardEnrollment = namedtuple(
+    'DashboardEnrollment', 'id status date_enrolled course_id course_code course_name course_fee'
+)
+StudentDashboard = namedtuple('StudentDashboard', 'student_id profile_image enrollments')
+
+
+def load_student_dashboard(user_id):
+    """
+    Loads the student's details and enrollments (with their courses) in one
+    outer-joined query, newest enrollment first. Returns None if the user has
+    no student details.
+    """
+    rows = db.session.execute(
+        select(
+            StudentDetails.id.label('student_id'),
+            StudentDetails.profile_image,
+            Enrollment.id,
+            Enrollment.status,
+            Enrollment.date_enrolled,
+            Course.id.label('course_id'),
+            Course.course_code,
+            Course.name.label('course_name'),
+            Course.fee.label('course_fee'),
+        )
+        .select_from(StudentDetails)
+        .outerjoin(Enrollment, Enrollment.student_id == StudentDetails.id)
+        .outerjoin(Course, Course.id == Enrollment.course_id)
+        .where(StudentDetails.user_id == user_id)
+        .order_by(Enrollment.date_enrolled.desc(), Enrollment.id.desc())
+    ).all()
+    if not rows:
+        return None
+
+    enrollments = [
+        DashboardEnrollment(row.id, row.status, row.date_enrolled, row.course_id,
+                            row.course_code, row.course_name, row.course_fee)
+        for row in rows if row.id is not None
+    ]
+    return StudentDashboard(rows[0].student_id, rows[0].profile_image, enrollments)
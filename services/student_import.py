@@ -0,0 +1,267 @@
+import csv
+import multiprocessing
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date
+from functools import partial
+
+import click
+from flask import current_app
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from models import db, User, StudentDetails, normalise_email
+from services.analytics import bump_counter
+from services.mail_outbox import enqueue_mails, wake_mail_workers
+from services.passwords import hash_options, UNUSABLE_PASSWORD
+from services.search import reindex_all
+
+REQUIRED_COLUMNS = ('name', 'email')
+OPTIONAL_COLUMNS = ('password', 'phone', 'address', 'dob')
+# Only this many row errors are kept for display; the rest are just counted
+MAX_REPORTED_ERRORS = 1000
+
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+RowError = namedtuple('RowError', 'line email message')
+
+WELCOME_SUBJECT = 'Your student account is ready'
+WELCOME_BODY = (
+    "Hello {name},\n\nAn account has been created for you with the email address {email}.\n\n"
+    "To sign in, first set your password with \"Forgot password\" on the login page{link}.\n\n"
+    "University Admin"
+)
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.generated_passwords = 0
+        self.welcome_mails = 0
+
+    def add_error(self, line, email, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line, email, message))
+
+    @property
+    def processed(self):
+        return self.created + self.error_count
+
+
+class HashPool:
+    """
+    Hashes passwords under the configured policy for one import. Password
+    hashing is deliberately slow, so large batches are spread over
+    STUDENT_IMPORT_HASH_WORKERS processes, started on first use and stopped
+    by shutdown() when the import ends.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+
+    def hash_passwords(self, passwords):
+        hash_one = partial(generate_password_hash, **hash_options())
+        if self.workers <= 1 or len(passwords) < 2 * self.workers:
+            return [hash_one(password) for password in passwords]
+        if self._executor is None:
+            # Spawned children, as in the report pool
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return list(self._executor.map(hash_one, passwords,
+                                       chunksize=max(1, len(passwords) // (self.workers * 4))))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _validate(row, seen_emails):
+    """Returns (clean row, None) or (None, error message)."""
+    name = (row.get('name') or '').strip()
+    email = normalise_email(row.get('email'))
+    if not name:
+        return None, 'Name is required.'
+    if len(name) > 100:
+        return None, 'Name is longer than 100 characters.'
+    if not _EMAIL_RE.match(email) or len(email) > 120:
+        return None, 'Invalid email address.'
+    if email in seen_emails:
+        return None, 'Email appears more than once in the file.'
+
+    phone = (row.get('phone') or '').strip() or None
+    if phone and len(phone) > 20:
+        return None, 'Phone is longer than 20 characters.'
+
+    dob = (row.get('dob') or '').strip() or None
+    if dob:
+        try:
+            dob = date.fromisoformat(dob)
+        except ValueError:
+            return None, 'Date of birth must be YYYY-MM-DD.'
+
+    return {
+        'name': name,
+        'email': email,
+        'password': row.get('password') or None,
+        'phone': phone,
+        'address': (row.get('address') or '').strip() or None,
+        'dob': dob,
+    }, None
+
+
+def _insert_rows(rows):
+    """Inserts users and their student details for rows (hashes already set) in the current transaction."""
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [
+        {'name': r['name'], 'email': r['email'], 'password_hash': r['password_hash'],
+         'role': 'student', 'created_at': now}
+        for r in rows
+    ])
+
+    # Enrollment numbers are derived from the new ids (UNIV + year + 3-digit user id,
+    # as in registration), so the whole block is allocated with one lookup
+    ids = dict(db.session.execute(
+        select(User.email, User.id).where(User.email.in_([r['email'] for r in rows]))
+    ).all())
+    year = now.year
+    db.session.execute(insert(StudentDetails), [
+        {'user_id': ids[r['email']], 'enrollment_no': f"UNIV{year}{ids[r['email']]:03d}",
+         'phone': r['phone'], 'address': r['address'], 'dob': r['dob']}
+        for r in rows
+    ])
+
+
+def _welcome_mails(rows, forgot_password_url):
+    """Mails for created rows whose password was generated, so the student can set their own."""
+    link = f": {forgot_password_url}" if forgot_password_url else ''
+    return [
+        {'recipient': row['email'], 'subject': WELCOME_SUBJECT,
+         'body': WELCOME_BODY.format(name=row['name'], email=row['email'], link=link)}
+        for row in rows if row['generated_password']
+    ]
+
+
+def _import_batch(batch, result, hash_pool, forgot_password_url=None):
+    """batch: list of (line, row). Commits the rows that could be inserted, with their welcome mails."""
+    # Emails are normalised on the way in, so the plain column (and its unique index) matches
+    existing = set(db.session.scalars(
+        select(User.email).where(User.email.in_([row['email'] for _, row in batch]))
+    ))
+    pending = []
+    for line, row in batch:
+        if row['email'] in existing:
+            result.add_error(line, row['email'], 'Email already exists.')
+        else:
+            pending.append((line, row))
+    if not pending:
+        return
+
+    # Students without a password get an unusable hash until they set one
+    with_password = [row for _, row in pending if not row['generated_password']]
+    for row, password_hash in zip(with_password, hash_pool.hash_passwords([row['password'] for row in with_password])):
+        row['password_hash'] = password_hash
+    for _, row in pending:
+        if row['generated_password']:
+            row['password_hash'] = UNUSABLE_PASSWORD
+
+    try:
+        _insert_rows([row for _, row in pending])
+        bump_counter('students', len(pending))
+        result.welcome_mails += enqueue_mails(_welcome_mails([row for _, row in pending], forgot_password_url))
+        db.session.commit()
+        result.created += len(pending)
+        return
+    except IntegrityError:
+        # Someone registered one of these emails meanwhile; find it row by row
+        db.session.rollback()
+
+    created = []
+    for line, row in pending:
+        try:
+            with db.session.begin_nested():
+                _insert_rows([row])
+            created.append(row)
+        except IntegrityError:
+            result.add_error(line, row['email'], 'Email already exists.')
+    bump_counter('students', len(created))
+    result.welcome_mails += enqueue_mails(_welcome_mails(created, forgot_password_url))
+    db.session.commit()
+    result.created += len(created)
+
+
+def import_students(lines, batch_size=None, forgot_password_url=None):
+    """
+    Imports students from CSV text (any iterable of lines, read as it goes).
+
+    The header must have name and email columns; password, phone, address and
+    dob (YYYY-MM-DD) are optional. Emails are stored trimmed and lower-cased.
+    Students without a password get one no login can match, and a welcome mail (queued with their row) asking them
+    to set their own through "Forgot password", linking forgot_password_url if
+    given. Invalid or duplicate rows are reported in the result and skipped;
+    every other row is inserted, in transactions of batch_size rows.
+    """
+    batch_size = batch_size or current_app.config.get('STUDENT_IMPORT_BATCH_SIZE', 500)
+    reader = csv.DictReader(lines)
+    columns = {(name or '').strip().lower() for name in reader.fieldnames or ()}
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+    # Tolerate header case and padding
+    reader.fieldnames = [(name or '').strip().lower() for name in reader.fieldnames]
+
+    result = ImportResult()
+    hash_pool = HashPool(current_app.config.get('STUDENT_IMPORT_HASH_WORKERS', 1))
+    seen_emails = set()
+    batch = []
+    try:
+        for row in reader:
+            line = reader.line_num
+            clean, error = _validate(row, seen_emails)
+            if error:
+                result.add_error(line, (row.get('email') or '').strip(), error)
+                continue
+            seen_emails.add(clean['email'])
+            clean['generated_password'] = not clean['password']
+            if clean['generated_password']:
+                result.generated_passwords += 1
+            batch.append((line, clean))
+            if len(batch) >= batch_size:
+                _import_batch(batch, result, hash_pool, forgot_password_url)
+                batch = []
+        if batch:
+            _import_batch(batch, result, hash_pool, forgot_password_url)
+    finally:
+        hash_pool.shutdown()
+
+    if result.created:
+        reindex_all()
+    if result.welcome_mails:
+        wake_mail_workers()
+    return result
+
+
+def init_app(app):
+    @app.cli.command('import-students')
+    @click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+    @click.option('--batch-size', type=int, default=None, help='Rows per transaction.')
+    @click.option('--forgot-password-url', default=None, help='Link for welcome mails, e.g. https://host/forgot-password.')
+    def import_students_command(csv_file, batch_size, forgot_password_url):
+        """Bulk-import students from a CSV file (name, email[, password, phone, address, dob])."""
+        try:
+            result = import_students(csv_file, batch_size=batch_size, forgot_password_url=forgot_password_url)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        for error in result.errors:
+            click.echo(f"line {error.line}: {error.email or '-'}: {error.message}", err=True)
+        if result.error_count > len(result.errors):
+            click.echo(f"... and {result.error_count - len(result.errors)} more errors", err=True)
+        click.echo(f"Imported {result.created} students, skipped {result.error_count} rows.")
+        if result.welcome_mails:
+            click.echo(f"Queued {result.welcome_mails} welcome mails for students without a password.")
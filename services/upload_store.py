@@ -0,0 +1,267 @@
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+from collections import namedtuple
+
+import click
+from flask import current_app, url_for
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import select
+
+from models import db, StudentDetails
+
+# Uploads are stored under the static folder as uploads/objects/<2 hex>/<sha256>.<ext>
+OBJECTS_DIR = 'uploads/objects'
+CHUNK_SIZE = 64 * 1024
+# Pillow format -> extension of the stored original
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Variant extension -> (Pillow format, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+StoredUpload = namedtuple('StoredUpload', 'path digest size created')
+
+
+class UploadError(ValueError):
+    """The upload is empty, too large or not an image we accept."""
+
+
+def _static_path(path):
+    return os.path.join(current_app.static_folder, *path.split('/'))
+
+
+def object_path(digest, ext):
+    return f"{OBJECTS_DIR}/{digest[:2]}/{digest}.{ext}"
+
+
+def variant_path(path, size, ext):
+    """Where the size-px variant of the stored upload at path lives (relative to static)."""
+    return f"{path.rsplit('.', 1)[0]}_{size}.{ext}"
+
+
+def _image_extension(file_path):
+    try:
+        with Image.open(file_path) as img:
+            image_format = img.format
+            img.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise UploadError('The file is not a valid image.')
+    if image_format not in IMAGE_FORMATS:
+        raise UploadError('Only PNG, JPEG, GIF and WebP images are accepted.')
+    return IMAGE_FORMATS[image_format]
+
+
+def store_upload(stream, variants=False):
+    """
+    Copies an uploaded image into the content-addressed store and returns a
+    StoredUpload whose path (relative to the static folder) goes in the
+    database.
+
+    The stream is read in CHUNK_SIZE pieces into a temporary file next to the
+    store while its SHA-256 is computed, so memory stays flat whatever the
+    file size. The name comes from the hash and the detected image format,
+    never from the client's filename. A file already in the store is not
+    written again; otherwise the temporary file is renamed into place
+    atomically, so readers never see a partial file. With variants=True the
+    downscaled copies are queued for the background worker.
+    """
+    max_bytes = current_app.config.get('MAX_CONTENT_LENGTH')
+    tmp_dir = _static_path(f"{OBJECTS_DIR}/tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, prefix='upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadError('The file is too large.')
+                digest.update(chunk)
+                out.write(chunk)
+        if not size:
+            raise UploadError('The file is empty.')
+
+        hexdigest = digest.hexdigest()
+        path = object_path(hexdigest, _image_extension(tmp_path))
+        final_path = _static_path(path)
+        created = not os.path.exists(final_path)
+        if created:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.chmod(tmp_path, 0o644)  # mkstemp files are owner-only; these are served as static files
+            os.replace(tmp_path, final_path)
+        else:
+            os.unlink(tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    if variants:
+        current_app.extensions['upload_variants'].submit(path)
+    return StoredUpload(path, hexdigest, size, created)
+
+
+def _scaled(size, width, height):
+    # Variants are named for their shorter side, so they fill a size x size box (object-fit: cover)
+    scale = min(1.0, size / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _save_atomically(img, target, image_format, options):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='variant-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            img.save(out, format=image_format, **options)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def build_variants(path, sizes=None):
+    """
+    Writes the WebP and JPEG variants of the stored image at path for each
+    size in sizes (UPLOAD_VARIANT_SIZES by default). Variants that already
+    exist are skipped. Returns the number written.
+    """
+    sizes = sorted(sizes or current_app.config.get('UPLOAD_VARIANT_SIZES', (160, 320)))
+    missing = [(size, ext) for size in sizes for ext in VARIANT_FORMATS
+               if not os.path.exists(_static_path(variant_path(path, size, ext)))]
+    if not missing:
+        return 0
+
+    with Image.open(_static_path(path)) as img:
+        # Let the JPEG decoder downscale by a power of two while it reads
+        img.draft('RGB', _scaled(max(sizes), *img.size))
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+
+    written = 0
+    resized = {}
+    for size, ext in missing:
+        if size not in resized:
+            dimensions = _scaled(size, *img.size)
+            resized[size] = img.resize(dimensions, Image.LANCZOS) if dimensions != img.size else img
+        variant = resized[size]
+        image_format, options = VARIANT_FORMATS[ext]
+        if image_format == 'JPEG' and variant.mode == 'RGBA':
+            flat = Image.new('RGB', variant.size, 'white')
+            flat.paste(variant, mask=variant.getchannel('A'))
+            variant = flat
+        _save_atomically(variant, _static_path(variant_path(path, size, ext)), image_format, options)
+        written += 1
+    return written
+
+
+def upload_url(path, size=None, ext='jpg'):
+    """
+    Template helper: the URL of the size-px variant of a stored upload when it
+    has been built, else of the original. For ext='webp' there is no fallback
+    and None is returned, so templates can leave the <source> out.
+    """
+    if not path:
+        return None
+    if size:
+        variant = variant_path(path, size, ext)
+        if os.path.exists(_static_path(variant)):
+            return url_for('static', filename=variant)
+        if ext == 'webp':
+            return None
+    return url_for('static', filename=path)
+
+
+class VariantWorker:
+    """
+    Background threads that build image variants for newly stored uploads.
+    Started by app.start_background_workers(); until then submit() drops the
+    work and 'flask build-upload-variants' fills the gaps.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._queue = queue.Queue()
+        self.threads = []
+        self.built = 0
+        self.failed = 0
+
+    def submit(self, path):
+        if self.threads:
+            self._queue.put(path)
+
+    def start(self, workers):
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, name=f'upload-variants-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def join(self):
+        """Blocks until every submitted upload has been processed."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                with self.app.app_context():
+                    self.built += build_variants(path)
+            except Exception as e:
+                self.failed += 1
+                print(f"Building variants for {path} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        return {'workers': len(self.threads), 'queued': self._queue.qsize(),
+                'built': self.built, 'failed': self.failed}
+
+
+def iter_stored_uploads(app):
+    """Paths of every original in the store (variants and temporary files excluded)."""
+    root = os.path.join(app.static_folder, *OBJECTS_DIR.split('/'))
+    if not os.path.isdir(root):
+        return
+    for shard in sorted(os.listdir(root)):
+        if shard == 'tmp':
+            continue
+        for name in sorted(os.listdir(os.path.join(root, shard))):
+            stem = name.rsplit('.', 1)[0]
+            if '_' not in stem and not name.startswith(('upload-', 'variant-')):
+                yield f"{OBJECTS_DIR}/{shard}/{name}"
+
+
+def init_app(app):
+    worker = VariantWorker(app)
+    app.extensions['upload_variants'] = worker
+    app.jinja_env.globals['upload_url'] = upload_url
+
+    @app.cli.command('build-upload-variants')
+    def build_upload_variants_command():
+        """Build any missing WebP/JPEG variants for stored uploads and older profile pictures."""
+        # Profile pictures uploaded before the store still sit under uploads/profile_pics
+        legacy = db.session.scalars(
+            select(StudentDetails.profile_image).where(StudentDetails.profile_image.isnot(None)).distinct()
+        ).all()
+        paths = list(iter_stored_uploads(app))
+        paths += sorted(set(legacy) - set(paths))
+        written = failed = 0
+        for path in paths:
+            if not os.path.exists(_static_path(path)):
+                continue
+            try:
+                written += build_variants(path)
+            except Exception as e:
+                failed += 1
+                click.echo(f"{path}: {e}", err=True)
+        click.echo(f"Wrote {written} variants ({failed} uploads failed).")
@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app_testcase import AppTestCase
+from models import db, User, StudentDetails, Course, Enrollment, EnrollmentDailyRollup
+from services.analytics import read_counters, seed_analytics, rebuild_analytics, analytics_summary, record_status_change
+from services.hold_sweeper import sweep_expired_holds
+from services.seat_reservation import reserve_seat
+
+
+class AnalyticsTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.courses = [Course(course_code=f'C{i}', name=f'Course {i}', credits=3, seats=10) for i in range(2)]
+        db.session.add_all(self.courses)
+        self.students = []
+        for i in range(3):
+            user = User(name=f'Student {i}', email=f's{i}@example.com', password_hash='x', role='student')
+            db.session.add(user)
+            db.session.flush()
+            details = StudentDetails(user_id=user.id, enrollment_no=f'UNIV{i:03d}')
+            db.session.add(details)
+            db.session.flush()
+            self.students.append(details.id)
+        db.session.commit()
+        # Existing enrollment from before analytics was seeded
+        reserve_seat(self.students[0], self.courses[0].id, status='enrolled')
+
+    def snapshot(self):
+        rollups = db.session.execute(
+            select(EnrollmentDailyRollup.day, EnrollmentDailyRollup.course_id,
+                   EnrollmentDailyRollup.status, EnrollmentDailyRollup.count)
+            .where(EnrollmentDailyRollup.count != 0)
+            .order_by(EnrollmentDailyRollup.day, EnrollmentDailyRollup.course_id, EnrollmentDailyRollup.status)
+        ).all()
+        return read_counters(), [tuple(row) for row in rollups]
+
+    def test_seeding_runs_once(self):
+        # Before seeding only the enrollment events were recorded
+        self.assertEqual(read_counters(), {'students': 0, 'courses': 0, 'enrollments': 1})
+        self.assertTrue(seed_analytics())
+        self.assertEqual(read_counters(), {'students': 3, 'courses': 2, 'enrollments': 1})
+        self.assertFalse(seed_analytics())
+
+    def test_events_match_a_full_rebuild(self):
+        seed_analytics()
+        reserve_seat(self.students[1], self.courses[0].id)
+        reserve_seat(self.students[2], self.courses[1].id)
+        enrollment = Enrollment.query.filter_by(student_id=self.students[1]).one()
+        record_status_change(enrollment.date_enrolled, enrollment.course_id, enrollment.status, 'enrolled')
+        enrollment.status = 'enrolled'
+        db.session.commit()
+        sweep_expired_holds(now=datetime.utcnow() + timedelta(days=1))
+
+        maintained = self.snapshot()
+        self.assertEqual(maintained[0]['enrollments'], 2)
+        rebuild_analytics()
+        self.assertEqual(maintained, self.snapshot())
+
+    def test_summary_reads_rollups(self):
+        seed_analytics()
+        reserve_seat(self.students[1], self.courses[1].id)
+        summary = analytics_summary(days=7)
+        self.assertEqual(len(summary['daily']['labels']), 7)
+        self.assertEqual(summary['daily']['values'][-1], 2)
+        self.assertEqual(summary['by_status'], {'enrolled': 1, 'pending_payment': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,4 @@
-from app import create_app, User
+from app import create_app, seed_database, User
 import unittest
 
 class LoginTestCase(unittest.TestCase):
@@ -8,10 +8,9 @@ class LoginTestCase(unittest.TestCase):
         self.app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
         self.client = self.app.test_client()
         
-        with self.app.app_context():
-            # Ensure admin exists is handled by app startup or seed
-            # We assume database is populated as per debug_login.py
-            pass
+        # Ensure admin exists (what app startup did before 'flask init-db')
+        # We assume database is populated as per debug_login.py
+        seed_database(self.app)
 
     def test_admin_login(self):
         print("Testing Admin Login...")
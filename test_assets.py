@@ -0,0 +1,83 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from app import create_app
+from app_testcase import TestConfig
+from services.assets import BUNDLES, MANIFEST_NAME, build_assets, minify_css, prune_icon_rules
+
+
+class AssetTestCase(unittest.TestCase):
+    def setUp(self):
+        dist = self.dist = tempfile.mkdtemp()
+
+        class DistConfig(TestConfig):
+            ASSET_DIST_DIR = dist
+
+        self.app = create_app(DistConfig)
+
+    def tearDown(self):
+        shutil.rmtree(self.dist)
+
+    def read(self, name):
+        with open(os.path.join(self.dist, *name.split('/')), 'rb') as f:
+            return f.read()
+
+    def test_minify_and_prune(self):
+        self.assertEqual(minify_css("/* note */\na  >  b {\n  color: red;\n}\n/*! keep */"), "a>b{color:red}/*! keep */")
+        css, codepoints = prune_icon_rules('.fa-a:before,.fa-b:before{content:"\\f001"}.fa-c:before{content:"\\f002"}',
+                                           {'b'})
+        self.assertEqual((css, codepoints), ('.fa-a:before,.fa-b:before{content:"\\f001"}', {0xf001}))
+
+    def test_build(self):
+        manifest = build_assets(self.app)
+        with open(os.path.join(self.dist, MANIFEST_NAME)) as f:
+            self.assertEqual(json.load(f), manifest)
+
+        for name in BUNDLES:
+            built = manifest[name]
+            data = self.read(built)
+            self.assertIn(hashlib.sha256(data).hexdigest()[:10], built)
+            self.assertEqual(gzip.decompress(self.read(built + '.gz')), data)
+
+        vendor = self.read(manifest['vendor.css']).decode()
+        # Icons the templates use survive, the rest of Font Awesome's 1800 glyph rules do not
+        self.assertIn('.fa-user-graduate:before', vendor)
+        self.assertIn('.fa-lock:before', vendor)  # only named inside fa-{{ ... }}
+        self.assertNotIn('.fa-otter:before', vendor)
+        fonts = re.findall(r'url\(([^)]+)\)', ''.join(re.findall(r'@font-face\{[^}]*\}', vendor)))
+        self.assertTrue(fonts)
+        for font in fonts:
+            self.assertRegex(font, r'^webfonts/fa-[a-z]+-\d+\.[0-9a-f]{10}\.woff2$')
+            self.assertTrue(os.path.exists(os.path.join(self.dist, font)))
+        self.assertNotIn('sourceMappingURL', self.read(manifest['site.js']).decode())
+
+    def test_pages_use_built_assets_served_immutable(self):
+        with self.app.test_client() as client:
+            page = client.get('/login').get_data(as_text=True)
+            manifest = self.app.extensions['assets'].get()  # built on first use
+            self.assertIn(f"/assets/{manifest['vendor.css']}", page)
+            self.assertIn(f"/assets/{manifest['site.js']}", page)
+            self.assertNotIn('cdn.jsdelivr.net', page)
+
+            url = f"/assets/{manifest['vendor.css']}"
+            compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+            plain = client.get(url)
+            missing = client.get(f'/assets/{MANIFEST_NAME}')
+
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertEqual(compressed.mimetype, 'text/css')
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(missing.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
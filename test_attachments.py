@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from services.attachments import AttachmentRegistry
+
+
+class AttachmentRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.write('rules.pdf', b'v1', mtime=1000)
+        self.registry = AttachmentRegistry(self.root, {'rules': ('rules.pdf', 'University_Rules.pdf')},
+                                           check_seconds=30)
+
+    def write(self, name, data, mtime):
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        os.utime(path, (mtime, mtime))
+
+    def get(self, key, at):
+        with mock.patch('services.attachments.time.monotonic', return_value=at):
+            return self.registry.get(key)
+
+    def test_changed_file_is_reloaded_only_after_check_seconds(self):
+        attachment = self.get('rules', 100.0)
+        self.assertEqual(attachment, ('University_Rules.pdf', 'application/pdf', b'v1'))
+
+        self.write('rules.pdf', b'v2', mtime=2000)
+        # Within the window the cached bytes are served without touching the file
+        with mock.patch('services.attachments.os.stat') as stat:
+            self.assertEqual(self.get('rules', 129.0).data, b'v1')
+        stat.assert_not_called()
+
+        self.assertEqual(self.get('rules', 130.0).data, b'v2')
+        self.assertEqual(self.registry.loads, 2)
+
+    def test_unchanged_file_is_not_read_again(self):
+        self.get('rules', 100.0)
+        self.assertEqual(self.get('rules', 200.0).data, b'v1')
+        self.assertEqual(self.registry.loads, 1)
+        self.assertEqual(self.registry.hits, 1)
+
+    def test_missing_or_deleted_file_returns_none(self):
+        self.registry.register('brochure', 'brochure.pdf')
+        self.assertIsNone(self.get('brochure', 100.0))
+
+        self.get('rules', 100.0)
+        os.remove(os.path.join(self.root, 'rules.pdf'))
+        self.assertIsNone(self.get('rules', 130.0))
+        self.assertEqual(self.registry.stats()['cached'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
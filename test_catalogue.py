@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+from werkzeug.security import generate_password_hash
+
+from app_testcase import AppTestCase
+from models import db, User, StudentDetails, Course
+from services.catalogue import get_facets, get_facet_courses, invalidate_catalogue
+
+
+class CatalogueCacheTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        for code, level, stream in (('P1S1', '1st PU', 'Science'), ('P1S2', '1st PU', 'Science'),
+                                    ('P1C1', '1st PU', 'Commerce'), ('P2A1', '2nd PU', 'Arts')):
+            db.session.add(Course(course_code=code, name=f'Course {code}', credits=3, seats=30,
+                                  level=level, stream=stream))
+        db.session.commit()
+        self.count_statements()
+
+    def test_hits_skip_the_database(self):
+        facets = get_facets()
+        courses = get_facet_courses('1st PU', 'Science')
+        # One GROUP BY for the facets, one query for the course list
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual([(level.name, level.course_count) for level in facets], [('1st PU', 3), ('2nd PU', 1)])
+        self.assertEqual([s.name for s in facets[0].streams], ['Commerce', 'Science'])
+        self.assertEqual([c.course_code for c in courses], ['P1S1', 'P1S2'])
+
+        self.statements.clear()
+        self.assertIs(get_facets(), facets)
+        self.assertIs(get_facet_courses('1st PU', 'Science'), courses)
+        self.assertEqual(self.statements, [])
+        stats = self.app.extensions['catalogue_cache'].stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_invalidation_shows_a_new_course(self):
+        get_facets()
+        get_facet_courses('2nd PU', 'Arts')
+
+        db.session.add(Course(course_code='P2A2', name='Course P2A2', credits=3, seats=30,
+                              level='2nd PU', stream='Arts'))
+        db.session.commit()
+        invalidate_catalogue()
+
+        self.assertEqual(get_facets()[1].course_count, 2)
+        self.assertEqual([c.course_code for c in get_facet_courses('2nd PU', 'Arts')], ['P2A1', 'P2A2'])
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = self.app.extensions['catalogue_cache']
+        self.assertEqual(cache.ttl, 30)
+
+        with mock.patch('services.catalogue.time.monotonic', return_value=1000.0):
+            first = get_facet_courses('1st PU', 'Commerce')
+        # Seats change through enrollments, which never invalidate the catalogue
+        db.session.get(Course, first[0].id).seats = 5
+        db.session.commit()
+        with mock.patch('services.catalogue.time.monotonic', return_value=1029.0):
+            self.assertIs(get_facet_courses('1st PU', 'Commerce'), first)
+        with mock.patch('services.catalogue.time.monotonic', return_value=1030.0):
+            self.assertEqual(get_facet_courses('1st PU', 'Commerce')[0].seats, 5)
+
+    def test_levels_and_streams_pages_render(self):
+        user = User(name='Student', email='student@example.com',
+                    password_hash=generate_password_hash('secret'), role='student')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(StudentDetails(user_id=user.id, enrollment_no='UNIV2026001'))
+        db.session.commit()
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+        response = client.get('/student/courses')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'1st PU', response.data)
+        self.assertIn(b'2nd PU', response.data)
+
+        response = client.get('/student/courses?level=1st+PU')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Commerce', response.data)
+        self.assertIn(b'Science', response.data)
+        self.assertNotIn(b'Arts', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import io
+import json
+import unittest
+
+from app_testcase import AppTestCase
+from models import db, User, Course, CourseSection, StudentDetails, Enrollment
+from services.analytics import read_counters, seed_analytics
+from services.catalogue_transfer import stream_catalogue, import_catalogue, load_document, CatalogueImportError
+from services.curriculum import get_curriculum
+from services.search import search_courses
+
+
+DOCUMENT = {
+    'version': 1,
+    'courses': [
+        {
+            'course_code': 'PHY101', 'name': 'Physics', 'credits': 4, 'seats': 40, 'fee': 900,
+            'level': '1st PU', 'stream': 'Science',
+            'sections': [
+                {'title': 'Mechanics', 'order': 1, 'videos': [
+                    {'title': 'Newton', 'video_url': 'https://youtu.be/a', 'duration': '10:00'},
+                    {'title': 'Momentum', 'video_url': 'https://youtu.be/b'},
+                ]},
+                {'title': 'Optics', 'order': 2, 'videos': [{'title': 'Lenses', 'video_url': 'https://youtu.be/c'}]},
+            ],
+            'videos': [{'title': 'Welcome', 'video_url': 'https://youtu.be/w'}],
+        },
+        {'course_code': 'BIO101', 'name': 'Biology', 'credits': 3},
+    ],
+}
+
+
+class CatalogueTransferTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        course = Course(course_code='PHY101', name='Old Physics', credits=2, seats=10)
+        db.session.add(course)
+        db.session.flush()
+        db.session.add(CourseSection(course_id=course.id, title='Old section'))
+        user = User(name='S', email='s@example.com', password_hash='x', role='student')
+        db.session.add(user)
+        db.session.flush()
+        details = StudentDetails(user_id=user.id, enrollment_no='UNIV001')
+        db.session.add(details)
+        db.session.flush()
+        db.session.add(Enrollment(student_id=details.id, course_id=course.id))
+        db.session.commit()
+        self.course_id = course.id
+        seed_analytics()
+
+    def test_import_upserts_and_replaces_curriculum(self):
+        get_curriculum(self.course_id)
+        summary = import_catalogue(DOCUMENT)
+        self.assertEqual(summary, {'created': 1, 'updated': 1, 'sections': 2, 'videos': 4})
+
+        physics = db.session.get(Course, self.course_id)
+        # Remaining seats are live state: the document's 40 does not overwrite them
+        self.assertEqual((physics.name, physics.seats, physics.fee), ('Physics', 10, 900))
+        self.assertEqual(Course.query.filter_by(course_code='BIO101').one().seats, 30)
+        self.assertEqual(Enrollment.query.filter_by(course_id=self.course_id).count(), 1)
+
+        curriculum = get_curriculum(self.course_id)
+        self.assertEqual([s.title for s in curriculum.sections], ['Mechanics', 'Optics'])
+        self.assertEqual([v.title for v in curriculum.sections[0].videos], ['Newton', 'Momentum'])
+        self.assertEqual([v.title for v in curriculum.orphaned_videos], ['Welcome'])
+        self.assertEqual(read_counters()['courses'], 2)
+        self.assertEqual(len(search_courses('biology')), 1)
+
+    def test_export_round_trips(self):
+        import_catalogue(DOCUMENT)
+        exported = json.loads(''.join(stream_catalogue('json')))
+        self.assertEqual([c['course_code'] for c in exported['courses']], ['BIO101', 'PHY101'])
+        physics = exported['courses'][1]
+        self.assertEqual([v['title'] for v in physics['sections'][0]['videos']], ['Newton', 'Momentum'])
+
+        # Importing an export back changes nothing
+        self.assertEqual(import_catalogue(exported)['created'], 0)
+        self.assertEqual(json.loads(''.join(stream_catalogue('json')))['courses'], exported['courses'])
+
+        yaml_document = load_document(''.join(stream_catalogue('yaml')), 'catalogue.yaml')
+        self.assertEqual(yaml_document['courses'], exported['courses'])
+
+    def test_videos_follow_section_order_not_insertion_order(self):
+        document = {'courses': [{
+            'course_code': 'CHE101', 'name': 'Chemistry', 'credits': 3,
+            'sections': [
+                {'title': 'Organic', 'order': 5, 'videos': [{'title': 'Carbon', 'video_url': 'https://youtu.be/o'}]},
+                {'title': 'Inorganic', 'order': 2, 'videos': [{'title': 'Salts', 'video_url': 'https://youtu.be/i'}]},
+            ],
+        }]}
+        import_catalogue(document)
+        course = Course.query.filter_by(course_code='CHE101').one()
+        curriculum = get_curriculum(course.id)
+        self.assertEqual([(s.title, [v.title for v in s.videos]) for s in curriculum.sections],
+                         [('Inorganic', ['Salts']), ('Organic', ['Carbon'])])
+
+    def test_duplicate_section_orders_are_rejected(self):
+        document = {'courses': [{'course_code': 'CHE101', 'name': 'Chemistry', 'credits': 3,
+                                 'sections': [{'title': 'A', 'order': 1}, {'title': 'B', 'order': 1}]}]}
+        with self.assertRaises(CatalogueImportError) as raised:
+            import_catalogue(document)
+        self.assertEqual(raised.exception.errors, ['course CHE101 section 2: order 1 is used by another section'])
+
+    def test_invalid_document_writes_nothing(self):
+        document = {'courses': [{'course_code': 'NEW1', 'name': 'New', 'credits': 3},
+                                {'course_code': 'NEW2', 'name': '', 'credits': 'many',
+                                 'sections': [{'videos': [{'title': 'x'}]}]}]}
+        with self.assertRaises(CatalogueImportError) as raised:
+            import_catalogue(document)
+        self.assertEqual(raised.exception.errors, [
+            'course NEW2: name is required',
+            'course NEW2: credits must be a number',
+            'course NEW2 section 1: title is required',
+            'course NEW2 section 1 video 1: video_url is required',
+        ])
+        self.assertEqual(Course.query.count(), 1)
+
+    def test_admin_upload(self):
+        admin = User(name='Admin', email='admin@univ.edu', role='admin')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'admin@univ.edu', 'password': 'admin'})
+            client.post('/admin/courses/import', data={
+                'catalogue_file': (io.BytesIO(json.dumps(DOCUMENT).encode()), 'catalogue.json'),
+            }, content_type='multipart/form-data')
+            response = client.get('/admin/courses/export?format=json')
+            self.assertEqual(len(json.loads(response.data)['courses']), 2)
+        self.assertEqual(Course.query.count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import gzip
+import unittest
+
+from flask import Blueprint, Response
+
+from app import create_app
+from app_testcase import TestConfig
+from services.compression import brotli_supported
+
+PAGE = '<html><body>' + ''.join(f'<p>Section {i}: lecture notes</p>' for i in range(200)) + '</body></html>'
+
+
+class CompressionTestCase(unittest.TestCase):
+    config = TestConfig
+
+    def setUp(self):
+        self.app = create_app(self.config)
+        files = Blueprint('files', __name__)
+
+        @files.route('/files/page')
+        def page():
+            return PAGE
+
+        @files.route('/files/tiny')
+        def tiny():
+            return 'ok'
+
+        @files.route('/files/stream')
+        def stream():
+            return Response((PAGE for _ in range(3)), mimetype='text/html')
+
+        @files.route('/files/download')
+        def download():
+            return Response(PAGE, mimetype='text/csv', headers={'Content-Disposition': 'attachment; filename=a.csv'})
+
+        @files.route('/files/encoded')
+        def encoded():
+            return Response(gzip.compress(PAGE.encode()), mimetype='text/css', headers={'Content-Encoding': 'gzip'})
+
+        self.app.register_blueprint(files)
+        self.client = self.app.test_client()
+
+    def get(self, url, encoding='gzip', etag=None):
+        headers = {'Accept-Encoding': encoding}
+        if etag:
+            headers['If-None-Match'] = etag
+        return self.client.get(url, headers=headers)
+
+
+class MiddlewareTestCase(CompressionTestCase):
+    def test_compresses_and_tags_pages(self):
+        plain = self.get('/files/page', encoding='identity')
+        compressed = self.get('/files/page')
+
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertEqual(int(compressed.headers['Content-Length']), len(compressed.data))
+        self.assertLess(len(compressed.data), len(plain.data) / 5)
+        # One weak ETag for every encoding of the same body
+        self.assertTrue(compressed.headers['ETag'].startswith('W/"'))
+        self.assertEqual(compressed.headers['ETag'], plain.headers['ETag'])
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertEqual(compressed.headers['Cache-Control'], 'private, no-cache')
+
+        revalidated = self.get('/files/page', etag=compressed.headers['ETag'])
+        self.assertEqual((revalidated.status_code, revalidated.data), (304, b''))
+        self.assertEqual(revalidated.headers['ETag'], compressed.headers['ETag'])
+        self.assertEqual(self.get('/files/page', etag='W/"stale"').status_code, 200)
+
+        self.assertNotIn('Content-Encoding', self.get('/files/page', encoding='gzip;q=0').headers)
+        self.assertEqual(self.app.extensions['compression'].stats()['not_modified'], 1)
+
+    def test_brotli_when_installed(self):
+        if not brotli_supported():
+            self.skipTest('brotli is not installed')
+        response = self.get('/files/page', encoding='gzip, br')
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+
+    def test_leaves_other_responses_alone(self):
+        for url in ('/files/tiny', '/files/stream', '/files/download'):
+            response = self.get(url)
+            self.assertNotIn('Content-Encoding', response.headers, url)
+            self.assertNotIn('ETag', response.headers, url)
+        encoded = self.get('/files/encoded')
+        self.assertEqual(gzip.decompress(encoded.data).decode(), PAGE)
+        self.assertNotIn('ETag', encoded.headers)
+
+    def test_rendered_login_page(self):
+        response = self.get('/login')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Sign', gzip.decompress(response.data).decode())
+
+
+class ExcludedBlueprintTestCase(CompressionTestCase):
+    class config(TestConfig):
+        COMPRESS_EXCLUDE_BLUEPRINTS = ('files',)
+
+    def test_excluded_blueprint_passes_through(self):
+        response = self.get('/files/page')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(response.get_data(as_text=True), PAGE)
+        self.assertEqual(self.get('/login').headers['Content-Encoding'], 'gzip')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from unittest import mock
+
+from flask import render_template
+
+from app_testcase import AppTestCase
+from models import db, Course, CourseSection, CourseVideo
+from services.curriculum import load_curriculum, get_curriculum, invalidate_curriculum
+
+
+class CurriculumQueryCountTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.count_statements()
+
+    def make_course(self, code, section_count, videos_per_section=3):
+        course = Course(course_code=code, name=f'Course {code}', credits=3, seats=30)
+        db.session.add(course)
+        db.session.flush()
+        for s in range(section_count):
+            section = CourseSection(course_id=course.id, title=f'Section {s}', section_order=section_count - s)
+            db.session.add(section)
+            db.session.flush()
+            for v in range(videos_per_section):
+                db.session.add(CourseVideo(course_id=course.id, section_id=section.id, title=f'Video {s}.{v}',
+                                           video_url='https://youtu.be/dQw4w9WgXcQ', sequence_order=videos_per_section - v))
+        db.session.add(CourseVideo(course_id=course.id, title='Intro', video_url='https://youtu.be/dQw4w9WgXcQ'))
+        db.session.commit()
+        return course
+
+    def load_and_render(self, course_id):
+        db.session.expire_all()
+        self.statements.clear()
+        course = db.session.get(Course, course_id)
+        curriculum = load_curriculum(course.id)
+        with self.app.test_request_context():
+            render_template('student/watch_course.html', course=course,
+                            sections=curriculum.sections, orphaned_videos=curriculum.orphaned_videos)
+        return curriculum, len(self.statements)
+
+    def test_statement_count_is_constant(self):
+        small = self.make_course('SMALL', section_count=1)
+        large = self.make_course('LARGE', section_count=25)
+
+        _, small_count = self.load_and_render(small.id)
+        curriculum, large_count = self.load_and_render(large.id)
+
+        # Course, sections, videos
+        self.assertEqual(small_count, 3)
+        self.assertEqual(large_count, small_count)
+        self.assertEqual(len(curriculum.sections), 25)
+        self.assertEqual(len(curriculum.orphaned_videos), 1)
+
+    def test_tree_is_ordered(self):
+        course = self.make_course('ORDER', section_count=4)
+        curriculum = load_curriculum(course.id)
+
+        orders = [section.section_order for section in curriculum.sections]
+        self.assertEqual(orders, sorted(orders))
+        for section in curriculum.sections:
+            sequence = [video.sequence_order for video in section.videos]
+            self.assertEqual(sequence, sorted(sequence))
+
+    def test_cache_hits_skip_the_database_until_invalidated(self):
+        course = self.make_course('CACHE', section_count=2)
+        cache = self.app.extensions['curriculum_cache']
+
+        first = get_curriculum(course.id)
+        self.statements.clear()
+        self.assertIs(get_curriculum(course.id), first)
+        self.assertEqual(self.statements, [])
+
+        db.session.add(CourseSection(course_id=course.id, title='New', section_order=99))
+        db.session.commit()
+        invalidate_curriculum(course.id)
+
+        self.assertEqual(len(get_curriculum(course.id).sections), 3)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['invalidations']), (1, 2, 1))
+
+    def test_entries_expire_without_a_shared_store(self):
+        course = self.make_course('TTL', section_count=1)
+        cache = self.app.extensions['curriculum_cache']
+        self.assertEqual(cache.ttl, 60)
+
+        with mock.patch('services.curriculum.time.monotonic', return_value=1000.0):
+            first = get_curriculum(course.id)
+        # Another worker adds a section; its invalidation never reaches this process
+        db.session.add(CourseSection(course_id=course.id, title='Elsewhere', section_order=99))
+        db.session.commit()
+        with mock.patch('services.curriculum.time.monotonic', return_value=1059.0):
+            self.assertIs(get_curriculum(course.id), first)
+        with mock.patch('services.curriculum.time.monotonic', return_value=1060.0):
+            self.assertEqual(len(get_curriculum(course.id).sections), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
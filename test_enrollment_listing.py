@@ -0,0 +1,77 @@
+import unittest
+from datetime import datetime
+
+from app_testcase import AppTestCase
+from models import db, User, StudentDetails, Course, Enrollment
+from services.enrollment_listing import enrollments_page, decode_cursor, encode_cursor
+
+
+class EnrollmentListingTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User(name='Student', email='s@example.com', password_hash='x', role='student')
+        db.session.add(user)
+        db.session.flush()
+        details = StudentDetails(user_id=user.id, enrollment_no='UNIV001')
+        db.session.add(details)
+        db.session.flush()
+
+        # Ties on date_enrolled and legacy rows without one, interleaved by id
+        dates = [datetime(2024, 1, 2), None, datetime(2024, 1, 1), datetime(2024, 1, 2),
+                 None, datetime(2024, 1, 3), datetime(2024, 1, 1), None]
+        for i, date_enrolled in enumerate(dates):
+            course = Course(course_code=f'C{i}', name=f'Course {i}', credits=3, seats=10)
+            db.session.add(course)
+            db.session.flush()
+            enrollment = Enrollment(student_id=details.id, course_id=course.id, status='enrolled')
+            db.session.add(enrollment)
+            db.session.flush()
+            enrollment.date_enrolled = date_enrolled
+        db.session.commit()
+
+    def walk(self, per_page):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = enrollments_page({}, cursor=cursor, per_page=per_page)
+            seen.extend(row.id for row in rows)
+            if cursor is None:
+                return seen
+
+    def test_pages_are_complete_and_ordered(self):
+        dated = sorted(
+            db.session.query(Enrollment.date_enrolled, Enrollment.id).filter(Enrollment.date_enrolled.isnot(None)),
+            reverse=True)
+        undated = sorted(
+            (row.id for row in db.session.query(Enrollment.id).filter(Enrollment.date_enrolled.is_(None))),
+            reverse=True)
+        expected = [row.id for row in dated] + undated
+
+        for per_page in (1, 2, 3, 5, 8, 50):
+            self.assertEqual(self.walk(per_page), expected, f'per_page={per_page}')
+
+    def test_page_boundary_between_dated_and_undated_rows(self):
+        first, cursor = enrollments_page({}, per_page=5)
+        self.assertTrue(all(row.date_enrolled is not None for row in first))
+        self.assertIsNotNone(cursor)
+        second, cursor = enrollments_page({}, cursor=cursor, per_page=5)
+        self.assertEqual([row.date_enrolled for row in second], [None] * 3)
+        self.assertEqual([row.id for row in second], sorted((row.id for row in second), reverse=True))
+        self.assertIsNone(cursor)
+
+    def test_undated_rows_are_only_read_once_dated_rows_run_out(self):
+        self.count_statements()
+        enrollments_page({}, per_page=2)
+        self.assertEqual(len(self.statements), 1)
+        self.statements.clear()
+        enrollments_page({}, per_page=6)
+        self.assertEqual(len(self.statements), 2)
+
+    def test_cursor_round_trips_missing_dates(self):
+        self.assertEqual(decode_cursor(encode_cursor(None, 7)), (None, 7))
+        when = datetime(2024, 1, 2, 10, 30)
+        self.assertEqual(decode_cursor(encode_cursor(when, 3)), (when, 3))
+        self.assertIsNone(decode_cursor('garbage'))
+
+
+if __name__ == '__main__':
+    unittest.main()
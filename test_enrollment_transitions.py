@@ -0,0 +1,83 @@
+import unittest
+
+from app_testcase import AppTestCase
+from models import db, User, StudentDetails, Course, Enrollment, OutboxMessage
+from services.analytics import read_counters, seed_analytics, rebuild_analytics, analytics_summary
+from services.enrollment_transitions import transition_enrollments, TransitionError
+from services.seat_reservation import reserve_seat
+
+
+class EnrollmentTransitionTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.courses = [Course(course_code=f'C{i}', name=f'Course {i}', credits=3, seats=10) for i in range(2)]
+        db.session.add_all(self.courses)
+        students = []
+        for i in range(4):
+            user = User(name=f'Student {i}', email=f's{i}@example.com', password_hash='x', role='student')
+            db.session.add(user)
+            db.session.flush()
+            details = StudentDetails(user_id=user.id, enrollment_no=f'UNIV{i:03d}')
+            db.session.add(details)
+            db.session.flush()
+            students.append(details.id)
+        db.session.commit()
+        seed_analytics()
+
+        self.pending = [reserve_seat(students[i], self.courses[i % 2].id) for i in range(3)]
+        self.enrolled = reserve_seat(students[3], self.courses[0].id, status='enrolled')
+
+    def seats(self):
+        db.session.expire_all()
+        return [db.session.get(Course, course.id).seats for course in self.courses]
+
+    def statuses(self):
+        return dict(db.session.query(Enrollment.id, Enrollment.status).all())
+
+    def test_confirm_selected_ids(self):
+        summary = transition_enrollments('enrolled', ids=self.pending[:2] + [self.enrolled], batch_size=1)
+        self.assertEqual(summary, {'updated': 2, 'seats_released': 0, 'mails_queued': 2})
+        self.assertEqual(self.statuses()[self.pending[0]], 'enrolled')
+        self.assertIsNone(db.session.get(Enrollment, self.pending[0]).hold_expires_at)
+        self.assertEqual(self.seats(), [7, 9])
+
+        mails = OutboxMessage.query.order_by(OutboxMessage.recipient).all()
+        self.assertEqual([m.recipient for m in mails], ['s0@example.com', 's1@example.com'])
+        self.assertEqual(mails[0].subject, 'Enrollment Confirmed: Course 0')
+        self.assertEqual(mails[0].attachment, 'university_rules')
+
+    def test_drop_by_filter_releases_seats(self):
+        counters = read_counters()
+        summary = transition_enrollments('dropped', filters={'course_id': self.courses[0].id}, notify=False)
+        self.assertEqual(summary, {'updated': 3, 'seats_released': 3, 'mails_queued': 0})
+        self.assertEqual(self.seats(), [10, 9])
+        self.assertEqual(self.statuses()[self.pending[1]], 'pending_payment')
+        self.assertEqual(OutboxMessage.query.count(), 0)
+
+        # Maintained rollups agree with a rebuild from the table
+        maintained = analytics_summary(days=2)
+        rebuild_analytics()
+        self.assertEqual(maintained, analytics_summary(days=2))
+        self.assertEqual(read_counters(), counters)
+
+    def test_rejects_unknown_targets(self):
+        with self.assertRaises(TransitionError):
+            transition_enrollments('pending_payment', ids=self.pending)
+
+    def test_json_endpoint(self):
+        admin = User(name='Admin', email='admin@univ.edu', role='admin')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'admin@univ.edu', 'password': 'admin'})
+            response = client.post('/admin/enrollments/transition', json={
+                'target_status': 'completed', 'filters': {'status': 'enrolled'}, 'notify': False})
+            self.assertEqual(response.get_json(), {'updated': 1, 'seats_released': 0, 'mails_queued': 0})
+            response = client.post('/admin/enrollments/transition', json={'target_status': 'enrolled', 'ids': 'x'})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.statuses()[self.enrolled], 'completed')
+
+
+if __name__ == '__main__':
+    unittest.main()
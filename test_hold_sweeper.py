@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app_testcase import AppTestCase
+from models import db, User, StudentDetails, Course, Enrollment
+from services.analytics import read_counters, seed_analytics
+from services.hold_sweeper import sweep_expired_holds, sweeper_metrics
+from services.seat_reservation import reserve_seat
+
+
+class HoldSweeperTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = Course(course_code='C1', name='Course 1', credits=3, seats=10)
+        db.session.add(self.course)
+        students = []
+        for i in range(6):
+            user = User(name=f'Student {i}', email=f's{i}@example.com', password_hash='x', role='student')
+            db.session.add(user)
+            db.session.flush()
+            details = StudentDetails(user_id=user.id, enrollment_no=f'UNIV{i:03d}')
+            db.session.add(details)
+            db.session.flush()
+            students.append(details.id)
+        db.session.commit()
+        seed_analytics()
+
+        self.holds = [reserve_seat(student_id, self.course.id) for student_id in students[:5]]
+        self.paid = reserve_seat(students[5], self.course.id, status='enrolled')
+        # Three holds ran out an hour ago, two are still live
+        now = datetime.utcnow()
+        for i, enrollment_id in enumerate(self.holds):
+            db.session.get(Enrollment, enrollment_id).hold_expires_at = now + timedelta(hours=-1 if i < 3 else 1)
+        db.session.commit()
+
+    def seats(self):
+        db.session.expire_all()
+        return db.session.get(Course, self.course.id).seats
+
+    def remaining(self):
+        return sorted(db.session.scalars(db.select(Enrollment.id)))
+
+    def test_releases_only_expired_holds(self):
+        self.assertEqual(self.seats(), 4)
+        runs = sweeper_metrics['runs']
+        total = sweeper_metrics['holds_reclaimed_total']
+
+        self.assertEqual(sweep_expired_holds(), 3)
+        self.assertEqual(self.seats(), 7)
+        self.assertEqual(self.remaining(), sorted(self.holds[3:] + [self.paid]))
+        self.assertEqual(read_counters()['enrollments'], 3)
+        self.assertEqual(sweeper_metrics['runs'], runs + 1)
+        self.assertEqual(sweeper_metrics['last_reclaimed'], 3)
+        self.assertEqual(sweeper_metrics['holds_reclaimed_total'], total + 3)
+
+    def test_batches_until_done(self):
+        later = datetime.utcnow() + timedelta(days=1)
+        # Every hold has expired by then; the enrolled seat is never a hold
+        self.assertEqual(sweep_expired_holds(batch_size=2, now=later), 5)
+        self.assertEqual(self.seats(), 9)
+        self.assertEqual(self.remaining(), [self.paid])
+
+    def test_reruns_are_no_ops(self):
+        self.assertEqual(sweep_expired_holds(batch_size=1), 3)
+        self.assertEqual(sweep_expired_holds(batch_size=1), 0)
+        self.assertEqual(self.seats(), 7)
+        self.assertEqual(sweeper_metrics['last_reclaimed'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
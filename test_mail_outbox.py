@@ -0,0 +1,152 @@
+import socket
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+from app_testcase import AppTestCase, TestConfig
+from models import db, OutboxMessage, MailDeadLetter
+from services.mail_outbox import enqueue_mail, claim_batch, drain_outbox, outbox_metrics
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+class RecordingHandler:
+    """Accepts every message except those to addresses in `failing`, which get a transient 451."""
+
+    def __init__(self):
+        self.received = []
+        self.failing = set()
+        self.lock = threading.Lock()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.failing:
+            return '451 4.3.0 Try again later'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            self.received.extend(envelope.rcpt_tos)
+        return '250 OK'
+
+
+@unittest.skipIf(Controller is None, 'aiosmtpd is not installed')
+class MailOutboxTestCase(AppTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.handler = RecordingHandler()
+        cls.controller = Controller(cls.handler, hostname='127.0.0.1', port=free_port())
+        cls.controller.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.controller.stop()
+
+    def setUp(self):
+        port = self.controller.port
+
+        class SmtpConfig(TestConfig):
+            MAIL_SERVER = '127.0.0.1'
+            MAIL_PORT = port
+            MAIL_USE_TLS = False
+            MAIL_USERNAME = 'noreply@university.local'
+            MAIL_PASSWORD = None
+            MAIL_SUPPRESS_SEND = False  # Flask-Mail suppresses sending under TESTING by default
+            MAIL_MAX_ATTEMPTS = 3
+            MAIL_RETRY_BASE_SECONDS = 30
+
+        self.config = SmtpConfig
+        self.handler.received.clear()
+        self.handler.failing.clear()
+        super().setUp()
+
+    def make_due(self):
+        db.session.execute(db.update(OutboxMessage).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+
+    def test_delivers_over_one_connection(self):
+        for i in range(3):
+            enqueue_mail(f'student{i}@example.com', f'Subject {i}', 'Body')
+        connections = outbox_metrics['smtp_connections']
+
+        self.assertEqual(drain_outbox(batch_size=2), 3)
+        self.assertEqual(sorted(self.handler.received), [f'student{i}@example.com' for i in range(3)])
+        self.assertEqual(outbox_metrics['smtp_connections'] - connections, 1)
+        self.assertEqual(OutboxMessage.query.count(), 0)
+
+    def test_transient_failure_backs_off_then_delivers(self):
+        self.handler.failing.add('flaky@example.com')
+        enqueue_mail('flaky@example.com', 'Subject', 'Body')
+        enqueue_mail('fine@example.com', 'Subject', 'Body')
+
+        started = datetime.utcnow()
+        self.assertEqual(drain_outbox(), 1)
+        message = OutboxMessage.query.one()
+        self.assertEqual((message.recipient, message.status, message.attempts), ('flaky@example.com', 'pending', 1))
+        self.assertIn('451', message.last_error)
+        self.assertAlmostEqual((message.next_attempt_at - started).total_seconds(), 30, delta=5)
+
+        # Not due yet: nothing is retried
+        self.assertEqual(drain_outbox(), 0)
+
+        # The delay doubles after the second failure
+        self.make_due()
+        started = datetime.utcnow()
+        drain_outbox()
+        message = OutboxMessage.query.one()
+        self.assertEqual(message.attempts, 2)
+        self.assertAlmostEqual((message.next_attempt_at - started).total_seconds(), 60, delta=5)
+
+        self.handler.failing.clear()
+        self.make_due()
+        self.assertEqual(drain_outbox(), 1)
+        self.assertIn('flaky@example.com', self.handler.received)
+        self.assertEqual(OutboxMessage.query.count(), 0)
+        self.assertEqual(MailDeadLetter.query.count(), 0)
+
+    def test_dead_letters_after_max_attempts(self):
+        self.handler.failing.add('gone@example.com')
+        outbox_id = enqueue_mail('gone@example.com', 'Subject', 'Body').id
+        for _ in range(3):
+            self.make_due()
+            drain_outbox()
+
+        self.assertEqual(OutboxMessage.query.count(), 0)
+        dead = MailDeadLetter.query.one()
+        self.assertEqual((dead.outbox_id, dead.recipient, dead.attempts), (outbox_id, 'gone@example.com', 3))
+        self.assertIn('451', dead.last_error)
+
+    def test_unreachable_server_counts_as_an_attempt(self):
+        self.app.extensions['mail'].state.port = free_port()  # nothing listens there
+        enqueue_mail('student@example.com', 'Subject', 'Body')
+        self.assertEqual(drain_outbox(), 0)
+        self.assertEqual(OutboxMessage.query.one().attempts, 1)
+
+    def test_claims_are_exclusive_until_the_lease_expires(self):
+        for i in range(5):
+            enqueue_mail(f'student{i}@example.com', 'Subject', 'Body')
+
+        first = claim_batch(3)
+        second = claim_batch(10)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({row.id for row in first} & {row.id for row in second})
+        self.assertEqual(claim_batch(10), [])
+        self.assertEqual({row.status for row in first + second}, {'sending'})
+
+        # A worker that died holding a lease: its messages come back once the lease runs out
+        self.make_due()
+        self.assertEqual(len(claim_batch(10)), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
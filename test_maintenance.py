@@ -0,0 +1,37 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from app_testcase import AppTestCase
+from models import db, PasswordResetToken
+from services import maintenance
+from services.hold_sweeper import start_hold_sweeper
+from services.maintenance import run_purges, start_purger
+from services.password_reset import issue_reset_code
+
+
+class MaintenanceTestCase(AppTestCase):
+    def test_purges_run_independently(self):
+        issue_reset_code('old@example.com')
+        db.session.execute(db.update(PasswordResetToken).values(expires_at=datetime.utcnow() - timedelta(minutes=1)))
+        db.session.commit()
+
+        def broken():
+            raise RuntimeError('disk full')
+
+        with mock.patch.object(maintenance, 'PURGES', (('reports', broken),) + maintenance.PURGES[:1]):
+            self.assertEqual(run_purges(), {'reports': None, 'reset_codes': 1})
+        self.assertEqual(PasswordResetToken.query.count(), 0)
+
+    def test_purger_has_its_own_interval(self):
+        self.app.config['PURGE_INTERVAL'] = 0
+        self.assertIsNone(start_purger(self.app))
+        with mock.patch('services.maintenance.threading.Thread') as thread:
+            self.app.config.update(HOLD_SWEEP_INTERVAL=0, PURGE_INTERVAL=300)
+            self.assertIsNone(start_hold_sweeper(self.app))
+            self.assertIs(start_purger(self.app), thread.return_value)
+        thread.return_value.start.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
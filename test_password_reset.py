@@ -0,0 +1,75 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app_testcase import AppTestCase
+from models import db, User, PasswordResetToken, OutboxMessage
+from services.password_reset import (issue_reset_code, check_reset_code, purge_expired_reset_codes,
+                                     VALID, INVALID, EXPIRED)
+
+
+class PasswordResetTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        for email in ('a@example.com', 'b@example.com'):
+            user = User(name=email, email=email, role='student')
+            user.set_password('old')
+            db.session.add(user)
+        db.session.commit()
+
+    def test_codes_are_per_address_and_stored_hashed(self):
+        code = issue_reset_code('a@example.com')
+        self.assertEqual(check_reset_code('A@example.com ', code), VALID)
+        # The same digits mean nothing for another address
+        self.assertEqual(check_reset_code('b@example.com', code), INVALID)
+        self.assertNotIn(code, PasswordResetToken.query.one().code_hash)
+
+        # A new code replaces the old one
+        newer = issue_reset_code('a@example.com')
+        if newer != code:
+            self.assertEqual(check_reset_code('a@example.com', code), INVALID)
+        self.assertEqual(check_reset_code('a@example.com', newer), VALID)
+
+    def test_expiry_attempt_limit_and_purge(self):
+        code = issue_reset_code('a@example.com')
+        later = datetime.utcnow() + timedelta(minutes=16)
+        self.assertEqual(check_reset_code('a@example.com', code, now=later), EXPIRED)
+
+        wrong = f"{(int(code) + 1) % 10 ** 6:06d}"
+        for _ in range(self.app.config['PASSWORD_RESET_MAX_ATTEMPTS']):
+            self.assertEqual(check_reset_code('a@example.com', wrong), INVALID)
+        self.assertEqual(check_reset_code('a@example.com', code), INVALID)
+
+        issue_reset_code('b@example.com')
+        self.assertEqual(purge_expired_reset_codes(now=later), 2)
+        self.assertEqual(PasswordResetToken.query.count(), 0)
+
+    def test_reset_flow(self):
+        with self.app.test_client() as client:
+            client.post('/forgot-password', data={'email': 'a@example.com'})
+            # The code only exists in the queued mail
+            body = OutboxMessage.query.one().body
+            code = body.split('Your Password Reset Code is: ')[1][:6]
+
+            response = client.post('/manual-reset', data={'email': 'a@example.com', 'token': code,
+                                                          'password': 'new', 'confirm_password': 'new'})
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(PasswordResetToken.query.count(), 0)
+            self.assertEqual(client.post('/login', data={'email': 'a@example.com', 'password': 'new'}).status_code, 302)
+
+
+    def test_reset_with_mixed_case_email(self):
+        with self.app.test_client() as client:
+            client.post('/forgot-password', data={'email': 'A@Example.com'})
+            code = OutboxMessage.query.one().body.split('Your Password Reset Code is: ')[1][:6]
+
+            # Typed differently again on the reset form
+            response = client.post('/manual-reset', data={'email': ' a@EXAMPLE.com', 'token': code,
+                                                          'password': 'new', 'confirm_password': 'new'})
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('/login', response.headers['Location'])
+            self.assertTrue(User.query.filter_by(email='a@example.com').one().check_password('new'))
+            self.assertEqual(PasswordResetToken.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
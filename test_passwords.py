@@ -0,0 +1,64 @@
+import unittest
+
+from app_testcase import AppTestCase, TestConfig
+from models import db, User
+from services.passwords import PasswordVerifier, needs_rehash
+
+
+class FastHashConfig(TestConfig):
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+
+class PasswordPolicyTestCase(AppTestCase):
+    config = FastHashConfig
+
+    def setUp(self):
+        super().setUp()
+        user = User(name='Student', email='s@example.com', role='student')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+
+    def password_hash(self):
+        db.session.expire_all()
+        return db.session.get(User, self.user_id).password_hash
+
+    def login(self, password):
+        with self.app.test_client() as client:
+            return client.post('/login', data={'email': 's@example.com', 'password': password})
+
+    def test_hashes_follow_the_policy(self):
+        self.assertTrue(self.password_hash().startswith('pbkdf2:sha256:1000$'))
+        self.assertFalse(needs_rehash(self.password_hash()))
+
+    def test_login_rehashes_after_a_policy_change(self):
+        self.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+        self.assertEqual(self.login('wrong').status_code, 200)
+        self.assertTrue(self.password_hash().startswith('pbkdf2:sha256:1000$'))
+
+        self.assertEqual(self.login('secret').status_code, 302)
+        new_hash = self.password_hash()
+        self.assertTrue(new_hash.startswith('pbkdf2:sha256:2000$'))
+        self.assertTrue(db.session.get(User, self.user_id).check_password('secret'))
+
+        # Already current: left alone
+        self.login('secret')
+        self.assertEqual(self.password_hash(), new_hash)
+
+    def test_saturated_verifier_turns_logins_away(self):
+        verifier = PasswordVerifier(workers=1, max_pending=1, wait_seconds=0)
+        self.app.extensions['password_verifier'] = verifier
+        verifier._slots.acquire()
+        self.assertEqual(self.login('secret').status_code, 503)
+        self.assertEqual(verifier.stats()['rejected_busy'], 1)
+        verifier._slots.release()
+
+    def test_pool_verification(self):
+        verifier = PasswordVerifier(workers=1)
+        self.assertTrue(verifier.check(self.password_hash(), 'secret'))
+        self.assertFalse(verifier.check(self.password_hash(), 'nope'))
+
+
+if __name__ == '__main__':
+    unittest.main()
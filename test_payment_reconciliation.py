@@ -0,0 +1,107 @@
+import io
+import unittest
+
+from app_testcase import AppTestCase
+from models import db, User, Payment
+from services.payment_reconciliation import reconcile_statement, unreferenced_payments, confirm_payment
+from services.payments import normalise_reference
+
+
+class ReconciliationTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        def payment(key, reference, amount=500.0, status='pending', method='upi'):
+            return Payment(idempotency_key=key, method=method, amount=amount, transaction_id=reference,
+                           reference=normalise_reference(reference), status=status)
+
+        db.session.add_all([
+            payment('a', 'utr-1001'),
+            payment('b', 'UTR 1002', amount=750.0),
+            payment('c', 'UTR1003', status='confirmed'),
+            payment('d', 'UTR1004'),
+            payment('e', 'utr1004'),
+        ] + [payment(f'bulk-{i}', f'BULK{i:05d}') for i in range(1200)])
+        db.session.commit()
+
+    def status(self, key):
+        return Payment.query.filter_by(idempotency_key=key).one().status
+
+    def test_normalise_reference(self):
+        self.assertEqual(normalise_reference(' utr-10/01 '), 'UTR1001')
+        self.assertIsNone(normalise_reference(' - '))
+        self.assertIsNone(normalise_reference(None))
+
+    def test_matches_and_reports(self):
+        statement = io.StringIO(
+            "Date,UTR,Amount\n"
+            "2026-10-01,UTR1001,\"500.00\"\n"      # confirmed
+            "2026-10-01,UTR-1002,700\n"            # wrong amount
+            "2026-10-01,UTR1003,500\n"             # already confirmed
+            "2026-10-01,UTR1004,500\n"             # two candidates
+            "2026-10-01,UTR9999,500\n"             # unknown
+            "2026-10-01,,500\n"                    # no reference
+            "2026-10-01,utr 1001,500\n"            # repeated
+        )
+        result = reconcile_statement(statement)
+
+        self.assertEqual((result.lines, result.confirmed, result.already_confirmed), (7, 1, 1))
+        self.assertEqual([issue.line for issue in result.issues], [3, 5, 6, 7, 8])
+        self.assertEqual(self.status('a'), 'confirmed')
+        self.assertIsNotNone(Payment.query.filter_by(idempotency_key='a').one().confirmed_at)
+        self.assertEqual([self.status(key) for key in 'bde'], ['pending'] * 3)
+
+    def test_preview_writes_nothing(self):
+        result = reconcile_statement(io.StringIO("reference\nUTR1001\n"), confirm=False)
+        self.assertEqual(result.confirmed, 1)
+        self.assertEqual(self.status('a'), 'pending')
+
+    def test_bulk_statement(self):
+        statement = io.StringIO("utr\n" + "".join(f"bulk{i:05d}\n" for i in range(1200)))
+        result = reconcile_statement(statement)
+        self.assertEqual((result.confirmed, result.issue_count), (1200, 0))
+        self.assertEqual(Payment.query.filter_by(status='pending').count(), 4)
+
+        # A second run of the same statement changes nothing
+        statement.seek(0)
+        self.assertEqual(reconcile_statement(statement).already_confirmed, 1200)
+
+    def test_manual_confirmation_of_unreferenced_payments(self):
+        db.session.add(Payment(idempotency_key='no-utr', method='upi', amount=500.0, status='pending'))
+        db.session.commit()
+        unreferenced = unreferenced_payments()
+        self.assertEqual([payment.method for payment in unreferenced], ['upi'])
+
+        self.assertTrue(confirm_payment(unreferenced[0].id))
+        self.assertFalse(confirm_payment(unreferenced[0].id))
+        self.assertEqual(self.status('no-utr'), 'confirmed')
+        self.assertEqual(unreferenced_payments(), [])
+
+    def test_requires_reference_column(self):
+        with self.assertRaises(ValueError):
+            reconcile_statement(io.StringIO("date,amount\n2026-10-01,500\n"))
+
+    def test_admin_endpoint(self):
+        admin = User(name='Admin', email='admin@example.com', role='admin')
+        admin.set_password('secret')
+        db.session.add(admin)
+        db.session.commit()
+
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'admin@example.com', 'password': 'secret'})
+            db.session.add(Payment(idempotency_key='no-utr', method='upi', amount=500.0, status='pending'))
+            db.session.commit()
+            page = client.get('/admin/payments/reconcile')
+            manual_id = Payment.query.filter_by(idempotency_key='no-utr').one().id
+            client.post(f'/admin/payments/{manual_id}/confirm')
+            response = client.post('/admin/payments/reconcile', headers={'Accept': 'application/json'},
+                                   data={'statement': (io.BytesIO(b"UTR,Amount\nUTR1001,500\n"), 'statement.csv')})
+        self.assertEqual(page.status_code, 200)
+        self.assertIn(b'Pending payments without a reference', page.data)
+        self.assertEqual(self.status('no-utr'), 'confirmed')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['confirmed'], 1)
+        self.assertEqual(self.status('a'), 'confirmed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+from sqlalchemy.exc import IntegrityError
+
+from app_testcase import AppTestCase, TestConfig
+from models import db, User, StudentDetails, Course, Enrollment, Payment, OutboxMessage
+from services.analytics import read_counters, seed_analytics, rebuild_analytics, analytics_summary
+from services.payments import finalise_payment, PaymentError
+from services.seat_reservation import reserve_seat
+
+Payer = namedtuple('Payer', 'name email')
+
+
+class PaymentTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        course = Course(course_code='PHY101', name='Physics', credits=4, seats=10, fee=750.0)
+        user = User(name='Asha', email='asha@example.com', role='student')
+        user.set_password('secret')
+        db.session.add_all([course, user])
+        db.session.flush()
+        details = StudentDetails(user_id=user.id, enrollment_no='UNIV001')
+        db.session.add(details)
+        db.session.commit()
+        seed_analytics()
+        self.student_id = details.id
+        self.enrollment_id = reserve_seat(details.id, course.id)
+        self.payer = Payer('Asha', 'asha@example.com')
+
+    def pay(self, key, method='upi', reference='UTR123'):
+        return finalise_payment(self.enrollment_id, self.payer, self.student_id, method, key, reference=reference)
+
+
+class FinalisePaymentTestCase(PaymentTestCase):
+    def test_finalises_once_and_replays_are_no_ops(self):
+        payment, created = self.pay('key-1')
+        self.assertTrue(created)
+        self.assertEqual((payment.amount, payment.transaction_id), (750.0, 'UTR123'))
+        # UPI waits for the bank statement
+        self.assertEqual((payment.reference, payment.status), ('UTR123', 'pending'))
+        enrollment = db.session.get(Enrollment, self.enrollment_id)
+        self.assertEqual(enrollment.status, 'enrolled')
+        self.assertIsNone(enrollment.hold_expires_at)
+        self.assertEqual(OutboxMessage.query.one().subject, 'Enrollment Confirmed: Physics')
+
+        # Same form posted again, and a second tab with its own key
+        self.assertEqual(self.pay('key-1'), (payment, False))
+        self.assertEqual(self.pay('key-2', method='card'), (payment, False))
+        self.assertEqual(Payment.query.count(), 1)
+        self.assertEqual(OutboxMessage.query.count(), 1)
+
+        maintained = analytics_summary(days=1)
+        rebuild_analytics()
+        self.assertEqual(maintained, analytics_summary(days=1))
+
+    def test_rejects_foreign_or_missing_enrollments(self):
+        with self.assertRaises(PaymentError):
+            finalise_payment(self.enrollment_id, self.payer, self.student_id + 1, 'upi', 'key-1')
+        with self.assertRaises(PaymentError):
+            finalise_payment(self.enrollment_id + 1, self.payer, self.student_id, 'upi', 'key-1')
+        self.assertEqual(Payment.query.count(), 0)
+
+    def test_replay_after_the_enrollment_was_deleted(self):
+        payment, _ = self.pay('key-1')
+        db.session.delete(db.session.get(Enrollment, self.enrollment_id))
+        db.session.commit()
+        self.assertIsNone(db.session.get(Payment, payment.id).enrollment_id)
+
+        with self.assertRaisesRegex(PaymentError, 'since been removed'):
+            self.pay('key-1')
+        self.assertEqual(Payment.query.count(), 1)
+
+    def test_other_integrity_errors_are_not_swallowed(self):
+        error = IntegrityError('INSERT INTO outbox_messages ...', {}, Exception('constraint failed'))
+        with mock.patch('services.payments._confirmation_mail', side_effect=error):
+            with self.assertRaises(IntegrityError):
+                self.pay('key-1')
+        self.assertEqual(Payment.query.count(), 0)
+        self.assertEqual(db.session.get(Enrollment, self.enrollment_id).status, 'pending_payment')
+
+    def test_double_posted_form(self):
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'asha@example.com', 'password': 'secret'})
+            form = {'payment_method': 'card', 'idempotency_key': 'form-1'}
+            first = client.post(f'/student/payment/{self.enrollment_id}/process', data=form)
+            second = client.post(f'/student/payment/{self.enrollment_id}/process', data=form)
+        self.assertEqual(first.headers['Location'], second.headers['Location'])
+        self.assertEqual(Payment.query.count(), 1)
+        self.assertEqual(Payment.query.one().status, 'confirmed')
+
+
+class PaymentQrTestCase(PaymentTestCase):
+    def test_qr_is_cacheable_and_revalidates(self):
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'asha@example.com', 'password': 'secret'})
+            url = f'/student/payment/{self.enrollment_id}/qr.png'
+            first = client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(first.mimetype, 'image/png')
+            self.assertTrue(first.data.startswith(b'\x89PNG'))
+            self.assertIn('private', first.headers['Cache-Control'])
+            etag = first.headers['ETag']
+
+            again = client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.data, b'')
+            self.assertEqual(again.headers['ETag'], etag)
+
+            stale = client.get(url, headers={'If-None-Match': '"something-else"'})
+            self.assertEqual(stale.status_code, 200)
+            self.assertEqual(stale.data, first.data)
+
+    def test_qr_is_only_served_to_the_enrolled_student(self):
+        other = User(name='Ravi', email='ravi@example.com', role='student')
+        other.set_password('secret')
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(StudentDetails(user_id=other.id, enrollment_no='UNIV002'))
+        db.session.commit()
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'ravi@example.com', 'password': 'secret'})
+            response = client.get(f'/student/payment/{self.enrollment_id}/qr.png')
+        self.assertEqual(response.status_code, 404)
+
+
+class ConcurrentPaymentTestCase(PaymentTestCase):
+    """Real concurrent transactions need a database file shared by the threads."""
+
+    def setUp(self):
+        tmpdir = self.tmpdir = tempfile.mkdtemp()
+
+        class FileConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmpdir, 'payments.db')}"
+
+        self.config = FileConfig
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def test_exactly_once_under_concurrency(self):
+        barrier = threading.Barrier(8)
+        results, errors = [], []
+
+        def submit(key):
+            with self.app.app_context():
+                barrier.wait()
+                try:
+                    results.append(self.pay(key)[1])
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    db.session.remove()
+
+        # Four double-posts of one form and four other tabs
+        keys = ['same'] * 4 + [f'tab-{i}' for i in range(4)]
+        threads = [threading.Thread(target=submit, args=(key,)) for key in keys]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(results), [False] * 7 + [True])
+        self.assertEqual(Payment.query.count(), 1)
+        self.assertEqual(OutboxMessage.query.count(), 1)
+        self.assertEqual(read_counters()['enrollments'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
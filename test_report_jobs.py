@@ -0,0 +1,128 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+from app_testcase import AppTestCase, TestConfig
+from models import db, User, StudentDetails, Course, Enrollment, ReportJob
+from services.report_export import iter_report_rows, stream_csv, neutralise_formula
+from services.report_jobs import enqueue_report, purge_reports, JobHeartbeat
+
+
+class InlineReportConfig(TestConfig):
+    REPORT_JOB_WORKERS = 0  # render in the calling thread
+
+
+class ReportJobTestCase(AppTestCase):
+    config = InlineReportConfig
+
+    def setUp(self):
+        super().setUp()
+        self.report_dir = tempfile.mkdtemp()
+        self.app.config['REPORT_JOB_DIR'] = self.report_dir
+        course = Course(course_code='PHY101', name='Physics', credits=4, seats=10)
+        db.session.add(course)
+        for i in range(3):
+            user = User(name=f'Student {i}', email=f's{i}@example.com', password_hash='x', role='student')
+            db.session.add(user)
+            db.session.flush()
+            details = StudentDetails(user_id=user.id, enrollment_no=f'UNIV{i:03d}')
+            db.session.add(details)
+            db.session.flush()
+            db.session.add(Enrollment(student_id=details.id, course_id=course.id, status='enrolled'))
+        db.session.commit()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.report_dir, ignore_errors=True)
+
+    def test_renders_and_reuses_a_finished_report(self):
+        job, created = enqueue_report({'status': 'enrolled'})
+        self.assertTrue(created)
+        self.assertEqual(job.status, 'done')
+        self.assertTrue(job.file_path.startswith(self.report_dir))
+        with open(job.file_path, 'rb') as f:
+            self.assertEqual(f.read(4), b'%PDF')
+
+        again, created = enqueue_report({'status': 'enrolled'})
+        self.assertFalse(created)
+        self.assertEqual(again.id, job.id)
+
+    def test_admin_request_to_download(self):
+        admin = User(name='Admin', email='admin@example.com', role='admin')
+        admin.set_password('secret')
+        db.session.add(admin)
+        db.session.commit()
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'admin@example.com', 'password': 'secret'})
+            status = client.get('/admin/report?format=pdf', headers={'Accept': 'application/json'}).get_json()
+            self.assertEqual(status['status'], 'done')
+            download = client.get(status['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(download.data.startswith(b'%PDF'))
+
+    def test_csv_export_neutralises_formulas(self):
+        user = User.query.filter_by(email='s0@example.com').one()
+        user.name = '=HYPERLINK("http://evil.example","Click")'
+        user.email = '@s0@example.com'
+        db.session.commit()
+
+        csv_text = ''.join(stream_csv(iter_report_rows({})))
+        row = next(csv.reader(io.StringIO(csv_text.splitlines()[1])))
+        self.assertEqual(row[1:3], ['\'=HYPERLINK("http://evil.example","Click")', "'@s0@example.com"])
+        self.assertEqual(neutralise_formula('Physics'), 'Physics')
+        self.assertEqual(neutralise_formula('-1+2'), "'-1+2")
+
+    def test_lost_job_stops_blocking_and_is_failed(self):
+        job, _ = enqueue_report({})
+        # A job handed to a pool that died with its server: no heartbeat since
+        lost = ReportJob(id='lost', report_format='pdf', params=job.params, params_hash=job.params_hash,
+                         status='running', created_at=datetime.utcnow() - timedelta(minutes=10),
+                         heartbeat_at=datetime.utcnow() - timedelta(minutes=10))
+        db.session.delete(job)
+        db.session.add(lost)
+        db.session.commit()
+
+        fresh, created = enqueue_report({})
+        self.assertTrue(created)
+        self.assertNotEqual(fresh.id, 'lost')
+
+        self.assertEqual(purge_reports(), (1, 0))
+        lost = db.session.get(ReportJob, 'lost')
+        self.assertEqual(lost.status, 'failed')
+        self.assertIn('lost', lost.error)
+
+    def test_purges_old_reports_and_their_files(self):
+        job, _ = enqueue_report({})
+        path = job.file_path
+        leftover = os.path.join(self.report_dir, 'gone.pdf.part')
+        open(leftover, 'wb').close()
+        db.session.add(ReportJob(id='gone', report_format='pdf', params='{}', params_hash='x', status='failed',
+                                 finished_at=datetime.utcnow() - timedelta(days=2)))
+        db.session.commit()
+
+        self.assertEqual(purge_reports(), (0, 1))
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(leftover))
+
+        self.assertEqual(purge_reports(now=datetime.utcnow() + timedelta(days=2)), (0, 1))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(ReportJob.query.count(), 0)
+
+    def test_crashed_pool_process_fails_the_job(self):
+        db.session.add(ReportJob(id='crash', report_format='pdf', params='{}', params_hash='y', status='queued'))
+        db.session.commit()
+        heartbeat = JobHeartbeat(self.app, interval=3600)
+        future = Future()
+        heartbeat.track('crash', future)
+        future.set_exception(RuntimeError('BrokenProcessPool'))
+        db.session.expire_all()
+        self.assertEqual(db.session.get(ReportJob, 'crash').status, 'failed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import threading
+import unittest
+from unittest import mock
+
+from app_testcase import AppTestCase
+from models import db, User, Course, StudentDetails
+from services.curriculum import LocalVersionStore
+from services.search import (PrefixIndex, search_courses, search_students, index_course, remove_student,
+                             ranked_matches)
+
+
+class SearchIndexTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([
+            Course(course_code='PHY101', name='Physics', credits=4, seats=30),
+            Course(course_code='PHY201', name='Applied Physics Lab', credits=2, seats=30),
+            Course(course_code='CHE101', name='Chemistry', credits=4, seats=30),
+            User(name='Priya Sharma', email='priya.sharma@univ.edu', password_hash='x', role='student'),
+            User(name='Priyanka Rao', email='priyanka@univ.edu', password_hash='x', role='student'),
+            User(name='Admin Priya', email='admin@univ.edu', password_hash='x', role='admin'),
+        ])
+        db.session.commit()
+
+    def names(self, ids, model):
+        return [db.session.get(model, i).name for i in ids]
+
+    def test_prefix_matching_and_ranking(self):
+        # Exact word matches rank above prefix matches; shorter titles first
+        self.assertEqual(self.names(search_students('priya'), User), ['Priya Sharma', 'Priyanka Rao'])
+        self.assertEqual(self.names(search_students('pri sha'), User), ['Priya Sharma'])
+        self.assertEqual(self.names(search_courses('phys'), Course), ['Physics', 'Applied Physics Lab'])
+        # Mixed course codes match on their letter and digit parts
+        self.assertEqual(self.names(search_courses('phy-101'), Course), ['Physics'])
+        self.assertEqual(self.names(search_courses('101'), Course), ['Physics', 'Chemistry'])
+        self.assertEqual(search_students('nobody'), [])
+        self.assertEqual(search_students('  @@ '), [])
+
+    def test_writes_update_the_index(self):
+        search_courses('phys')
+        course = Course(course_code='BIO101', name='Biophysics', credits=3, seats=10)
+        db.session.add(course)
+        db.session.commit()
+        index_course(course)
+        self.assertEqual(self.names(search_courses('bioph'), Course), ['Biophysics'])
+
+        self.assertEqual(len(search_students('priya')), 2)
+        user = User.query.filter_by(name='Priyanka Rao').one()
+        db.session.delete(user)
+        db.session.commit()
+        remove_student(user.id)
+        self.assertEqual(self.names(search_students('priya'), User), ['Priya Sharma'])
+        # Both writes were applied in place, not by rebuilding
+        self.assertEqual(self.app.extensions['search']['courses'].builds, 1)
+        self.assertEqual(self.app.extensions['search']['students'].builds, 1)
+
+    def test_rebuilds_after_another_workers_write(self):
+        versions = LocalVersionStore()
+        rows = [(1, 'Physics', 'PHY101')]
+        ours = PrefixIndex('courses', lambda: list(rows), versions)
+        theirs = PrefixIndex('courses', lambda: list(rows), versions)
+        self.assertEqual(ours.search('phy'), [1])
+        self.assertEqual(theirs.search('phy'), [1])
+
+        rows.append((2, 'Physical Education', 'PED101'))
+        theirs.upsert(2, 'Physical Education', 'PED101')
+        self.assertEqual(theirs.builds, 1)
+        # The search that notices starts the reload; the new copy is swapped in when done
+        ours.search('phy')
+        ours._refresher.join()
+        self.assertEqual(ours.search('phy'), [1, 2])
+        self.assertEqual(ours.builds, 2)
+
+    def test_local_copies_expire_after_the_ttl(self):
+        # Separate version stores: the other worker's stamps are not visible here
+        rows = [(1, 'Physics', 'PHY101')]
+        index = PrefixIndex('courses', lambda: list(rows), LocalVersionStore(), ttl=60)
+        with mock.patch('services.search.time.monotonic', return_value=1000.0):
+            self.assertEqual(index.search('phy'), [1])
+        rows.append((2, 'Physical Education', 'PED101'))
+        with mock.patch('services.search.time.monotonic', return_value=1059.0):
+            self.assertEqual(index.search('phy'), [1])
+            self.assertIsNone(index._refresher)
+        with mock.patch('services.search.time.monotonic', return_value=1060.0):
+            index.search('phy')
+            index._refresher.join()
+            self.assertEqual(index.search('phy'), [1, 2])
+        self.assertEqual(index.builds, 2)
+
+    def test_expired_index_is_rebuilt_once_in_the_background(self):
+        rows = [(1, 'Physics', 'PHY101')]
+        loading = threading.Event()
+        release = threading.Event()
+
+        def slow_loader():
+            if index.builds:
+                loading.set()
+                release.wait(5)
+            return list(rows)
+
+        index = PrefixIndex('courses', slow_loader, LocalVersionStore(), ttl=60)
+        with mock.patch('services.search.time.monotonic', return_value=1000.0):
+            index.search('phy')
+        rows.append((2, 'Physical Education', 'PED101'))
+
+        results = []
+        with mock.patch('services.search.time.monotonic', return_value=2000.0):
+            searches = [threading.Thread(target=lambda: results.append(index.search('phy'))) for _ in range(2)]
+            for thread in searches:
+                thread.start()
+            for thread in searches:
+                thread.join(5)
+            # Both found it expired, neither waited for the reload
+            self.assertTrue(loading.wait(5))
+            self.assertEqual(results, [[1], [1]])
+            self.assertTrue(index.stats()['rebuilding'])
+
+            release.set()
+            index._refresher.join(5)
+            self.assertEqual(index.search('phy'), [1, 2])
+        self.assertEqual(index.builds, 2)
+
+    def test_first_build_is_shared_by_concurrent_searches(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow_loader():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return [(1, 'Physics', 'PHY101')]
+
+        index = PrefixIndex('courses', slow_loader, LocalVersionStore())
+        results = []
+        searches = [threading.Thread(target=lambda: results.append(index.search('phy'))) for _ in range(3)]
+        searches[0].start()
+        self.assertTrue(started.wait(5))
+        for thread in searches[1:]:
+            thread.start()
+        release.set()
+        for thread in searches:
+            thread.join(5)
+        self.assertEqual(results, [[1]] * 3)
+        self.assertEqual((len(calls), index.builds), (1, 1))
+
+    def test_truncated_results_are_flagged(self):
+        self.assertEqual(ranked_matches(search_students, 'priya', limit=2)[1], False)
+        ids, truncated = ranked_matches(search_students, 'priya', limit=1)
+        self.assertEqual((self.names(ids, User), truncated), (['Priya Sharma'], True))
+
+        admin = User(name='Admin', email='root@univ.edu', role='admin')
+        admin.set_password('admin')
+        db.session.add(admin)
+        for i, user in enumerate(User.query.filter_by(role='student')):
+            db.session.add(StudentDetails(user_id=user.id, enrollment_no=f'UNIV{i:03d}'))
+        db.session.commit()
+        self.app.config['SEARCH_RESULTS_LIMIT'] = 1
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'root@univ.edu', 'password': 'admin'})
+            response = client.get('/admin/students?search=priya')
+        self.assertIn(b'Showing the best 1 matches for "priya"', response.data)
+        self.assertNotIn(b'Priyanka Rao', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
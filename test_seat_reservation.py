@@ -0,0 +1,95 @@
+import unittest
+from unittest import mock
+
+from sqlalchemy.exc import OperationalError
+
+from app_testcase import AppTestCase
+from models import db, User, StudentDetails, Course, Enrollment
+from services import seat_reservation
+from services.seat_reservation import reserve_seat, AlreadyEnrolled, CourseFull, CourseNotFound, ReservationBusy
+
+
+class MySQLDeadlock(Exception):
+    errno = 1213
+
+
+def deadlock():
+    return OperationalError('UPDATE courses ...', {}, MySQLDeadlock('Deadlock found when trying to get lock'))
+
+
+class SeatReservationTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = Course(course_code='C1', name='Course 1', credits=3, seats=1)
+        db.session.add(self.course)
+        self.students = []
+        for i in range(2):
+            user = User(name=f'Student {i}', email=f's{i}@example.com', password_hash='x', role='student')
+            db.session.add(user)
+            db.session.flush()
+            details = StudentDetails(user_id=user.id, enrollment_no=f'UNIV{i:03d}')
+            db.session.add(details)
+            db.session.flush()
+            self.students.append(details.id)
+        db.session.commit()
+
+    def seats(self):
+        db.session.expire_all()
+        return db.session.get(Course, self.course.id).seats
+
+    def test_last_seat_then_full(self):
+        reserve_seat(self.students[0], self.course.id)
+        self.assertEqual(self.seats(), 0)
+        with self.assertRaises(CourseFull):
+            reserve_seat(self.students[1], self.course.id)
+        self.assertEqual(Enrollment.query.count(), 1)
+
+    def test_duplicate_gives_the_seat_back(self):
+        self.course.seats = 2
+        db.session.commit()
+        reserve_seat(self.students[0], self.course.id)
+        with self.assertRaises(AlreadyEnrolled):
+            reserve_seat(self.students[0], self.course.id)
+        self.assertEqual(self.seats(), 1)
+
+    def test_duplicate_in_full_course_is_already_enrolled(self):
+        reserve_seat(self.students[0], self.course.id)
+        with self.assertRaises(AlreadyEnrolled):
+            reserve_seat(self.students[0], self.course.id)
+
+    def test_missing_course(self):
+        with self.assertRaises(CourseNotFound):
+            reserve_seat(self.students[0], 999)
+
+    def test_deadlock_is_retried(self):
+        real = seat_reservation._reserve_seat
+        errors = iter([deadlock(), deadlock()])
+
+        def flaky(*args):
+            error = next(errors, None)
+            if error is not None:
+                raise error
+            return real(*args)
+
+        with mock.patch.object(seat_reservation, '_reserve_seat', side_effect=flaky) as patched:
+            enrollment_id = reserve_seat(self.students[0], self.course.id)
+        self.assertEqual(patched.call_count, 3)
+        self.assertEqual(db.session.get(Enrollment, enrollment_id).student_id, self.students[0])
+        self.assertEqual(self.seats(), 0)
+
+    def test_persistent_deadlock_is_busy(self):
+        with mock.patch.object(seat_reservation, '_reserve_seat', side_effect=deadlock()) as patched:
+            with self.assertRaises(ReservationBusy):
+                reserve_seat(self.students[0], self.course.id)
+        self.assertEqual(patched.call_count, seat_reservation.DEADLOCK_RETRIES + 1)
+        self.assertEqual(self.seats(), 1)
+
+    def test_other_operational_errors_are_raised(self):
+        error = OperationalError('SELECT 1', {}, Exception('server has gone away'))
+        with mock.patch.object(seat_reservation, '_reserve_seat', side_effect=error):
+            with self.assertRaises(OperationalError):
+                reserve_seat(self.students[0], self.course.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
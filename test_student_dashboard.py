@@ -0,0 +1,79 @@
+import unittest
+
+from werkzeug.security import generate_password_hash
+
+from app_testcase import AppTestCase
+from models import db, User, StudentDetails, Course, Enrollment
+from services.student_dashboard import load_student_dashboard
+
+
+class StudentDashboardQueryCountTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.count_statements()
+
+    def make_student(self, enrollment_count):
+        user = User(name='Student', email='student@example.com',
+                    password_hash=generate_password_hash('secret'), role='student')
+        db.session.add(user)
+        db.session.flush()
+        details = StudentDetails(user_id=user.id, enrollment_no='UNIV2026001')
+        db.session.add(details)
+        db.session.flush()
+        for i in range(enrollment_count):
+            course = Course(course_code=f'C{i:03d}', name=f'Course {i}', credits=3, seats=30, fee=100 + i)
+            db.session.add(course)
+            db.session.flush()
+            db.session.add(Enrollment(student_id=details.id, course_id=course.id,
+                                      status='enrolled' if i % 2 else 'pending_payment'))
+        user_id = user.id
+        db.session.commit()
+        return user_id
+
+    def test_dashboard_data_is_one_query(self):
+        user_id = self.make_student(5)
+        self.statements.clear()
+        dashboard = load_student_dashboard(user_id)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(len(dashboard.enrollments), 5)
+        self.assertEqual({e.course_code for e in dashboard.enrollments}, {f'C{i:03d}' for i in range(5)})
+
+    def test_student_without_enrollments(self):
+        user_id = self.make_student(0)
+        dashboard = load_student_dashboard(user_id)
+        self.assertEqual(dashboard.enrollments, [])
+        self.assertIsNone(load_student_dashboard(user_id + 1))
+
+    def test_dashboard_page_query_count_is_constant(self):
+        user_id = self.make_student(8)
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+        # Each request gets a fresh session, as in production
+        db.session.remove()
+        self.statements.clear()
+        response = client.get('/student/dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'C007', response.data)
+        # User loader + the dashboard projection, however many enrollments there are
+        self.assertEqual(len(self.statements), 2, self.statements)
+
+    def test_student_details_load_with_the_user(self):
+        user_id = self.make_student(0)
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+        db.session.remove()
+        self.statements.clear()
+        response = client.get('/student/profile')
+        self.assertEqual(response.status_code, 200)
+        # The user_loader joins student_details; the route reads them from g
+        self.assertEqual(len(self.statements), 1, self.statements)
+
+
+if __name__ == '__main__':
+    unittest.main()
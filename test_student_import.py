@@ -0,0 +1,107 @@
+import io
+import unittest
+
+from app_testcase import AppTestCase, TestConfig
+from models import db, User, StudentDetails, OutboxMessage
+from services.analytics import read_counters, seed_analytics
+from services.passwords import UNUSABLE_PASSWORD, verify_login
+from services.search import search_students
+from services.student_import import import_students
+
+
+class ImportConfig(TestConfig):
+    STUDENT_IMPORT_HASH_WORKERS = 1
+    STUDENT_IMPORT_BATCH_SIZE = 2
+
+
+CSV = """Name, Email ,password,phone,dob
+Asha Rao,asha@univ.edu,secret1,9800000001,2007-04-01
+,noname@univ.edu,x,,
+Bad Email,not-an-email,x,,
+Ravi Kumar,taken@univ.edu,x,,
+Meena Iyer,meena@univ.edu,,,
+Asha Again,ASHA@univ.edu,x,,
+Late Date,late@univ.edu,x,,01/02/2007
+Kiran Shetty,kiran@univ.edu,pw,,
+"""
+
+
+class StudentImportTestCase(AppTestCase):
+    config = ImportConfig
+
+    def setUp(self):
+        super().setUp()
+        db.session.add(User(name='Existing', email='taken@univ.edu', password_hash='x', role='student'))
+        db.session.commit()
+        seed_analytics()
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        result = import_students(io.StringIO(CSV))
+        self.assertEqual(result.created, 3)
+        self.assertEqual(result.generated_passwords, 1)
+        self.assertEqual(result.welcome_mails, 1)
+        self.assertEqual([(e.line, e.message) for e in result.errors], [
+            (3, 'Name is required.'),
+            (4, 'Invalid email address.'),
+            (5, 'Email already exists.'),
+            (7, 'Email appears more than once in the file.'),
+            (8, 'Date of birth must be YYYY-MM-DD.'),
+        ])
+
+        asha = User.query.filter_by(email='asha@univ.edu').one()
+        self.assertTrue(asha.check_password('secret1'))
+        self.assertEqual(asha.student_details.phone, '9800000001')
+        self.assertTrue(asha.student_details.enrollment_no.endswith(f'{asha.id:03d}'))
+        self.assertEqual(StudentDetails.query.count(), 3)
+        self.assertEqual(read_counters()['students'], 4)
+        self.assertEqual(len(search_students('kiran')), 1)
+
+        # Only the student without a password is asked to set one
+        mail = OutboxMessage.query.one()
+        self.assertEqual(mail.recipient, 'meena@univ.edu')
+        self.assertIn('Forgot password', mail.body)
+
+        # ...and cannot log in until they do
+        meena = User.query.filter_by(email='meena@univ.edu').one()
+        self.assertEqual(meena.password_hash, UNUSABLE_PASSWORD)
+        self.assertFalse(verify_login(meena, ''))
+        self.assertFalse(verify_login(meena, UNUSABLE_PASSWORD))
+
+    def test_existing_emails_match_case_insensitively(self):
+        result = import_students(io.StringIO('name,email\nRavi Kumar,Taken@Univ.EDU\n'))
+        self.assertEqual(result.created, 0)
+        self.assertEqual([(e.line, e.message) for e in result.errors], [(2, 'Email already exists.')])
+        self.assertEqual(OutboxMessage.query.count(), 0)
+
+    def test_emails_are_stored_lower_cased(self):
+        result = import_students(io.StringIO('name,email,password\nNew One, New.One@Univ.EDU ,pw\n'))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(User.query.filter_by(email='new.one@univ.edu').count(), 1)
+
+        # Logins normalise the typed email the same way
+        with self.app.test_client() as client:
+            response = client.post('/login', data={'email': 'NEW.ONE@univ.edu ', 'password': 'pw'})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('/login', response.headers['Location'])
+
+    def test_missing_columns_are_rejected(self):
+        with self.assertRaises(ValueError):
+            import_students(io.StringIO('name,phone\nAsha,123\n'))
+
+    def test_admin_upload(self):
+        admin = User(name='Admin', email='admin@univ.edu', role='admin')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'admin@univ.edu', 'password': 'admin'})
+            response = client.post('/admin/students/import', data={
+                'csv_file': (io.BytesIO(b'\xef\xbb\xbfname,email\nNew One,new@univ.edu\n'), 'students.csv'),
+            }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'1 imported, 0 skipped', response.data)
+        self.assertIn('http://localhost/forgot-password', OutboxMessage.query.one().body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from app_testcase import AppTestCase
+from models import db, User, StudentDetails
+from services.upload_store import store_upload, build_variants, upload_url, variant_path, UploadError, OBJECTS_DIR
+
+
+def image_bytes(size=(800, 600), mode='RGB', image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+class UploadStoreTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = tempfile.mkdtemp()
+        self.app.static_folder = self.static
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.static)
+
+    def stored_files(self):
+        root = os.path.join(self.static, OBJECTS_DIR)
+        return sorted(os.path.relpath(os.path.join(d, f), root) for d, _, files in os.walk(root) for f in files)
+
+
+class StoreTestCase(UploadStoreTestCase):
+    def test_content_addressed_and_deduplicated(self):
+        data = image_bytes()
+        first = store_upload(io.BytesIO(data))
+        second = store_upload(io.BytesIO(data))
+
+        self.assertTrue(first.created)
+        self.assertFalse(second.created)
+        self.assertEqual(first.path, second.path)
+        self.assertEqual(first.path, f"{OBJECTS_DIR}/{first.digest[:2]}/{first.digest}.png")
+        self.assertEqual(self.stored_files(), [f"{first.digest[:2]}/{first.digest}.png"])
+
+        # The extension follows the content, whatever the client called the file
+        self.assertTrue(store_upload(io.BytesIO(image_bytes(image_format='JPEG'))).path.endswith('.jpg'))
+
+    def test_rejects_bad_uploads_without_leaving_files(self):
+        with self.assertRaises(UploadError):
+            store_upload(io.BytesIO(b'<?php echo 1; ?>'))
+        with self.assertRaises(UploadError):
+            store_upload(io.BytesIO(b''))
+        self.app.config['MAX_CONTENT_LENGTH'] = 1024
+        with self.assertRaises(UploadError):
+            store_upload(io.BytesIO(image_bytes(size=(2000, 2000), mode='RGBA')))
+        self.assertEqual(self.stored_files(), [])
+
+
+class VariantTestCase(UploadStoreTestCase):
+    def test_builds_variants_and_urls(self):
+        path = store_upload(io.BytesIO(image_bytes(mode='RGBA'))).path
+        with self.app.test_request_context():
+            self.assertIsNone(upload_url(path, 160, 'webp'))
+            self.assertEqual(upload_url(path, 160), f"/static/{path}")
+
+            self.assertEqual(build_variants(path), 4)
+            self.assertEqual(build_variants(path), 0)
+            self.assertEqual(upload_url(path, 160, 'webp'), f"/static/{variant_path(path, 160, 'webp')}")
+            self.assertEqual(upload_url(path, 160), f"/static/{variant_path(path, 160, 'jpg')}")
+
+        with Image.open(os.path.join(self.static, variant_path(path, 160, 'jpg'))) as img:
+            self.assertEqual((img.format, img.size), ('JPEG', (213, 160)))
+        with Image.open(os.path.join(self.static, variant_path(path, 320, 'webp'))) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (427, 320)))
+
+    def test_profile_upload_builds_variants_in_background(self):
+        self.app.extensions['upload_variants'].start(1)
+        user = User(name='Asha', email='asha@example.com', role='student')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(StudentDetails(user_id=user.id, enrollment_no='UNIV001'))
+        db.session.commit()
+
+        with self.app.test_client() as client:
+            client.post('/login', data={'email': 'asha@example.com', 'password': 'secret'})
+            response = client.post('/student/profile', data={
+                'phone': '123', 'address': 'Campus',
+                'profile_image': (io.BytesIO(image_bytes()), '../../evil name.png'),
+            })
+            self.assertEqual(response.status_code, 302)
+            self.app.extensions['upload_variants'].join()
+
+            path = StudentDetails.query.one().profile_image
+            self.assertTrue(path.startswith(OBJECTS_DIR))
+            page = client.get('/student/profile').get_data(as_text=True)
+        self.assertIn(variant_path(path, 320, 'webp'), page)
+        self.assertIn(variant_path(path, 320, 'jpg'), page)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,7 +8,7 @@ with app.app_context():
     
     if admin:
         print(f"Found admin: {admin.email}")
-        admin.email = 'ACV@gmail.com'
+        admin.email = 'acv@gmail.com'
         admin.set_password('ACV123')
         db.session.commit()
         print("Admin credentials updated successfully.")
@@ -16,7 +16,7 @@ with app.app_context():
     else:
         # Create if doesn't exist (though it should)
         print("Admin user not found. Creating new one...")
-        admin = User(name='Admin User', email='ACV@gmail.com', role='admin')
+        admin = User(name='Admin User', email='acv@gmail.com', role='admin')
         admin.set_password('ACV123')
         db.session.add(admin)
         db.session.commit()
@@ -1,52 +1,75 @@
 from io import BytesIO
+from functools import lru_cache
+import hashlib
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
-import base64
+from reportlab.graphics.barcode import qrencoder
+from PIL import Image
 
 try:
     import qrcode
 except ImportError:
     qrcode = None
 
-def generate_upi_qr(upi_id, name, amount, transaction_note="Enrollment Fee"):
+def upi_payment_url(upi_id, name, amount, transaction_note="Enrollment Fee"):
     """
-    Generates a UPI QR code and returns as base64 string.
+    Builds the UPI deep link.
     UPI URL Format: upi://pay?pa=<upi_id>&pn=<name>&am=<amount>&tn=<note>
     """
     # Ensure amount is string with 2 decimals
     amount_str = "{:.2f}".format(float(amount))
-    
-    # Construct UPI URL
-    # standardized UPI deep link format
-    upi_url = f"upi://pay?pa={upi_id}&pn={name}&am={amount_str}&tn={transaction_note}&cu=INR"
-    
-    # Try local generation
+    return f"upi://pay?pa={upi_id}&pn={name}&am={amount_str}&tn={transaction_note}&cu=INR"
+
+
+def render_qr_png(data, box_size=10, border=4):
+    """
+    Renders data as a QR code PNG. Uses the qrcode package when it is installed,
+    otherwise ReportLab's pure-Python encoder drawn with Pillow, so rendering
+    never depends on the network.
+    """
     if qrcode:
-        try:
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(upi_url)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            buffered = BytesIO()
-            img.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            return f"data:image/png;base64,{img_str}", upi_url
-        except Exception as e:
-            print(f"Local QR generation failed: {e}")
-            pass
-            
-    # Fallback to Online API (Robust fix)
-    import urllib.parse
-    encoded_url = urllib.parse.quote(upi_url)
-    api_url = f"https://api.qrserver.com/v1/create-qr-code/?size=250x250&data={encoded_url}"
-    return api_url, upi_url
+        qr = qrcode.QRCode(
+            version=None,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=box_size,
+            border=border,
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        img = qr.make_image(fill_color="black", back_color="white")
+    else:
+        qr = qrencoder.QRCode(None, qrencoder.QRErrorCorrectLevel.L)
+        qr.addData(data)
+        qr.make()
+        count = qr.getModuleCount()
+        img = Image.new('1', (count + 2 * border, count + 2 * border), 1)
+        pixels = img.load()
+        for row in range(count):
+            for col in range(count):
+                if qr.isDark(row, col):
+                    pixels[col + border, row + border] = 0
+        img = img.resize((img.width * box_size, img.height * box_size), Image.NEAREST)
+
+    buffered = BytesIO()
+    img.save(buffered, format="PNG", optimize=True)
+    return buffered.getvalue()
+
+
+@lru_cache(maxsize=512)
+def _cached_qr_png(upi_url):
+    return render_qr_png(upi_url)
+
+
+def generate_upi_qr(upi_id, name, amount, transaction_note="Enrollment Fee"):
+    """
+    Returns (png_bytes, etag, upi_url) for a UPI payment QR code.
+
+    The payload for an enrollment never changes, so PNGs are memoised in a
+    bounded LRU keyed by the UPI URL; its SHA-256 is the ETag.
+    """
+    upi_url = upi_payment_url(upi_id, name, amount, transaction_note)
+    digest = hashlib.sha256(upi_url.encode()).hexdigest()
+    return _cached_qr_png(upi_url), digest, upi_url
 
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib import colors
@@ -107,30 +130,101 @@ def generate_pdf_report(data, title="Report"):
     buffer.seek(0)
     return buffer
 
-from flask_mail import Message
-from flask import current_app
+def _fit(text, width, font_size):
+    """Truncates text so it fits a fixed column width (Helvetica is roughly 0.5em per char)."""
+    text = str(text)
+    max_chars = max(int(width / (font_size * 0.5)), 4)
+    return text if len(text) <= max_chars else text[:max_chars - 1] + '\u2026'
+
 
-def send_email_with_attachment(to_email, subject, body, attachment_path=None, attachment_name='document.pdf'):
+def generate_pdf_report_chunked(header, rows, output, title="Report", col_widths=None, rows_per_page=28):
     """
-    Sends an email using Flask-Mail.
+    Writes a PDF report page by page from an iterable of rows.
+
+    Unlike generate_pdf_report, the rows are never collected into one Table:
+    each page gets its own small table with fixed column widths, so memory
+    stays bounded by rows_per_page however long the iterable is.
+    output: a file path or binary file object.
     """
-    try:
-        msg = Message(subject, recipients=[to_email])
-        msg.body = body
-        msg.sender = current_app.config.get('MAIL_USERNAME')
-        
-        if attachment_path:
-            with current_app.open_resource(attachment_path) as fp:
-                msg.attach(attachment_name, "application/pdf", fp.read())
-        
-        mail = current_app.extensions.get('mail')
-        if mail:
-            mail.send(msg)
-            print(f"Email sent to {to_email}")
-            return True
+    pagesize = landscape(letter)
+    page_width, page_height = pagesize
+    margin = 36
+    row_height = 18
+    usable_width = page_width - 2 * margin
+    if not col_widths:
+        col_widths = [usable_width / len(header)] * len(header)
+
+    c = canvas.Canvas(output, pagesize=pagesize, pageCompression=1)
+    c.setTitle(title)
+
+    style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.whitesmoke]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 4),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+    ])
+
+    def draw_page(chunk, page_number):
+        top = page_height - margin
+        if page_number == 1:
+            c.setFont('Helvetica-Bold', 18)
+            c.drawCentredString(page_width / 2, top - 18, title)
+            top -= 40
+        data = [header] + [[_fit(value, width, 9) for value, width in zip(row, col_widths)] for row in chunk]
+        table = Table(data, colWidths=col_widths, rowHeights=row_height)
+        table.setStyle(style)
+        _, height = table.wrapOn(c, usable_width, top - margin)
+        table.drawOn(c, margin, top - height)
+        c.setFont('Helvetica', 8)
+        c.drawRightString(page_width - margin, margin / 2, f"Page {page_number}")
+        c.showPage()
+
+    page_number = 0
+    chunk = []
+    # The first page loses two rows to the title
+    capacity = rows_per_page - 2
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= capacity:
+            page_number += 1
+            draw_page(chunk, page_number)
+            chunk = []
+            capacity = rows_per_page
+
+    if chunk or page_number == 0:
+        page_number += 1
+        if chunk:
+            draw_page(chunk, page_number)
         else:
-            print("Mail extension not found.")
-            return False
+            c.setFont('Helvetica-Bold', 18)
+            c.drawCentredString(page_width / 2, page_height - margin - 18, title)
+            c.setFont('Helvetica', 11)
+            c.drawString(margin, page_height - margin - 60, "No data available to display.")
+            c.showPage()
+
+    c.save()
+    return output
+
+from services.mail_outbox import enqueue_mail
+
+def send_email_with_attachment(to_email, subject, body, attachment_path=None, attachment_name=None):
+    """
+    Queues an email for the background mail workers (see services.mail_outbox).
+    attachment_path is a key from MAIL_ATTACHMENTS, or a path relative to the
+    app root that is read when the mail is sent.
+    """
+    try:
+        enqueue_mail(to_email, subject, body, attachment=attachment_path, attachment_name=attachment_name)
+        print(f"Email to {to_email} queued")
+        return True
     except Exception as e:
-        print(f"Failed to send email: {e}")
+        print(f"Failed to queue email: {e}")
         return False